@@ -0,0 +1,183 @@
+import math
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import case, delete, func, insert, select, text
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.config import settings
+from app.models import Order, OrderRollupDaily, OrderRollupHourly, OrderStatusHistory, PaymentStatus
+
+# Order columns a rollup row is derived from
+ROLLUP_SOURCE = (
+    Order.id, Order.created_at, Order.fuel_type, Order.delivery_lat, Order.delivery_lng,
+    Order.quantity, Order.total_amount, Order.order_status, Order.payment_status,
+)
+
+ROLLUPS = {"hour": OrderRollupHourly, "day": OrderRollupDaily}
+DIMENSIONS = ("fuel_type", "region", "order_status", "payment_status")
+MEASURES = ("orders", "liters", "amount")
+UNKNOWN_REGION = "unknown"
+
+
+def region_of(lat, lng) -> str:
+    """Grid cell of a delivery point, named by its south-west corner"""
+    if lat is None or lng is None:
+        return UNKNOWN_REGION
+    size = settings.analytics_region_degrees
+    return ",".join(f"{round(math.floor(value / size) * size, 4):g}" for value in (lat, lng))
+
+
+def bucket_of(moment: datetime, period: str) -> datetime:
+    """Start of the hour or day a moment falls in"""
+    if period == "day":
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+class RollupDeltas:
+    """Changes to rollup rows, summed per key before they are written"""
+
+    def __init__(self):
+        self.changes = {period: defaultdict(lambda: [0, 0, 0.0]) for period in ROLLUPS}
+
+    def add(self, order, sign: int = 1, order_status=None, payment_status=None):
+        """Count an order (an Order or ROLLUP_SOURCE row) in its rollup rows, or out of them with sign=-1"""
+        dimensions = (
+            order.fuel_type,
+            region_of(order.delivery_lat, order.delivery_lng),
+            order_status or order.order_status,
+            payment_status or order.payment_status,
+        )
+        for period, changes in self.changes.items():
+            totals = changes[(bucket_of(order.created_at, period),) + dimensions]
+            totals[0] += sign
+            totals[1] += sign * order.quantity
+            totals[2] += sign * order.total_amount
+
+    def rows(self, period: str) -> list:
+        # Sorted, so concurrent transactions lock shared rollup rows in the same order
+        return [
+            dict(zip(("bucket",) + DIMENSIONS + MEASURES, key + tuple(totals)))
+            for key, totals in sorted(self.changes[period].items())
+            if totals[0] or totals[1] or totals[2]
+        ]
+
+    async def apply(self, db):
+        """Add the deltas to the rollup tables inside the caller's transaction"""
+        dialect = db.get_bind().dialect.name
+        for period, table in ROLLUPS.items():
+            rows = self.rows(period)
+            if rows:
+                await db.execute(_upsert(dialect, table), rows)
+
+
+def _upsert(dialect: str, table):
+    stmt = (postgresql_insert if dialect == "postgresql" else sqlite_insert)(table)
+    return stmt.on_conflict_do_update(
+        index_elements=["bucket", *DIMENSIONS],
+        set_={name: table.__table__.c[name] + stmt.excluded[name] for name in MEASURES}
+    )
+
+
+async def record_orders(db, orders, sign: int = 1):
+    """Count new orders in the rollups (or deleted ones out, with sign=-1); the caller commits"""
+    deltas = RollupDeltas()
+    for order in orders:
+        deltas.add(order, sign)
+    await deltas.apply(db)
+
+
+async def record_transitions(db, previous: dict, transitions: list):
+    """Move orders to the rollup rows of their new statuses.
+
+    `previous` maps each order id to its ROLLUP_SOURCE row as it was before
+    the change, read in the same transaction. The caller commits.
+    """
+    deltas = RollupDeltas()
+    for transition in transitions:
+        before = previous[transition.order_id]
+        deltas.add(before, -1)
+        deltas.add(before, 1, transition.order_status, transition.payment_status)
+    await deltas.apply(db)
+
+
+async def discard_orders(db, order_ids: list):
+    """Delete orders nobody can pay for and take them out of the rollups; the caller commits"""
+    orders = (await db.execute(
+        select(*ROLLUP_SOURCE).where(Order.id.in_(order_ids)).with_for_update()
+    )).all()
+    await db.execute(delete(OrderStatusHistory).where(OrderStatusHistory.order_id.in_(order_ids)))
+    await db.execute(delete(Order).where(Order.id.in_(order_ids)))
+    await record_orders(db, orders, sign=-1)
+
+
+def rebuild_rollups(db, since: datetime = None, chunk_size: int = 10000) -> int:
+    """Recompute the rollups from orders (from the start of `since`'s day on) in one transaction.
+
+    Returns how many orders were counted. Safe to run while the app takes
+    orders: their deltas land after the rebuilt rows are committed.
+    """
+    since = bucket_of(since, "day") if since else None
+    if db.get_bind().dialect.name == "postgresql":
+        # Blocks rollup writers, not readers; SQLite already serializes writers
+        db.execute(text("LOCK TABLE order_rollups_hourly, order_rollups_daily IN EXCLUSIVE MODE"))
+    for table in ROLLUPS.values():
+        db.execute(delete(table).where(table.bucket >= since) if since else delete(table))
+
+    source = select(*ROLLUP_SOURCE)
+    if since:
+        source = source.where(Order.created_at >= since)
+    deltas = RollupDeltas()
+    counted = 0
+    for order in db.execute(source.execution_options(yield_per=chunk_size)):
+        deltas.add(order)
+        counted += 1
+    for period, table in ROLLUPS.items():
+        rows = deltas.rows(period)
+        if rows:
+            db.execute(insert(table), rows)
+    db.commit()
+    return counted
+
+
+def analytics_query(period: str, start: datetime, end: datetime, group_by=(), series: bool = False,
+                    fuel_type=None, region: str = None, order_status=None):
+    """Totals from the rollups for orders placed in [start, end), per bucket if `series`"""
+    table = ROLLUPS[period]
+    keys = ([table.bucket] if series else []) + [getattr(table, dimension) for dimension in group_by]
+    paid = table.payment_status == PaymentStatus.SUCCESSFUL
+    stmt = (
+        select(
+            *keys,
+            func.sum(table.orders).label("orders"),
+            func.sum(table.liters).label("liters"),
+            func.sum(table.amount).label("amount"),
+            func.sum(case((paid, table.orders), else_=0)).label("paid_orders"),
+            func.sum(case((paid, table.liters), else_=0)).label("paid_liters"),
+            func.sum(case((paid, table.amount), else_=0.0)).label("revenue"),
+            func.sum(case((table.payment_status == PaymentStatus.FAILED, table.orders), else_=0)).label("failed_orders"),
+        )
+        .where(table.bucket >= bucket_of(start, period), table.bucket < end)
+    )
+    if fuel_type is not None:
+        stmt = stmt.where(table.fuel_type == fuel_type)
+    if region is not None:
+        stmt = stmt.where(table.region == region)
+    if order_status is not None:
+        stmt = stmt.where(table.order_status == order_status)
+    # Rows that every order has moved out of are left at zero
+    return stmt.group_by(*keys).having(func.sum(table.orders) != 0).order_by(*keys)
+
+
+def analytics_rows(result) -> list:
+    """Result rows as dicts with the pending -> successful payment conversion rate"""
+    rows = []
+    for row in result:
+        item = dict(row._mapping)
+        item["amount"] = round(item["amount"], 2)
+        item["revenue"] = round(item["revenue"], 2)
+        item["conversion"] = round(item["paid_orders"] / item["orders"], 4)
+        rows.append(item)
+    return rows
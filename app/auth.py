@@ -1,84 +1,157 @@
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
-from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.cache import TTLCache
+from app.config import settings
 from app.database import get_db
-from app.models import User
+from app.models import UsedRefreshToken, User, UserRole
+from app.hashing import pwd_context, password_hash_pool, hash_password, check_password
 from app.schemas import TokenData
+from app.shared_state import shared_state
+from app.tokens import ACCESS, REFRESH, InvalidToken, token_service
 from dotenv import load_dotenv
+import logging
 import os
 
 load_dotenv()
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = logging.getLogger(__name__)
 
 # JWT token security
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
+
+@dataclass(frozen=True)
+class AuthenticatedUser:
+    """Snapshot of the user columns the auth path needs, safe to cache across requests"""
+    id: int
+    full_name: str
+    email: str
+    phone_number: str
+    role: UserRole
+    is_active: bool
+    is_verified: bool
+    token_version: int
+    created_at: datetime
+
+    @classmethod
+    def from_user(cls, user: User) -> "AuthenticatedUser":
+        return cls(
+            id=user.id,
+            full_name=user.full_name,
+            email=user.email,
+            phone_number=user.phone_number,
+            role=user.role,
+            is_active=user.is_active,
+            is_verified=user.is_verified,
+            token_version=user.token_version or 0,
+            created_at=user.created_at,
+        )
+
+# Authenticated users keyed by user id
+user_cache = TTLCache(maxsize=settings.user_cache_size, ttl=settings.user_cache_ttl)
+
+async def invalidate_cached_user(user_id: int):
+    """Drop a user from every worker's auth cache after it changes"""
+    user_cache.delete(user_id)
+    await shared_state.publish("users", {"invalidate": user_id})
+
+shared_state.subscribe("users", lambda message: user_cache.delete(message["invalidate"]), echo=False)
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    return check_password(plain_password, hashed_password)
 
 def get_password_hash(password: str) -> str:
     """Hash a password"""
-    # Truncate password to 72 bytes for bcrypt compatibility
-    if len(password.encode('utf-8')) > 72:
-        password = password[:72]
-    return pwd_context.hash(password)
+    return hash_password(password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """Verify a password on the hashing pool"""
+    return await password_hash_pool.verify(plain_password, hashed_password)
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password on the hashing pool"""
+    return await password_hash_pool.hash(password)
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create a JWT access token"""
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=30)
-    
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, "your-super-secret-jwt-key-change-this-in-production-12345", algorithm="HS256")
-    return encoded_jwt
+    lifetime = expires_delta or timedelta(minutes=settings.access_token_minutes)
+    return token_service.issue(data, ACCESS, lifetime.total_seconds())
 
-def verify_token(token: str, credentials_exception):
+def verify_token(token: str, credentials_exception, token_type: str = ACCESS):
     """Verify and decode a JWT token"""
     try:
-        payload = jwt.decode(token, "your-super-secret-jwt-key-change-this-in-production-12345", algorithms=["HS256"])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-        token_data = TokenData(email=email)
-        return token_data
-    except JWTError:
+        payload = token_service.decode(token, token_type)
+    except InvalidToken:
+        raise credentials_exception
+    email: str = payload.get("sub")
+    if email is None:
         raise credentials_exception
+    return TokenData(
+        email=email,
+        user_id=payload.get("uid"),
+        token_version=payload.get("ver")
+    )
 
-def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
+async def authenticate_user(db: AsyncSession, email: str, password: str) -> Optional[User]:
     """Authenticate a user with email and password"""
-    user = db.query(User).filter(User.email == email).first()
+    result = await db.execute(select(User).where(User.email == email))
+    user = result.scalars().first()
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password_async(password, user.hashed_password):
         return None
+    # Transparently upgrade hashes made with an outdated bcrypt cost
+    if pwd_context.needs_update(user.hashed_password):
+        user.hashed_password = await get_password_hash_async(password)
+        await db.commit()
     return user
 
-def get_current_user(
-    credentials: HTTPAuthorizationCredentials = Depends(security),
-    db: Session = Depends(get_db)
-) -> User:
-    """Get the current authenticated user"""
+def create_user_access_token(user, expires_delta: Optional[timedelta] = None) -> str:
+    """Create an access token carrying the user id and token version"""
+    return create_access_token(
+        data={"sub": user.email, "uid": user.id, "ver": user.token_version or 0},
+        expires_delta=expires_delta
+    )
+
+def create_user_refresh_token(user) -> str:
+    """Create a single-use refresh token, good until it expires, is used or the password changes"""
+    return token_service.issue(
+        {"sub": user.email, "uid": user.id, "ver": user.token_version or 0},
+        REFRESH,
+        timedelta(days=settings.refresh_token_days).total_seconds()
+    )
+
+async def resolve_token_user(token: str, db: AsyncSession, token_type: str = ACCESS) -> AuthenticatedUser:
+    """Resolve a bearer token to its user, raising 401/400 like the HTTP dependency"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    token = credentials.credentials
-    token_data = verify_token(token, credentials_exception)
+    token_data = verify_token(token, credentials_exception, token_type)
     
-    user = db.query(User).filter(User.email == token_data.email).first()
+    user = user_cache.get(token_data.user_id) if token_data.user_id is not None else None
     if user is None:
+        if token_data.user_id is not None:
+            db_user = await db.get(User, token_data.user_id)
+        else:
+            result = await db.execute(select(User).where(User.email == token_data.email))
+            db_user = result.scalars().first()
+        if db_user is None:
+            raise credentials_exception
+        user = AuthenticatedUser.from_user(db_user)
+        user_cache.set(user.id, user)
+    
+    # Tokens issued before a password change carry an older version
+    if token_data.token_version is not None and token_data.token_version != user.token_version:
         raise credentials_exception
     
     if not user.is_active:
@@ -89,7 +162,62 @@ def get_current_user(
     
     return user
 
-def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
+async def use_refresh_token(token: str, db: AsyncSession) -> AuthenticatedUser:
+    """Resolve a refresh token to its user and use it up.
+
+    A refresh token swaps for new tokens once. Presenting it again means
+    it leaked (the legitimate client holds its replacement), so every
+    token of the user is revoked and both parties have to sign in again.
+    """
+    user = await resolve_token_user(token, db, token_type=REFRESH)
+    claims = token_service.decode(token, REFRESH)
+    credentials_exception = HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+    if not claims.get("jti"):
+        raise credentials_exception
+    
+    now = datetime.utcnow()
+    # Nothing older than the longest-lived refresh token can come back
+    await db.execute(delete(UsedRefreshToken).where(UsedRefreshToken.expires_at < now))
+    db.add(UsedRefreshToken(jti=claims["jti"], user_id=user.id, expires_at=datetime.utcfromtimestamp(claims["exp"])))
+    try:
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        logger.warning(f"Refresh token reused for user {user.id}; revoking all of their tokens")
+        await db.execute(update(User).where(User.id == user.id).values(token_version=User.token_version + 1))
+        await db.commit()
+        await invalidate_cached_user(user.id)
+        raise credentials_exception
+    return user
+
+async def get_current_user(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    db: AsyncSession = Depends(get_db)
+) -> AuthenticatedUser:
+    """Get the current authenticated user"""
+    return await resolve_token_user(credentials.credentials, db)
+
+async def get_stream_user(
+    token: Optional[str] = None,
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+    db: AsyncSession = Depends(get_db)
+) -> AuthenticatedUser:
+    """Authenticate streaming clients, which may only be able to pass the token as a query parameter"""
+    if credentials is not None:
+        token = credentials.credentials
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return await resolve_token_user(token, db)
+
+def get_current_active_user(current_user: AuthenticatedUser = Depends(get_current_user)) -> AuthenticatedUser:
     """Get the current active user"""
     if not current_user.is_active:
         raise HTTPException(
@@ -98,6 +226,15 @@ def get_current_active_user(current_user: User = Depends(get_current_user)) -> U
         )
     return current_user
 
+def get_current_admin_user(current_user: AuthenticatedUser = Depends(get_current_active_user)) -> AuthenticatedUser:
+    """Get the current user, requiring the admin role"""
+    if current_user.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin privileges required"
+        )
+    return current_user
+
 def validate_ghana_phone(phone: str) -> bool:
     """Validate Ghana phone number format"""
     import re
@@ -0,0 +1,360 @@
+import asyncio
+import csv
+import json
+import logging
+import uuid
+from collections import deque
+from typing import AsyncIterator
+
+from fastapi import HTTPException, Request, status
+from pydantic import ValidationError
+from sqlalchemy import insert, update
+
+from app.analytics import ROLLUP_SOURCE, discard_orders, record_orders
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import Order, PaymentOutbox
+from app.order_cache import order_cache
+from app.paystack import paystack_service
+from app.schemas import OrderCreate
+
+logger = logging.getLogger(__name__)
+
+CSV_TYPES = ("text/csv", "application/csv")
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+
+# "aggregate" opens one Paystack charge for the whole batch; "per_order" one per row
+CHARGE_MODES = ("aggregate", "per_order")
+
+
+async def _body_lines(request: Request) -> AsyncIterator[str]:
+    """Decoded lines of the request body as they arrive"""
+    pending = b""
+    async for chunk in request.stream():
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8-sig").rstrip("\r")
+    if pending:
+        yield pending.decode("utf-8-sig").rstrip("\r")
+
+
+class _LineFeed:
+    """Lines handed to a csv reader as they arrive"""
+
+    def __init__(self):
+        self.lines = deque()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if not self.lines:
+            raise StopIteration
+        return self.lines.popleft()
+
+
+def _inside_quotes(line: str, quoted: bool) -> bool:
+    """Whether a CSV record is inside a quoted cell after this line, given whether it was before it.
+
+    Follows the csv module: a quote opens a quoted cell only at the start
+    of a cell, and "" inside one is an escaped quote.
+    """
+    cell_start = not quoted
+    i = 0
+    while i < len(line):
+        char = line[i]
+        if quoted:
+            if char == '"':
+                if line[i + 1:i + 2] == '"':
+                    i += 1
+                else:
+                    quoted = False
+        elif char == '"' and cell_start:
+            quoted = True
+        cell_start = char == "," and not quoted
+        i += 1
+    return quoted
+
+
+def _too_many_rows():
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"A bulk request can hold at most {settings.bulk_order_max_rows} orders"
+    )
+
+
+async def read_rows(request: Request) -> list:
+    """Raw rows from a JSON array, NDJSON or CSV body (by Content-Type)"""
+    content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    limit = settings.bulk_order_max_rows
+
+    if content_type in NDJSON_TYPES:
+        rows = []
+        async for line in _body_lines(request):
+            if not line.strip():
+                continue
+            if len(rows) == limit:
+                raise _too_many_rows()
+            try:
+                rows.append(json.loads(line))
+            except json.JSONDecodeError:
+                # Keep the row so it is reported under its own number
+                rows.append(None)
+        return rows
+
+    if content_type in CSV_TYPES:
+        feed = _LineFeed()
+        reader = csv.DictReader(feed)
+        rows = []
+        quoted = seen_header = False
+        async for line in _body_lines(request):
+            if not quoted and not line.strip():
+                continue
+            feed.lines.append(line + "\n")
+            quoted = _inside_quotes(line, quoted)
+            if quoted:
+                continue
+            # The reader is only asked for a row once all of its lines are in
+            if not seen_header:
+                seen_header = True
+                continue
+            if len(rows) == limit:
+                raise _too_many_rows()
+            rows.append(next(reader))
+        # A cell left open at the end of the body
+        rows += list(reader)
+        if len(rows) > limit:
+            raise _too_many_rows()
+        # Empty cells mean "not given", so optional fields fall back to their defaults
+        return [{key: value for key, value in row.items() if value not in ("", None)} for row in rows]
+
+    if content_type == "application/json":
+        try:
+            rows = json.loads(await request.body())
+        except json.JSONDecodeError:
+            raise HTTPException(status_code=400, detail="Body is not valid JSON")
+        if not isinstance(rows, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array of orders")
+        if len(rows) > limit:
+            raise _too_many_rows()
+        return rows
+
+    raise HTTPException(
+        status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+        detail="Send application/json, application/x-ndjson or text/csv"
+    )
+
+
+def validate_rows(rows: list, prices: dict) -> tuple:
+    """Split rows into (row number, OrderCreate, price) to insert and per-row error results"""
+    accepted, rejected = [], []
+    for number, row in enumerate(rows, start=1):
+        try:
+            if not isinstance(row, dict):
+                raise ValueError("Row is not a JSON object")
+            order = OrderCreate.model_validate(row)
+        except ValidationError as e:
+            errors = [{"field": ".".join(str(p) for p in err["loc"]), "message": err["msg"]} for err in e.errors()]
+            rejected.append({"row": number, "status": "invalid", "errors": errors})
+            continue
+        except ValueError as e:
+            rejected.append({"row": number, "status": "invalid", "errors": [{"field": None, "message": str(e)}]})
+            continue
+        price = prices.get(order.fuel_type)
+        if price is None:
+            rejected.append({"row": number, "status": "invalid", "errors": [
+                {"field": "fuel_type", "message": f"No price is set for {order.fuel_type.value} fuel"}
+            ]})
+            continue
+        accepted.append((number, order, price))
+    return accepted, rejected
+
+
+def _order_values(user_id: int, order: OrderCreate, price) -> dict:
+    return {
+        "user_id": user_id,
+        "phone_number": order.phone_number,
+        "email": order.email,
+        "delivery_address": order.delivery_address,
+        "fuel_type": order.fuel_type,
+        "quantity": order.quantity,
+        "price_per_liter": price.price_per_liter,
+        "total_amount": price.price_per_liter * order.quantity,
+        "fuel_price_id": price.id,
+        "delivery_time": order.delivery_time,
+        "delivery_lat": order.delivery_lat,
+        "delivery_lng": order.delivery_lng,
+    }
+
+
+def _created(number: int, order_id: int, values: dict, reference: str, **extra) -> dict:
+    return {
+        "row": number,
+        "status": "created",
+        "order_id": order_id,
+        "reference": reference,
+        "total_amount": values["total_amount"],
+        **extra
+    }
+
+
+async def ndjson_lines(results: AsyncIterator[dict]) -> AsyncIterator[str]:
+    async for result in results:
+        yield json.dumps(result, default=str) + "\n"
+
+
+# Running ingest tasks, so they aren't garbage collected mid-flight
+_tasks = set()
+
+
+async def ingest(user_id: int, email: str, accepted: list, rejected: list, charge: str) -> AsyncIterator[dict]:
+    """Yield per-row results: rejected rows first, then each order once its charge settles, then a summary.
+
+    The work runs in its own task and this generator only relays results,
+    so a client that disconnects mid-stream doesn't leave orders half-charged.
+    """
+    queue = asyncio.Queue()
+    task = asyncio.create_task(_ingest(queue, user_id, email, accepted, rejected, charge))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    while True:
+        result = await queue.get()
+        if result is None:
+            break
+        yield result
+    await task
+
+
+async def _ingest(queue: asyncio.Queue, user_id: int, email: str, accepted: list, rejected: list, charge: str):
+    try:
+        for result in rejected:
+            queue.put_nowait(result)
+        summary = {"rows": len(accepted) + len(rejected), "created": 0, "invalid": len(rejected), "payment_failed": 0}
+        if accepted:
+            await _create_and_charge(queue, summary, user_id, email, accepted, charge)
+        queue.put_nowait({"summary": summary})
+    except Exception:
+        logger.exception("Bulk order ingest failed")
+        queue.put_nowait({"error": "Bulk order ingest failed"})
+    finally:
+        queue.put_nowait(None)
+
+
+async def _create_and_charge(queue: asyncio.Queue, summary: dict, user_id: int, email: str, accepted: list, charge: str):
+    values = [_order_values(user_id, order, price) for _, order, price in accepted]
+    async with AsyncSessionLocal() as db:
+        # One multi-row INSERT for the whole batch
+        result = await db.execute(
+            insert(Order).returning(*ROLLUP_SOURCE, sort_by_parameter_order=True), values
+        )
+        created = result.all()
+        order_ids = [order.id for order in created]
+        await record_orders(db, created)
+
+        if charge == "aggregate":
+            references = [f"FUE_BULK_{uuid.uuid4().hex[:12]}"] * len(order_ids)
+        else:
+            references = [f"FUE_{order_id}_{uuid.uuid4().hex[:8]}" for order_id in order_ids]
+        await db.execute(
+            update(Order),
+            [{"id": order_id, "paystack_reference": ref} for order_id, ref in zip(order_ids, references)]
+        )
+        rows = list(zip((number for number, _, _ in accepted), order_ids, values, references))
+
+        if settings.payment_init_mode == "outbox":
+            # One outbox row per Paystack transaction; the worker charges every order on its reference
+            outbox = (
+                [{"order_id": order_ids[0], "idempotency_key": references[0]}] if charge == "aggregate"
+                else [{"order_id": order_id, "idempotency_key": ref} for order_id, ref in zip(order_ids, references)]
+            )
+            await db.execute(insert(PaymentOutbox), outbox)
+            await db.commit()
+            await order_cache.invalidate(user_id=user_id)
+
+            from app.payment_worker import payment_worker
+            payment_worker.notify()
+            for number, order_id, row_values, ref in rows:
+                queue.put_nowait(_created(number, order_id, row_values, ref,
+                                          payment_status_url=f"/orders/{order_id}/payment"))
+            summary["created"] = len(rows)
+            if charge == "aggregate":
+                summary.update(reference=references[0], payment_status_url=f"/orders/{order_ids[0]}/payment")
+            return
+
+        await db.commit()
+        await order_cache.invalidate(user_id=user_id)
+        if charge == "aggregate":
+            await _charge_aggregate(db, queue, summary, email, rows)
+        else:
+            await _charge_per_order(db, queue, summary, email, rows)
+        # Access codes were written and unpaid orders discarded since the first commit
+        await order_cache.invalidate(order_ids, user_id)
+
+
+async def _charge_aggregate(db, queue: asyncio.Queue, summary: dict, email: str, rows: list):
+    order_ids = [order_id for _, order_id, _, _ in rows]
+    reference = rows[0][3]
+    amount = sum(row_values["total_amount"] for _, _, row_values, _ in rows)
+    response = await paystack_service.initialize_transaction(
+        email=email,
+        amount=amount,
+        reference=reference,
+        metadata={"order_ids": order_ids, "orders": len(order_ids)}
+    )
+    if not response:
+        # Same as a single order: don't keep orders nobody can pay for
+        await discard_orders(db, order_ids)
+        await db.commit()
+        for number, _, _, _ in rows:
+            queue.put_nowait({"row": number, "status": "payment_failed"})
+        summary["payment_failed"] = len(rows)
+        return
+
+    await db.execute(
+        update(Order).where(Order.paystack_reference == reference)
+        .values(paystack_access_code=response["data"]["access_code"])
+    )
+    await db.commit()
+    for number, order_id, row_values, ref in rows:
+        queue.put_nowait(_created(number, order_id, row_values, ref))
+    summary.update(
+        created=len(rows), reference=reference, total_amount=amount,
+        payment_url=response["data"]["authorization_url"]
+    )
+
+
+async def _charge_per_order(db, queue: asyncio.Queue, summary: dict, email: str, rows: list):
+    semaphore = asyncio.Semaphore(settings.bulk_charge_concurrency)
+
+    async def open_charge(row):
+        number, order_id, row_values, ref = row
+        async with semaphore:
+            response = await paystack_service.initialize_transaction(
+                email=row_values["email"] or email,
+                amount=row_values["total_amount"],
+                reference=ref,
+                metadata={"order_id": order_id, "fuel_type": row_values["fuel_type"].value,
+                          "quantity": row_values["quantity"]}
+            )
+        return row, response
+
+    access_codes, failed = [], []
+    for next_charge in asyncio.as_completed([open_charge(row) for row in rows]):
+        (number, order_id, row_values, ref), response = await next_charge
+        if response:
+            access_codes.append({"id": order_id, "paystack_access_code": response["data"]["access_code"]})
+            queue.put_nowait(_created(number, order_id, row_values, ref,
+                                      payment_url=response["data"]["authorization_url"]))
+        else:
+            failed.append(order_id)
+            queue.put_nowait({"row": number, "status": "payment_failed"})
+
+    # Write every outcome with one commit rather than one per row
+    if access_codes:
+        await db.execute(update(Order), access_codes)
+    if failed:
+        await discard_orders(db, failed)
+    await db.commit()
+    summary["created"] = len(access_codes)
+    summary["payment_failed"] = len(failed)
@@ -0,0 +1,177 @@
+from typing import List, Optional
+
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    """Application settings, read from the environment or a .env file"""
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    # Database engine
+    database_url: Optional[str] = None
+    database_replica_url: Optional[str] = None
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_timeout: float = 30.0
+    db_pool_pre_ping: bool = True
+    db_pool_recycle: int = 1800
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_size: int = 268435456
+
+    # Paystack webhooks
+    webhook_batch_size: int = 100
+    webhook_batch_window: float = 0.05
+    webhook_retry_backoff: float = 1.0  # doubles with each failure of an event's batch
+    webhook_retry_max_seconds: float = 60.0
+
+    # Payment reconciliation
+    reconciler_enabled: bool = True
+    reconcile_interval: float = 30.0
+    reconcile_min_age: float = 60.0
+    reconcile_recheck_seconds: float = 120.0
+    reconcile_expire_after: float = 3600.0
+    reconcile_batch_size: int = 200
+    reconcile_concurrency: int = 10
+    reconcile_rate_per_second: float = 20.0
+    verify_cache_ttl: float = 10.0
+
+    # Order tracking
+    tracking_queue_size: int = 100
+    tracking_heartbeat_seconds: float = 15.0
+
+    # Driver dispatch
+    dispatch_enabled: bool = True
+    dispatch_interval: float = 2.0
+    dispatch_batch_size: int = 1000
+    dispatch_cell_degrees: float = 0.005
+    dispatch_max_radius_km: float = 25.0
+
+    # Route planning
+    route_depot_lat: float = 5.6037
+    route_depot_lng: float = -0.1870
+    route_speed_kmh: float = 30.0
+    route_service_minutes: float = 10.0
+    route_max_orders: int = 2000
+
+    # Fuel prices
+    fuel_price_refresh_seconds: float = 30.0
+    fuel_price_max_age: int = 60
+
+    # Password hashing
+    bcrypt_rounds: int = 12
+    password_hash_executor: str = "thread"  # "thread" or "process"
+    password_hash_workers: int = 4
+    password_hash_max_queue: int = 256
+
+    # Serving: `python manage.py serve` runs serve_workers processes. On
+    # SIGTERM a worker fails /health for serve_drain_seconds so load
+    # balancers stop sending it requests, then stops accepting and gives
+    # requests in flight serve_graceful_timeout seconds to finish
+    serve_host: str = "0.0.0.0"
+    serve_port: int = 8000
+    serve_workers: int = 1
+    serve_drain_seconds: float = 0.0
+    serve_graceful_timeout: float = 30.0
+
+    # Shared state (caches, pub/sub, leases for singleton jobs): "memory"
+    # is private to one process; "redis" is shared by every worker and is
+    # required for more than one. SHARED_STATE_BACKEND=redis needs the redis
+    # package from requirements.txt and a server at SHARED_STATE_REDIS_URL
+    shared_state_backend: str = "memory"
+    shared_state_redis_url: Optional[str] = None
+    shared_state_prefix: str = "fuelease:"
+    shared_state_cache_size: int = 10000
+
+    # Rate limiting: "count/period" with period second, minute, hour, day or a
+    # number of seconds. "shared" counts wherever shared state lives, "memory"
+    # per process and "redis" in rate_limit_redis_url (needs the redis package)
+    rate_limit_enabled: bool = True
+    rate_limit_store: str = "shared"
+    rate_limit_redis_url: Optional[str] = None
+    rate_limit_max_keys: int = 100000
+    rate_limit_proxy_hops: int = 0  # trusted proxies in front of the API that append X-Forwarded-For
+    rate_limit_default: str = "600/minute"  # per IP, every route
+    rate_limit_login: str = "20/minute"  # per IP
+    rate_limit_login_account: str = "10/900"  # failed logins per account
+    rate_limit_signup: str = "10/hour"  # per IP
+    rate_limit_orders: str = "30/minute"  # per user
+    rate_limit_orders_bulk: str = "10/minute"  # per user
+    rate_limit_paystack_test: str = "5/minute"  # per IP
+
+    # Metrics, served at /metrics in the Prometheus text format to scrapers
+    # sending "Authorization: Bearer <metrics_token>"; without a token it is
+    # only served if metrics_public, for a port no one outside can reach.
+    # Requests slower than metrics_slow_request_ms are logged with the SQL
+    # they ran (0 turns the log off); one statement run
+    # metrics_repeated_query_threshold times in a request is logged as a likely N+1
+    metrics_enabled: bool = True
+    metrics_token: Optional[str] = None
+    metrics_public: bool = False
+    metrics_slow_request_ms: float = 0.0
+    metrics_slow_request_max_statements: int = 50
+    metrics_repeated_query_threshold: int = 10
+    metrics_loop_interval: float = 0.5
+    metrics_loop_stall_ms: float = 100.0
+
+    # Tokens. jwt_keys is a JSON list of signing keys, each {"kid", "alg"} with
+    # alg HS256, RS256, ES256 or EdDSA, plus "secret" (HS256) or a PEM "key"
+    # or "key_file"; public-only PEMs verify but never sign. New tokens are
+    # signed with jwt_active_kid (default: the first key). Without jwt_keys,
+    # one HS256 key "default" is made from jwt_secret_key
+    jwt_keys: List[dict] = []
+    jwt_active_kid: Optional[str] = None
+    jwt_secret_key: Optional[str] = None
+    jwt_issuer: str = "fuelease"
+    access_token_minutes: int = 30
+    refresh_token_days: int = 30
+    token_cache_size: int = 10000
+
+    # Order read cache, per worker: up to order_cache_orders orders for
+    # GET /orders/{id} and the first pages of GET /orders for up to
+    # order_cache_customers customers, dropped whenever an order changes
+    order_cache_orders: int = 10000
+    order_cache_customers: int = 5000
+    order_cache_ttl: float = 30.0
+
+    # Authenticated user cache
+    user_cache_size: int = 10000
+    user_cache_ttl: float = 60.0
+
+    # Paystack HTTP client
+    paystack_base_url: str = "https://api.paystack.co"
+    paystack_timeout: float = 10.0
+    paystack_connect_timeout: float = 5.0
+    paystack_deadline: float = 20.0  # one call, retries and backoff included
+    paystack_max_connections: int = 50
+    paystack_max_keepalive: int = 20
+    paystack_http2: bool = True
+    paystack_max_retries: int = 2
+    paystack_retry_backoff: float = 0.2
+    paystack_breaker_threshold: int = 5
+    paystack_breaker_reset_seconds: float = 30.0
+
+    # Payment initialization: "inline" calls Paystack inside create_order,
+    # "outbox" commits the order with an outbox row and lets the worker do it
+    payment_init_mode: str = "inline"
+    payment_worker_poll_interval: float = 1.0
+    payment_worker_batch_size: int = 20
+    payment_worker_lease_seconds: float = 60.0
+    payment_worker_max_attempts: int = 5
+    # Rows Paystack might already hold are retried past max_attempts, backing off up to this long
+    payment_worker_max_backoff: float = 300.0
+
+    # Sales analytics; regions are square grid cells of this many degrees
+    analytics_region_degrees: float = 0.25
+    analytics_max_hourly_days: int = 31
+
+    # Order export
+    export_chunk_size: int = 5000
+
+    # Bulk orders
+    bulk_order_max_rows: int = 1000
+    bulk_charge_concurrency: int = 8
+
+
+settings = Settings()
@@ -1,21 +1,104 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.orm import sessionmaker
 import os
-from app.models import Base
+from app.config import settings
+from app.metrics import instrument_engine
 from dotenv import load_dotenv
 
 
 load_dotenv()
 
-engine = create_engine(os.environ.get("DATABASE_URL"), connect_args={"check_same_thread": False})
+# Async drivers used for the request path, keyed by the sync driver name
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+def get_async_url(url: str) -> str:
+    """Translate a sync DATABASE_URL into its async driver equivalent"""
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.drivername)
+    if driver is None:
+        return url
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+def engine_options(url: str) -> dict:
+    """Pool and connect settings for an engine on the given URL"""
+    parsed = make_url(url)
+    options = {}
+    if parsed.get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+        if parsed.database in (None, "", ":memory:"):
+            # In-memory databases use a single shared connection, not a pool
+            return options
+    options.update(
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_pre_ping=settings.db_pool_pre_ping,
+        pool_recycle=settings.db_pool_recycle,
+    )
+    return options
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL lets readers run alongside the writer; busy_timeout waits out the write lock"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute(f"PRAGMA journal_mode={settings.sqlite_journal_mode}")
+    cursor.execute(f"PRAGMA synchronous={settings.sqlite_synchronous}")
+    cursor.execute(f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}")
+    cursor.execute(f"PRAGMA mmap_size={settings.sqlite_mmap_size}")
+    cursor.close()
+
+def build_engine(url: str, use_async: bool = True):
+    """Create a sync or async engine for the URL using the configured profile"""
+    if use_async:
+        engine = create_async_engine(get_async_url(url), **engine_options(url))
+        sync_engine = engine.sync_engine
+    else:
+        engine = sync_engine = create_engine(url, **engine_options(url))
+    if sync_engine.dialect.name == "sqlite":
+        event.listen(sync_engine, "connect", set_sqlite_pragmas)
+    if settings.metrics_enabled:
+        instrument_engine(sync_engine)
+    return engine
+
+DATABASE_URL = settings.database_url
+
+ALEMBIC_CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+
+# Sync engine for scripts and schema management
+engine = build_engine(DATABASE_URL, use_async=False)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-def init_db():
-    Base.metadata.create_all(bind=engine)
+# Async engine used by the API so queries don't block the event loop
+async_engine = build_engine(DATABASE_URL)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+# Read-only endpoints go to the replica when one is configured
+read_engine = build_engine(settings.database_replica_url) if settings.database_replica_url else async_engine
+AsyncReadSessionLocal = async_sessionmaker(read_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
+def run_migrations(revision: str = "head"):
+    """Upgrade the database schema through the Alembic migration chain"""
+    from alembic import command
+    from alembic.config import Config
+    
+    config = Config(ALEMBIC_CONFIG)
+    config.attributes["configure_logger"] = False
+    command.upgrade(config, revision)
 
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
+
+async def get_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+async def dispose_engines():
+    await async_engine.dispose()
+    if read_engine is not async_engine:
+        await read_engine.dispose()
@@ -0,0 +1,368 @@
+import asyncio
+import logging
+import math
+import time
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import select
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import DriverProfile, FuelType, Order, OrderStatus
+from app.shared_state import shared_state
+from app.transitions import OrderTransition, assign_driver, notify_transitions, on_transition
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+
+# Statuses in which an order keeps its driver busy
+ACTIVE_DELIVERY_STATUSES = (OrderStatus.PROCESSING, OrderStatus.EN_ROUTE)
+
+
+def haversine_km(lat1: float, lng1: float, lat2: float, lng2: float) -> float:
+    """Great-circle distance between two points in kilometres"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lng2 - lng1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def parse_fuel_types(value: str) -> frozenset:
+    return frozenset(FuelType(v) for v in value.split(",") if v)
+
+
+def format_fuel_types(fuel_types) -> str:
+    return ",".join(sorted(FuelType(f).value for f in fuel_types))
+
+
+@dataclass
+class DriverState:
+    driver_id: int
+    capacity: int
+    fuel_types: frozenset
+    on_shift: bool = False
+    lat: Optional[float] = None
+    lng: Optional[float] = None
+    order_id: Optional[int] = None
+
+    @property
+    def idle(self) -> bool:
+        return self.on_shift and self.order_id is None and self.lat is not None
+
+    def can_carry(self, fuel_type: FuelType, quantity: int) -> bool:
+        return fuel_type in self.fuel_types and self.capacity >= quantity
+
+
+@dataclass(frozen=True)
+class DispatchOrder:
+    order_id: int
+    lat: float
+    lng: float
+    fuel_type: FuelType
+    quantity: int
+
+
+@dataclass(frozen=True)
+class Assignment:
+    order_id: int
+    driver_id: int
+    distance_km: float
+
+
+class DriverIndex:
+    """Idle drivers bucketed into a fixed lat/lng grid.
+
+    nearest() searches rings of cells outward from the query point and
+    stops once no unsearched ring could hold a closer driver, so a lookup
+    touches a handful of cells instead of every driver.
+    """
+
+    def __init__(self, cell_degrees: float):
+        self.cell_degrees = cell_degrees
+        self.cells = defaultdict(dict)
+        self.cell_of = {}
+
+    def __len__(self):
+        return len(self.cell_of)
+
+    def __contains__(self, driver_id: int):
+        return driver_id in self.cell_of
+
+    def _cell(self, lat: float, lng: float) -> tuple:
+        return (math.floor(lat / self.cell_degrees), math.floor(lng / self.cell_degrees))
+
+    def insert(self, driver: DriverState):
+        self.remove(driver.driver_id)
+        cell = self._cell(driver.lat, driver.lng)
+        self.cells[cell][driver.driver_id] = driver
+        self.cell_of[driver.driver_id] = cell
+
+    def remove(self, driver_id: int):
+        cell = self.cell_of.pop(driver_id, None)
+        if cell is None:
+            return
+        bucket = self.cells[cell]
+        bucket.pop(driver_id, None)
+        if not bucket:
+            del self.cells[cell]
+
+    def _ring(self, row: int, col: int, k: int):
+        if k == 0:
+            yield (row, col)
+            return
+        for c in range(col - k, col + k + 1):
+            yield (row - k, c)
+            yield (row + k, c)
+        for r in range(row - k + 1, row + k):
+            yield (r, col - k)
+            yield (r, col + k)
+
+    def nearest(self, lat: float, lng: float, accept, max_km: float):
+        """Closest driver within max_km that accept(driver) allows, as (driver, km)"""
+        row, col = self._cell(lat, lng)
+        # Narrowest side of a cell here; cells k rings out are at least (k - 1) of these away
+        cell_km = self.cell_degrees * KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01)
+        max_rings = int(max_km / cell_km) + 1
+        best, best_km = None, max_km
+        for k in range(max_rings + 1):
+            if best is not None and best_km <= (k - 1) * cell_km:
+                break
+            for cell in self._ring(row, col, k):
+                bucket = self.cells.get(cell)
+                if not bucket:
+                    continue
+                for driver in bucket.values():
+                    distance = haversine_km(lat, lng, driver.lat, driver.lng)
+                    if distance <= best_km and accept(driver):
+                        best, best_km = driver, distance
+        return (best, best_km) if best is not None else None
+
+
+def assign_batch(orders: list, index: DriverIndex, max_km: float) -> list:
+    """Greedily give each order, oldest first, the nearest idle driver that can carry it.
+
+    Assigned drivers leave the index, so each driver takes one order per batch.
+    """
+    assignments = []
+    for order in orders:
+        match = index.nearest(
+            order.lat, order.lng,
+            lambda driver: driver.can_carry(order.fuel_type, order.quantity),
+            max_km
+        )
+        if match is None:
+            continue
+        driver, distance = match
+        index.remove(driver.driver_id)
+        driver.order_id = order.order_id
+        assignments.append(Assignment(order.order_id, driver.driver_id, distance))
+    return assignments
+
+
+class Dispatcher:
+    """Assigns confirmed orders to the nearest available driver.
+
+    Driver positions live in memory, fed by /drivers/location. Every
+    DISPATCH_INTERVAL seconds the oldest unassigned confirmed orders are
+    matched against the idle-driver index and the assignments written with
+    a conditional update, so an order is never handed out twice. Driver
+    changes are broadcast so every worker holds the same state, and only
+    the worker holding the "dispatch" lease matches, so a driver is never
+    handed two orders by two workers at once.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal):
+        self.session_factory = session_factory
+        self.drivers = {}
+        self.index = DriverIndex(settings.dispatch_cell_degrees)
+        self.assignments = {}
+        self._task = None
+        self.ticks = 0
+        self.assigned = 0
+        self.backlog = 0
+        self.last_tick_ms = 0.0
+
+    async def load(self):
+        """Rebuild driver state from profiles and deliveries in progress"""
+        async with self.session_factory() as db:
+            profiles = (await db.execute(select(DriverProfile))).scalars().all()
+            active = (await db.execute(
+                select(Order.id, Order.driver_id)
+                .where(Order.driver_id.is_not(None), Order.order_status.in_(ACTIVE_DELIVERY_STATUSES))
+            )).all()
+        for profile in profiles:
+            self._set_profile(profile.user_id, profile.capacity_liters,
+                              parse_fuel_types(profile.fuel_types), profile.is_available)
+        for order_id, driver_id in active:
+            self._assign(order_id, driver_id)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await shared_state.resign("dispatch")
+
+    async def _run(self):
+        while True:
+            try:
+                # The lease outlives a few missed ticks before another worker takes over
+                if await shared_state.lead("dispatch", settings.dispatch_interval * 3):
+                    await self.run_once()
+            except Exception:
+                logger.exception("Dispatch tick failed")
+            await asyncio.sleep(settings.dispatch_interval)
+
+    def _reindex(self, driver: DriverState):
+        if driver.idle:
+            self.index.insert(driver)
+        else:
+            self.index.remove(driver.driver_id)
+
+    def _set_profile(self, driver_id: int, capacity: int, fuel_types: frozenset, on_shift: bool):
+        driver = self.drivers.get(driver_id)
+        if driver is None:
+            driver = self.drivers[driver_id] = DriverState(driver_id, capacity, fuel_types)
+        driver.capacity = capacity
+        driver.fuel_types = fuel_types
+        driver.on_shift = on_shift
+        self._reindex(driver)
+
+    def _update_position(self, driver_id: int, lat: float, lng: float):
+        driver = self.drivers.get(driver_id)
+        if driver is None:
+            return
+        driver.lat, driver.lng = lat, lng
+        self._reindex(driver)
+
+    def _assign(self, order_id: int, driver_id: int):
+        driver = self.drivers.get(driver_id)
+        if driver is not None:
+            driver.order_id = order_id
+            self.assignments[order_id] = driver_id
+            self._reindex(driver)
+
+    def _release(self, order_id: int):
+        driver_id = self.assignments.pop(order_id, None)
+        driver = self.drivers.get(driver_id)
+        if driver is not None and driver.order_id == order_id:
+            driver.order_id = None
+            self._reindex(driver)
+
+    def apply(self, message: dict):
+        """Apply a driver change broadcast by another worker"""
+        event = message["event"]
+        if event == "profile":
+            self._set_profile(message["driver_id"], message["capacity"],
+                              parse_fuel_types(message["fuel_types"]), message["on_shift"])
+        elif event == "position":
+            self._update_position(message["driver_id"], message["lat"], message["lng"])
+        elif event == "assigned":
+            self._assign(message["order_id"], message["driver_id"])
+        elif event == "released":
+            self._release(message["order_id"])
+
+    async def set_profile(self, driver_id: int, capacity: int, fuel_types: frozenset, on_shift: bool):
+        self._set_profile(driver_id, capacity, fuel_types, on_shift)
+        await shared_state.publish("dispatch", {
+            "event": "profile", "driver_id": driver_id, "capacity": capacity,
+            "fuel_types": format_fuel_types(fuel_types), "on_shift": on_shift,
+        })
+
+    async def update_position(self, driver_id: int, lat: float, lng: float):
+        self._update_position(driver_id, lat, lng)
+        await shared_state.publish("dispatch", {"event": "position", "driver_id": driver_id, "lat": lat, "lng": lng})
+
+    async def release(self, order_id: int):
+        if order_id in self.assignments:
+            self._release(order_id)
+            await shared_state.publish("dispatch", {"event": "released", "order_id": order_id})
+
+    async def on_transition(self, transition: OrderTransition):
+        if transition.order_status not in ACTIVE_DELIVERY_STATUSES:
+            await self.release(transition.order_id)
+
+    async def run_once(self) -> list:
+        started = time.perf_counter()
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(Order.id, Order.delivery_lat, Order.delivery_lng, Order.fuel_type, Order.quantity)
+                .where(
+                    Order.order_status == OrderStatus.CONFIRMED,
+                    Order.driver_id.is_(None),
+                    Order.delivery_lat.is_not(None)
+                )
+                .order_by(Order.created_at, Order.id)
+                .limit(settings.dispatch_batch_size)
+            )
+            orders = [DispatchOrder(*row) for row in result.all()]
+            if not orders:
+                self.backlog = 0
+                return []
+
+            assignments = assign_batch(orders, self.index, settings.dispatch_max_radius_km)
+            transitions = []
+            shared = []
+            try:
+                for assignment in assignments:
+                    assigned = await assign_driver(db, assignment.order_id, assignment.driver_id)
+                    if assigned:
+                        self.assignments[assignment.order_id] = assignment.driver_id
+                        shared.append({"event": "assigned", "order_id": assignment.order_id,
+                                       "driver_id": assignment.driver_id})
+                        transitions += assigned
+                    else:
+                        # The order moved on (cancelled, assigned elsewhere) since we read it
+                        driver = self.drivers[assignment.driver_id]
+                        driver.order_id = None
+                        self._reindex(driver)
+                await db.commit()
+            except Exception:
+                # Nothing was written, so every matched driver is idle again
+                for assignment in assignments:
+                    if self.assignments.get(assignment.order_id) == assignment.driver_id:
+                        del self.assignments[assignment.order_id]
+                    driver = self.drivers[assignment.driver_id]
+                    driver.order_id = None
+                    self._reindex(driver)
+                raise
+        for message in shared:
+            await shared_state.publish("dispatch", message)
+        await notify_transitions(transitions)
+
+        self.ticks += 1
+        self.assigned += len(transitions)
+        self.backlog = len(orders) - len(transitions)
+        self.last_tick_ms = (time.perf_counter() - started) * 1000
+        logger.info(f"Dispatched {len(transitions)} of {len(orders)} waiting orders")
+        return assignments
+
+    def stats(self) -> dict:
+        return {
+            "leader": "dispatch" in shared_state.leases,
+            "drivers": len(self.drivers),
+            "idle_drivers": len(self.index),
+            "active_deliveries": len(self.assignments),
+            "ticks": self.ticks,
+            "assigned": self.assigned,
+            "backlog": self.backlog,
+            "last_tick_ms": round(self.last_tick_ms, 2),
+        }
+
+
+dispatcher = Dispatcher()
+on_transition(dispatcher.on_transition)
+shared_state.subscribe("dispatch", dispatcher.apply, echo=False)
@@ -0,0 +1,156 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator
+
+from sqlalchemy import DateTime, Enum as SAEnum, select
+
+from app.config import settings
+from app.database import AsyncReadSessionLocal
+from app.models import Order
+from app.pagination import encode_cursor, keyset_after
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Parquet export is optional
+    pa = pq = None
+
+# Columns in an export, in order; each row also gets a resume cursor
+EXPORT_COLUMNS = [
+    Order.id, Order.created_at, Order.updated_at, Order.user_id, Order.customer_name,
+    Order.phone_number, Order.email, Order.delivery_address, Order.fuel_type, Order.quantity,
+    Order.price_per_liter, Order.total_amount, Order.fuel_price_id, Order.delivery_time,
+    Order.order_status, Order.payment_status, Order.paystack_reference, Order.driver_id,
+]
+FIELDS = [column.key for column in EXPORT_COLUMNS] + ["cursor"]
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def parquet_available() -> bool:
+    return pq is not None
+
+
+def export_query(created_from: datetime = None, created_to: datetime = None,
+                 order_status=None, fuel_type=None, cursor: str = None):
+    """Orders oldest first, filtered, starting after `cursor`; raises ValueError on a bad cursor"""
+    stmt = select(*EXPORT_COLUMNS)
+    if created_from is not None:
+        stmt = stmt.where(Order.created_at >= created_from)
+    if created_to is not None:
+        stmt = stmt.where(Order.created_at < created_to)
+    if order_status is not None:
+        stmt = stmt.where(Order.order_status == order_status)
+    if fuel_type is not None:
+        stmt = stmt.where(Order.fuel_type == fuel_type)
+    return keyset_after(stmt, Order.created_at, Order.id, cursor)
+
+
+# Positions of the columns that need turning into plain strings
+_DATETIMES = [i for i, column in enumerate(EXPORT_COLUMNS) if isinstance(column.type, DateTime)]
+_ENUMS = [i for i, column in enumerate(EXPORT_COLUMNS) if isinstance(column.type, SAEnum)]
+
+
+def _records(chunk) -> list:
+    records = []
+    for row in chunk:
+        record = list(row)
+        for i in _DATETIMES:
+            if record[i] is not None:
+                record[i] = record[i].isoformat()
+        for i in _ENUMS:
+            if record[i] is not None:
+                record[i] = record[i].value
+        record.append(encode_cursor(row.created_at, row.id))
+        records.append(record)
+    return records
+
+
+async def _chunks(stmt) -> AsyncIterator[list]:
+    """Rows in chunks from a server-side cursor, never the whole result at once"""
+    async with AsyncReadSessionLocal() as db:
+        result = await db.stream(stmt.execution_options(yield_per=settings.export_chunk_size))
+        async for chunk in result.partitions():
+            yield _records(chunk)
+
+
+async def _csv(stmt) -> AsyncIterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(FIELDS)
+    async for records in _chunks(stmt):
+        writer.writerows(records)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+async def _ndjson(stmt) -> AsyncIterator[str]:
+    async for records in _chunks(stmt):
+        yield "".join(json.dumps(dict(zip(FIELDS, record))) + "\n" for record in records)
+
+
+class _Sink(io.RawIOBase):
+    """Write-only file that hands back whatever was written since the last drain"""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def _parquet_schema():
+    return pa.schema([
+        ("id", pa.int64()), ("created_at", pa.string()), ("updated_at", pa.string()),
+        ("user_id", pa.int64()), ("customer_name", pa.string()), ("phone_number", pa.string()),
+        ("email", pa.string()), ("delivery_address", pa.string()), ("fuel_type", pa.string()),
+        ("quantity", pa.int64()), ("price_per_liter", pa.float64()), ("total_amount", pa.float64()),
+        ("fuel_price_id", pa.int64()), ("delivery_time", pa.string()), ("order_status", pa.string()),
+        ("payment_status", pa.string()), ("paystack_reference", pa.string()), ("driver_id", pa.int64()),
+        ("cursor", pa.string()),
+    ])
+
+
+async def _parquet(stmt) -> AsyncIterator[bytes]:
+    # Each chunk becomes one row group, flushed to the client as soon as it is written
+    schema = _parquet_schema()
+    sink = _Sink()
+    writer = pq.ParquetWriter(sink, schema)
+    async for records in _chunks(stmt):
+        columns = list(zip(*records))
+        writer.write_table(pa.Table.from_arrays(
+            [pa.array(values, type=f.type) for values, f in zip(columns, schema)], schema=schema
+        ))
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+WRITERS = {"csv": _csv, "ndjson": _ndjson, "parquet": _parquet}
+
+
+def export_orders(stmt, fmt: str) -> AsyncIterator:
+    """Stream the query's rows in the given format, chunk by chunk"""
+    return WRITERS[fmt](stmt)
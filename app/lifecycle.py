@@ -0,0 +1,80 @@
+import asyncio
+import logging
+import signal
+import threading
+from typing import Optional
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_drain_listeners = []
+
+
+def on_drain(listener):
+    """Register a callable to run when this worker starts draining"""
+    _drain_listeners.append(listener)
+    return listener
+
+
+class Lifecycle:
+    """Whether this worker is draining: told to stop and finishing what it has.
+
+    The server's own SIGTERM/SIGINT handling stays in charge of shutting
+    down; handlers chained in front of it mark the worker draining first,
+    so /health turns load balancers away and long-lived tracking streams
+    tell their clients to reconnect elsewhere instead of holding shutdown
+    open until the graceful timeout. SIGTERM reaches the server only after
+    SERVE_DRAIN_SECONDS; a second signal, or SIGINT, passes straight on.
+    """
+
+    def __init__(self):
+        self.draining = asyncio.Event()
+        self.reason: Optional[str] = None
+        self._previous = {}
+
+    def drain(self, reason: str):
+        if self.draining.is_set():
+            return
+        self.reason = reason
+        self.draining.set()
+        logger.info(f"Draining ({reason})")
+        for listener in _drain_listeners:
+            try:
+                listener()
+            except Exception:
+                logger.exception("Drain listener failed")
+
+    def install_signal_handlers(self):
+        # Only the main thread may set handlers; test clients run the app on another
+        if threading.current_thread() is not threading.main_thread():
+            return
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            previous = signal.getsignal(sig)
+            if not callable(previous):
+                continue
+
+            def handler(signum, frame, previous=previous):
+                name = signal.Signals(signum).name
+                delay = settings.serve_drain_seconds if signum == signal.SIGTERM else 0
+                if self.draining.is_set() or not delay:
+                    loop.call_soon_threadsafe(self.drain, name)
+                    previous(signum, frame)
+                    return
+                loop.call_soon_threadsafe(self.drain, name)
+                loop.call_soon_threadsafe(loop.call_later, delay, previous, signum, None)
+
+            self._previous[sig] = previous
+            signal.signal(sig, handler)
+
+    def restore_signal_handlers(self):
+        for sig, previous in self._previous.items():
+            signal.signal(sig, previous)
+        self._previous.clear()
+
+    def stats(self) -> dict:
+        return {"draining": self.draining.is_set(), "reason": self.reason}
+
+
+lifecycle = Lifecycle()
@@ -1,24 +1,60 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Request
+from fastapi import FastAPI, Depends, HTTPException, status, Request, Query, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, RedirectResponse
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi.responses import JSONResponse, ORJSONResponse, RedirectResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from contextlib import asynccontextmanager
+import asyncio
+import json
+import secrets
 import uuid
 from datetime import datetime, timedelta
 import os
 
-from app.database import get_db, init_db
-from app.models import Order, FuelType, OrderStatus, PaymentStatus, User, UserRole
+from app.database import AsyncSessionLocal, get_db, get_read_db, dispose_engines
+from app.config import settings
+from app.conditional import etag_matches
+from app.models import (
+    Order, FuelType, OrderStatus, PaymentStatus, User, UserRole, PaymentOutbox, DriverProfile, OrderStatusHistory
+)
+from app.analytics import DIMENSIONS, ROLLUPS, analytics_query, analytics_rows, discard_orders, record_orders
+from app.dispatch import ACTIVE_DELIVERY_STATUSES, dispatcher, format_fuel_types, parse_fuel_types
+from app.bulk_orders import CHARGE_MODES, ingest, ndjson_lines, read_rows, validate_rows
+from app.export import MEDIA_TYPES, export_orders, export_query, parquet_available
+from app.order_cache import order_cache
+from app.pagination import keyset_page, split_page
+from app.projection import order_dicts, order_fields, select_orders
+from app.pricing import fuel_price_service
+from app.metrics import MetricsMiddleware, loop_monitor, mark_worker_stopped, render_metrics
+from app.ratelimit import RATE_LIMIT_HEADERS, RateLimitMiddleware, limit_per_user, rate_limit_exceeded, rate_limiter
 from app.paystack import paystack_service
+from app.payment_worker import payment_worker
+from app.reconciler import payment_outcome, payment_reconciler
+from app.routing import plan_routes, plannable_orders, stops_from_orders
+from app.lifecycle import lifecycle
+from app.shared_state import shared_state
+from app.tokens import token_service
+from app.tracking import SlowConsumer, WorkerDraining, tracking_hub
+from app.transitions import (
+    DELIVERY_STEPS, advance_delivery, apply_payment_result, notify_transitions, transition_stats
+)
+from app.webhooks import verify_signature, webhook_processor
 
 from app.schemas import (
-    OrderCreate, OrderResponse, OrderStatus, OrderWithPaymentResponse,
-    UserCreate, UserLogin, UserResponse, Token, UserUpdate, PasswordChange
+    OrderCreate, OrderResponse, OrderStatus, OrderWithPaymentResponse, PaymentInitResponse, OrderPage,
+    UserCreate, UserLogin, UserResponse, Token, RefreshRequest, UserUpdate, UserRoleUpdate, PasswordChange,
+    FuelPriceUpdate, DriverLocationUpdate, DriverProfileUpdate, DriverProfileResponse, DeliveryStatusUpdate,
+    RoutePlanRequest, RoutePlanResponse, AnalyticsResponse, OrderStatusChange
 )
 from app.auth import (
-    authenticate_user, create_access_token, get_current_user, get_current_active_user,
-    get_password_hash, verify_password, validate_ghana_phone, validate_password_strength
+    AuthenticatedUser, authenticate_user, create_user_access_token, create_user_refresh_token, get_current_user,
+    get_current_active_user, get_current_admin_user, get_stream_user, resolve_token_user, get_password_hash_async,
+    verify_password_async, invalidate_cached_user, use_refresh_token, user_cache,
+    validate_ghana_phone, validate_password_strength
 )
+from app.hashing import HashPoolBusy, password_hash_pool
 import logging
 from fastapi.responses import HTMLResponse
 
@@ -27,12 +63,57 @@ from dotenv import load_dotenv
 import os
 
 load_dotenv()
-app = FastAPI(title="Fuelease Ghana API", version="1.0.0")
+
+# Schema changes are applied ahead of time with `python manage.py migrate`
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start this worker's background work and pools, and stop them in reverse once it has drained"""
+    lifecycle.install_signal_handlers()
+    await shared_state.start()
+    if settings.metrics_enabled:
+        loop_monitor.start()
+        if not (settings.metrics_token or settings.metrics_public):
+            logger.warning("/metrics is off until METRICS_TOKEN is set (or METRICS_PUBLIC=true on an internal network)")
+    await tracking_hub.start()
+    await webhook_processor.start()
+    if settings.payment_init_mode == "outbox":
+        payment_worker.start()
+    if settings.reconciler_enabled:
+        payment_reconciler.start()
+    await dispatcher.load()
+    if settings.dispatch_enabled:
+        dispatcher.start()
+
+    yield
+
+    # Requests in flight have finished (or hit the graceful timeout); end any streams left
+    lifecycle.drain("shutdown")
+    await dispatcher.stop()
+    await payment_reconciler.stop()
+    await payment_worker.stop()
+    await webhook_processor.stop()
+    await tracking_hub.broker.close()
+    await rate_limiter.close()
+    password_hash_pool.shutdown()
+    await paystack_service.aclose()
+    await loop_monitor.stop()
+    await shared_state.close()
+    await dispose_engines()
+    mark_worker_stopped()
+    lifecycle.restore_signal_handlers()
+
+# orjson renders responses several times faster than the stdlib encoder
+app = FastAPI(
+    title="Fuelease Ghana API", version="1.0.0", default_response_class=ORJSONResponse, lifespan=lifespan
+)
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# Per-IP rate limits; added first so CORS wraps it and 429s stay readable by the browser
+app.add_middleware(RateLimitMiddleware)
+
 # CORS middleware
 # CORS middleware - Updated configuration
 app.add_middleware(
@@ -56,14 +137,21 @@ app.add_middleware(
         "Access-Control-Allow-Headers",
         "Access-Control-Allow-Methods"
     ],
-    expose_headers=["Content-Length", "Content-Type"],
+    expose_headers=["Content-Length", "Content-Type", "Retry-After", *RATE_LIMIT_HEADERS],
     max_age=3600,
 )
 
-# Initialize database
-@app.on_event("startup")
-def on_startup():
-    init_db()
+# Outermost, so request timings include everything below it, 429s and CORS preflights too
+app.add_middleware(MetricsMiddleware)
+
+@app.exception_handler(HashPoolBusy)
+async def hash_pool_busy_handler(request: Request, exc: HashPoolBusy):
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"detail": "Server is busy, please retry shortly"},
+        headers={"Retry-After": "1"},
+    )
+
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -76,8 +164,8 @@ BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # Authentication endpoints
 @app.post("/auth/signup", response_model=UserResponse)
-async def signup(user: UserCreate, db: Session = Depends(get_db)):
-    """Create a new user account"""
+async def signup(user: UserCreate, db: AsyncSession = Depends(get_db)):
+    """Create a new customer account; only an admin can make a user a driver or admin"""
     
     # Validate phone number
     if not validate_ghana_phone(user.phone_number):
@@ -94,9 +182,10 @@ async def signup(user: UserCreate, db: Session = Depends(get_db)):
         )
     
     # Check if user already exists
-    existing_user = db.query(User).filter(
+    result = await db.execute(select(User).where(
         (User.email == user.email) | (User.phone_number == user.phone_number)
-    ).first()
+    ))
+    existing_user = result.scalars().first()
     
     if existing_user:
         if existing_user.email == user.email:
@@ -111,27 +200,36 @@ async def signup(user: UserCreate, db: Session = Depends(get_db)):
             )
     
     # Create new user
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await get_password_hash_async(user.password)
     db_user = User(
         full_name=user.full_name,
         email=user.email,
         phone_number=user.phone_number,
         hashed_password=hashed_password,
-        role=user.role
+        role=UserRole.CUSTOMER
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     return db_user
 
 @app.post("/auth/login", response_model=Token)
-async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
+async def login(user_credentials: UserLogin, db: AsyncSession = Depends(get_db)):
     """Authenticate user and return access token"""
     
-    user = authenticate_user(db, user_credentials.email, user_credentials.password)
+    # Refuse before bcrypt once an account has seen too many failed attempts
+    account = user_credentials.email.strip().lower()
+    if settings.rate_limit_enabled:
+        decision = await rate_limiter.hit("login_account", account, amount=0)
+        if decision and not decision.allowed:
+            raise rate_limit_exceeded(decision)
+    
+    user = await authenticate_user(db, user_credentials.email, user_credentials.password)
     if not user:
+        if settings.rate_limit_enabled:
+            await rate_limiter.hit("login_account", account)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -144,30 +242,43 @@ async def login(user_credentials: UserLogin, db: Session = Depends(get_db)):
             detail="Inactive user account"
         )
     
-    access_token_expires = timedelta(minutes=30)
-    access_token = create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
-    )
-    
     return {
-        "access_token": access_token,
+        "access_token": create_user_access_token(user),
+        "refresh_token": create_user_refresh_token(user),
+        "token_type": "bearer",
+        "user": user
+    }
+
+@app.post("/auth/refresh", response_model=Token)
+async def refresh_access_token(body: RefreshRequest, db: AsyncSession = Depends(get_db)):
+    """Swap a refresh token, once, for a new access token and refresh token, without the password"""
+    # Changing the password bumps token_version, which revokes outstanding refresh tokens too
+    user = await use_refresh_token(body.refresh_token, db)
+    return {
+        "access_token": create_user_access_token(user),
+        "refresh_token": create_user_refresh_token(user),
         "token_type": "bearer",
         "user": user
     }
 
+@app.get("/.well-known/jwks.json")
+async def get_jwks():
+    """Public keys other services can verify our tokens with"""
+    return ORJSONResponse(token_service.jwks(), headers={"Cache-Control": "public, max-age=300"})
+
 
 
 
 @app.get("/auth/me", response_model=UserResponse)
-async def get_current_user_info(current_user: User = Depends(get_current_active_user)):
+async def get_current_user_info(current_user: AuthenticatedUser = Depends(get_current_active_user)):
     """Get current user information"""
     return current_user
 
 @app.put("/auth/profile", response_model=UserResponse)
 async def update_profile(
     user_update: UserUpdate,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: AuthenticatedUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """Update user profile"""
     
@@ -180,10 +291,11 @@ async def update_profile(
             )
         
         # Check if phone number is already taken
-        existing_user = db.query(User).filter(
+        result = await db.execute(select(User).where(
             User.phone_number == user_update.phone_number,
             User.id != current_user.id
-        ).first()
+        ))
+        existing_user = result.scalars().first()
         
         if existing_user:
             raise HTTPException(
@@ -192,28 +304,32 @@ async def update_profile(
             )
     
     # Update user fields
+    user = await db.get(User, current_user.id)
     if user_update.full_name is not None:
-        current_user.full_name = user_update.full_name
+        user.full_name = user_update.full_name
     if user_update.phone_number is not None:
-        current_user.phone_number = user_update.phone_number
+        user.phone_number = user_update.phone_number
     if user_update.is_active is not None:
-        current_user.is_active = user_update.is_active
+        user.is_active = user_update.is_active
     
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    await db.refresh(user)
+    await invalidate_cached_user(user.id)
     
-    return current_user
+    return user
 
 @app.post("/auth/change-password")
 async def change_password(
     password_change: PasswordChange,
-    current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: AuthenticatedUser = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_db)
 ):
     """Change user password"""
     
+    user = await db.get(User, current_user.id)
+    
     # Verify current password
-    if not verify_password(password_change.current_password, current_user.hashed_password):
+    if not await verify_password_async(password_change.current_password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Incorrect current password"
@@ -226,11 +342,18 @@ async def change_password(
             detail="New password must be at least 6 characters long"
         )
     
-    # Update password
-    current_user.hashed_password = get_password_hash(password_change.new_password)
-    db.commit()
+    # Update password and revoke tokens issued with the old one
+    user.hashed_password = await get_password_hash_async(password_change.new_password)
+    user.token_version = (user.token_version or 0) + 1
+    await db.commit()
+    await invalidate_cached_user(user.id)
     
-    return {"message": "Password updated successfully"}
+    return {
+        "message": "Password updated successfully",
+        "access_token": create_user_access_token(user),
+        "refresh_token": create_user_refresh_token(user),
+        "token_type": "bearer"
+    }
 
 @app.get("/auth/demo-accounts")
 async def get_demo_accounts():
@@ -253,36 +376,169 @@ async def get_demo_accounts():
         }
     }
 
+@app.get("/admin/stats")
+async def get_stats(current_user: AuthenticatedUser = Depends(get_current_admin_user)):
+    """Get runtime statistics for internal pools and caches"""
+    return {
+        "password_hashing": password_hash_pool.stats(),
+        "user_cache": user_cache.stats(),
+        "paystack": paystack_service.stats(),
+        "webhooks": webhook_processor.stats(),
+        "reconciler": payment_reconciler.stats(),
+        "tracking": tracking_hub.stats(),
+        "dispatch": dispatcher.stats(),
+        "rate_limit": rate_limiter.stats(),
+        "event_loop": loop_monitor.stats(),
+        "tokens": token_service.stats(),
+        "transitions": transition_stats.as_dict(),
+        "order_cache": order_cache.stats(),
+        "shared_state": shared_state.stats(),
+        "lifecycle": lifecycle.stats()
+    }
+
+@app.put("/admin/users/{user_id}/role", response_model=UserResponse)
+async def set_user_role(
+    user_id: int,
+    role_update: UserRoleUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: AuthenticatedUser = Depends(get_current_admin_user)
+):
+    """Make a user a customer, driver or admin"""
+    user = await db.get(User, user_id)
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User not found")
+    if user.id == current_user.id and role_update.role != UserRole.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Admins cannot remove their own admin role"
+        )
+    
+    user.role = role_update.role
+    await db.commit()
+    await db.refresh(user)
+    await invalidate_cached_user(user.id)
+    logger.info(f"User {user.id} made {user.role.value} by admin {current_user.id}")
+    
+    return user
+
+@app.get("/health", include_in_schema=False)
+async def health():
+    """Readiness for load balancers: 503 once this worker is draining"""
+    if lifecycle.draining.is_set():
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content={"status": "draining"})
+    return {"status": "ok"}
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics(request: Request):
+    """Request, database, Paystack, password hashing and event loop metrics for Prometheus"""
+    # Route and query latencies are nobody else's business: without a token it's served only when made public
+    if not settings.metrics_enabled or not (settings.metrics_token or settings.metrics_public):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    if settings.metrics_token:
+        supplied = request.headers.get("authorization", "")
+        if not secrets.compare_digest(supplied.encode(), f"Bearer {settings.metrics_token}".encode()):
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Invalid metrics token",
+                headers={"WWW-Authenticate": "Bearer"},
+            )
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
 @app.get("/fuel-prices")
-async def get_fuel_prices():
+async def get_fuel_prices(request: Request):
     """Get current fuel prices in Ghana"""
+    snapshot = await fuel_price_service.get_snapshot()
+    headers = {
+        "ETag": snapshot.etag,
+        "Cache-Control": f"public, max-age={settings.fuel_price_max_age}"
+    }
+    if etag_matches(request.headers.get("if-none-match"), snapshot.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    body = {fuel.value: entry.price_per_liter for fuel, entry in snapshot.prices.items()}
+    body["versions"] = {fuel.value: entry.id for fuel, entry in snapshot.prices.items()}
+    body["currency"] = "GHS"
+    body["last_updated"] = snapshot.last_updated.isoformat() if snapshot.last_updated else None
+    return ORJSONResponse(content=body, headers=headers)
+
+@app.put("/admin/fuel-prices/{fuel_type}")
+async def set_fuel_price(
+    fuel_type: FuelType,
+    price_update: FuelPriceUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: AuthenticatedUser = Depends(get_current_admin_user)
+):
+    """Set a new price for a fuel type, effective now or at a future time"""
+    if price_update.price_per_liter <= 0:
+        raise HTTPException(status_code=400, detail="Price must be positive")
+    
+    price = await fuel_price_service.set_price(
+        db, fuel_type, price_update.price_per_liter, price_update.effective_from
+    )
     return {
-        "regular": 12.50,
-        "premium": 14.80,
-        "diesel": 13.20,
-        "currency": "GHS",
-        "last_updated": datetime.utcnow().isoformat()
+        "id": price.id,
+        "fuel_type": fuel_type.value,
+        "price_per_liter": price.price_per_liter,
+        "effective_from": price.effective_from.isoformat()
     }
 
-@app.post("/orders", response_model=OrderWithPaymentResponse)
+@app.post("/admin/routes/plan", response_model=RoutePlanResponse)
+async def plan_delivery_routes(
+    plan_request: RoutePlanRequest,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: AuthenticatedUser = Depends(get_current_admin_user)
+):
+    """Plan multi-stop tanker trips for confirmed orders"""
+    capacity = plan_request.capacity_liters
+    fuel_types = [plan_request.fuel_type] if plan_request.fuel_type else None
+    if plan_request.driver_id is not None:
+        profile = await db.get(DriverProfile, plan_request.driver_id)
+        if not profile:
+            raise HTTPException(status_code=404, detail="Driver profile not found")
+        capacity = capacity or profile.capacity_liters
+        carried = parse_fuel_types(profile.fuel_types)
+        fuel_types = [f for f in (fuel_types or carried) if f in carried]
+    if capacity is None:
+        raise HTTPException(status_code=400, detail="Give capacity_liters or a driver_id")
+    
+    result = await db.execute(
+        plannable_orders(fuel_types, plan_request.order_ids, plan_request.driver_id)
+        .limit(settings.route_max_orders)
+    )
+    stops = stops_from_orders(result.scalars().all())
+    
+    # Planning is CPU-bound; keep it off the event loop
+    return await run_in_threadpool(
+        plan_routes,
+        stops,
+        capacity,
+        (settings.route_depot_lat, settings.route_depot_lng),
+        plan_request.start or datetime.utcnow(),
+        vehicles=plan_request.vehicles,
+        speed_kmh=settings.route_speed_kmh,
+        service_minutes=settings.route_service_minutes,
+        improve=plan_request.improve
+    )
+
+@app.post("/orders", response_model=OrderWithPaymentResponse, dependencies=[Depends(limit_per_user("orders"))])
 async def create_order(
     order: OrderCreate, 
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_db),
+    current_user: AuthenticatedUser = Depends(get_current_user)
 ):
     """Create a new fuel delivery order"""
     
-    # Validate Paystack keys
-   
-    
-    # Calculate total amount
-    fuel_prices = {
-        FuelType.REGULAR: 12.50,
-        FuelType.PREMIUM: 14.80,
-        FuelType.DIESEL: 13.20
-    }
+    # Calculate total amount at the price currently in effect
+    snapshot = await fuel_price_service.get_snapshot()
+    price = snapshot.prices.get(order.fuel_type)
+    if price is None:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"No price is set for {order.fuel_type.value} fuel"
+        )
     
-    price_per_liter = fuel_prices[order.fuel_type]
+    price_per_liter = price.price_per_liter
     total_amount = price_per_liter * order.quantity
     
     # Create order in database
@@ -295,12 +551,32 @@ async def create_order(
         quantity=order.quantity,
         price_per_liter=price_per_liter,
         total_amount=total_amount,
-        delivery_time=order.delivery_time
+        fuel_price_id=price.id,
+        delivery_time=order.delivery_time,
+        delivery_lat=order.delivery_lat,
+        delivery_lng=order.delivery_lng
     )
     
     db.add(db_order)
-    db.commit()
-    db.refresh(db_order)
+    await db.flush()
+    await record_orders(db, [db_order])
+    
+    if settings.payment_init_mode == "outbox":
+        # Order and outbox row go in with one commit; the worker talks to Paystack
+        db_order.paystack_reference = f"FUE_{db_order.id}_{uuid.uuid4().hex[:8]}"
+        db.add(PaymentOutbox(order_id=db_order.id, idempotency_key=db_order.paystack_reference))
+        await db.commit()
+        await order_cache.invalidate(user_id=db_order.user_id)
+        payment_worker.notify()
+        
+        return {
+            "order": db_order,
+            "payment_status_url": f"/orders/{db_order.id}/payment"
+        }
+    
+    await db.commit()
+    await db.refresh(db_order)
+    await order_cache.invalidate(user_id=db_order.user_id)
     
 
     reference = f"FUE_{db_order.id}_{uuid.uuid4().hex[:8]}"
@@ -323,8 +599,9 @@ async def create_order(
     
     if not payment_response:
         # Clean up the order if payment fails
-        db.delete(db_order)
-        db.commit()
+        await discard_orders(db, [db_order.id])
+        await db.commit()
+        await order_cache.invalidate([db_order.id], db_order.user_id)
         
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -334,23 +611,49 @@ async def create_order(
     # Update order with payment reference
     db_order.paystack_reference = reference
     db_order.paystack_access_code = payment_response["data"]["access_code"]
-    db.commit()
-    db.refresh(db_order)
-    
-    # Convert SQLAlchemy model to Pydantic model
-    order_response = OrderResponse.from_orm(db_order)
+    await db.commit()
+    await db.refresh(db_order)
+    await order_cache.invalidate([db_order.id], db_order.user_id)
     
+    # The response model validates the order once, straight from its attributes
     return {
-        "order": order_response,
+        "order": db_order,
         "payment_url": payment_response["data"]["authorization_url"]
     }
 
 
+@app.post("/orders/bulk", dependencies=[Depends(limit_per_user("orders_bulk"))])
+async def create_orders_bulk(
+    request: Request,
+    charge: str = Query("aggregate", description="aggregate: one Paystack charge for the batch; per_order: one each"),
+    all_or_nothing: bool = False,
+    current_user: AuthenticatedUser = Depends(get_current_user)
+):
+    """Create many orders from a JSON array, NDJSON or CSV body and stream per-row results as NDJSON"""
+    if charge not in CHARGE_MODES:
+        raise HTTPException(status_code=400, detail=f"charge must be one of: {', '.join(CHARGE_MODES)}")
+    
+    rows = await read_rows(request)
+    if not rows:
+        raise HTTPException(status_code=400, detail="No orders in request")
+    
+    snapshot = await fuel_price_service.get_snapshot()
+    accepted, rejected = validate_rows(rows, snapshot.prices)
+    if rejected and all_or_nothing:
+        return JSONResponse(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            content={"detail": "Some rows are invalid, no orders were created", "errors": rejected}
+        )
+    
+    return StreamingResponse(
+        ndjson_lines(ingest(current_user.id, current_user.email, accepted, rejected, charge)),
+        media_type="application/x-ndjson"
+    )
 
 # Test endpoint to check Paystack configuration
 @app.get("/test-paystack")
-async def test_paystack():
-    
+async def test_paystack(current_user: AuthenticatedUser = Depends(get_current_admin_user)):
+    """Open a small test transaction; admins only, as every call reaches Paystack"""
     
     # Test with a small amount
     test_response = await paystack_service.initialize_transaction(
@@ -373,52 +676,455 @@ async def test_paystack():
         }
 
 @app.get("/orders/{order_id}", response_model=OrderResponse)
-async def get_order(order_id: int, db: Session = Depends(get_db)):
-    """Get order details"""
-    order = db.query(Order).filter(Order.id == order_id).first()
-    if not order:
+async def get_order(
+    order_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: AuthenticatedUser = Depends(get_current_user)
+):
+    """Get order details; 304 to If-None-Match or If-Modified-Since while it is unchanged"""
+    cached = await order_cache.get_order(db, order_id)
+    if not cached or not may_track(cached.owner, cached.body["driver_id"], current_user):
+        raise HTTPException(status_code=404, detail="Order not found")
+    return cached.respond(request)
+
+@app.get("/orders/{order_id}/payment", response_model=PaymentInitResponse)
+async def get_order_payment(
+    order_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: AuthenticatedUser = Depends(get_current_user)
+):
+    """Poll for the payment URL of an order created in outbox mode"""
+    order = await db.get(Order, order_id)
+    if not order or (order.user_id != current_user.id and current_user.role != UserRole.ADMIN):
+        raise HTTPException(status_code=404, detail="Order not found")
+    
+    # Bulk orders charged together share one outbox row, keyed by their reference
+    result = await db.execute(
+        select(PaymentOutbox).where(PaymentOutbox.idempotency_key == order.paystack_reference)
+    )
+    entry = result.scalars().first()
+    if not entry:
+        raise HTTPException(status_code=404, detail="No pending payment initialization for this order")
+    
+    return {
+        "order_id": order_id,
+        "status": entry.status,
+        "reference": entry.idempotency_key,
+        "payment_url": entry.authorization_url,
+        "error": entry.last_error
+    }
+
+@app.get("/orders", response_model=OrderPage)
+async def get_orders(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    order_status: Optional[OrderStatus] = None,
+    fuel_type: Optional[FuelType] = None,
+    user_id: Optional[int] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    fields: Optional[str] = Query(None, description="comma-separated order fields to return, e.g. id,order_status"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: AuthenticatedUser = Depends(get_current_active_user)
+):
+    """List orders newest first, one keyset page at a time"""
+    # A customer's own newest orders, the page every order screen opens with, are cached
+    unfiltered = not (cursor or order_status or fuel_type or created_from or created_to or fields)
+    if unfiltered and current_user.role != UserRole.ADMIN:
+        return (await order_cache.get_recent_orders(db, current_user.id, limit)).respond(request)
+    
+    try:
+        names = order_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    query = select_orders(names)
+    
+    # Customers only ever see their own orders; admins may filter by user
+    if current_user.role != UserRole.ADMIN:
+        user_id = current_user.id
+    if user_id is not None:
+        query = query.where(Order.user_id == user_id)
+    if order_status is not None:
+        query = query.where(Order.order_status == order_status)
+    if fuel_type is not None:
+        query = query.where(Order.fuel_type == fuel_type)
+    if created_from is not None:
+        query = query.where(Order.created_at >= created_from)
+    if created_to is not None:
+        query = query.where(Order.created_at < created_to)
+    
+    try:
+        query = keyset_page(query, Order.created_at, Order.id, cursor, limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    result = await db.execute(query)
+    rows, next_cursor = split_page(result.all(), limit)
+    
+    # Columns go straight to orjson; the response model only documents the shape
+    return ORJSONResponse({"items": order_dicts(rows, names), "next_cursor": next_cursor})
+
+@app.get("/admin/orders/export")
+async def export_orders_endpoint(
+    format: str = "csv",
+    cursor: Optional[str] = None,
+    order_status: Optional[OrderStatus] = None,
+    fuel_type: Optional[FuelType] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    current_user: AuthenticatedUser = Depends(get_current_admin_user)
+):
+    """Stream all matching orders oldest first as CSV, NDJSON or Parquet; resume with a row's cursor"""
+    if format not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(MEDIA_TYPES)}")
+    if format == "parquet" and not parquet_available():
+        raise HTTPException(status_code=status.HTTP_501_NOT_IMPLEMENTED, detail="Parquet export needs pyarrow installed")
+    
+    try:
+        query = export_query(created_from, created_to, order_status, fuel_type, cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    
+    filename = f"orders-{datetime.utcnow():%Y%m%d-%H%M%S}.{format}"
+    return StreamingResponse(
+        export_orders(query, format),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+# Sales analytics, served from the rollup tables
+async def run_analytics(
+    db: AsyncSession, period: str, start: Optional[datetime], end: Optional[datetime], group_by: Optional[str],
+    series: bool, fuel_type: Optional[FuelType], region: Optional[str], order_status: Optional[OrderStatus]
+) -> dict:
+    if period not in ROLLUPS:
+        raise HTTPException(status_code=400, detail=f"period must be one of: {', '.join(ROLLUPS)}")
+    dimensions = [d.strip() for d in group_by.split(",") if d.strip()] if group_by else []
+    unknown = [d for d in dimensions if d not in DIMENSIONS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"group_by accepts: {', '.join(DIMENSIONS)}")
+    end = end or datetime.utcnow()
+    start = start or end - timedelta(days=7)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    if series and period == "hour" and end - start > timedelta(days=settings.analytics_max_hourly_days):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Hourly series cover at most {settings.analytics_max_hourly_days} days; use period=day"
+        )
+    
+    result = await db.execute(analytics_query(
+        period, start, end, dimensions, series, fuel_type=fuel_type, region=region, order_status=order_status
+    ))
+    return {"period": period, "start": start, "end": end, "rows": analytics_rows(result)}
+
+@app.get("/admin/analytics/sales", response_model=AnalyticsResponse, response_model_exclude_none=True)
+async def get_sales_analytics(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    period: str = Query("day", description="rollup to read: hour or day granularity for start"),
+    group_by: Optional[str] = Query(None, description="comma-separated: fuel_type, region, order_status, payment_status"),
+    fuel_type: Optional[FuelType] = None,
+    region: Optional[str] = None,
+    order_status: Optional[OrderStatus] = None,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: AuthenticatedUser = Depends(get_current_admin_user)
+):
+    """Orders, litres, revenue and payment conversion for orders placed between start and end (last 7 days)"""
+    return await run_analytics(db, period, start, end, group_by, False, fuel_type, region, order_status)
+
+@app.get("/admin/analytics/timeseries", response_model=AnalyticsResponse, response_model_exclude_none=True)
+async def get_analytics_timeseries(
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    period: str = Query("day", description="hour or day"),
+    group_by: Optional[str] = Query(None, description="comma-separated: fuel_type, region, order_status, payment_status"),
+    fuel_type: Optional[FuelType] = None,
+    region: Optional[str] = None,
+    order_status: Optional[OrderStatus] = None,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: AuthenticatedUser = Depends(get_current_admin_user)
+):
+    """The same figures per hour or day"""
+    return await run_analytics(db, period, start, end, group_by, True, fuel_type, region, order_status)
+
+# Live order tracking
+def may_track(owner_id: Optional[int], driver_id: Optional[int], user: AuthenticatedUser) -> bool:
+    """Users may see and track their own orders, drivers the ones assigned to them, admins any order"""
+    if user.role == UserRole.ADMIN:
+        return True
+    return user.id == owner_id or (user.role == UserRole.DRIVER and user.id == driver_id)
+
+async def get_trackable_order(order_id: int, user: AuthenticatedUser, db: AsyncSession) -> Order:
+    """Load an order the user may track: their own, one assigned to them as driver, or any for admins"""
+    order = await db.get(Order, order_id)
+    if not order or not may_track(order.user_id, order.driver_id, user):
         raise HTTPException(status_code=404, detail="Order not found")
-    return {"order": order}
+    return order
 
-@app.get("/orders", response_model=List[OrderResponse])
-async def get_orders(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    """Get all orders"""
-    orders = db.query(Order).offset(skip).limit(limit).all()
-    return [{"order": order} for order in orders]
+@app.get("/orders/{order_id}/history", response_model=List[OrderStatusChange])
+async def get_order_history(
+    order_id: int,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: AuthenticatedUser = Depends(get_current_user)
+):
+    """Every status transition of an order, oldest first"""
+    await get_trackable_order(order_id, current_user, db)
+    result = await db.execute(
+        select(OrderStatusHistory).where(OrderStatusHistory.order_id == order_id).order_by(OrderStatusHistory.version)
+    )
+    return result.scalars().all()
+
+def tracking_snapshot(order: Order) -> list:
+    """Messages that bring a new subscriber up to date"""
+    messages = [{
+        "type": "status",
+        "order_id": order.id,
+        "order_status": order.order_status.value,
+        "payment_status": order.payment_status.value,
+        "at": order.updated_at.isoformat() if order.updated_at else None
+    }]
+    last_location = tracking_hub.last_location.get(order.id)
+    if last_location:
+        messages.append(last_location)
+    return messages
+
+@app.websocket("/ws/orders/{order_id}")
+async def track_order_ws(websocket: WebSocket, order_id: int, token: Optional[str] = None):
+    """Push status changes and driver locations for an order over a WebSocket"""
+    async with AsyncSessionLocal() as db:
+        try:
+            user = await resolve_token_user(token or "", db)
+            order = await get_trackable_order(order_id, user, db)
+        except HTTPException:
+            await websocket.close(code=1008)
+            return
+    
+    await websocket.accept()
+    subscriber = tracking_hub.subscribe(order_id)
+    
+    async def wait_for_disconnect():
+        while True:
+            await websocket.receive_text()
+    
+    receiver = asyncio.create_task(wait_for_disconnect())
+    try:
+        for message in tracking_snapshot(order):
+            await websocket.send_json(message)
+        while True:
+            batch = asyncio.create_task(subscriber.next_batch(settings.tracking_heartbeat_seconds))
+            await asyncio.wait({receiver, batch}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver.done():
+                batch.cancel()
+                break
+            for message in batch.result() or [{"type": "ping"}]:
+                await websocket.send_json(message)
+    except SlowConsumer:
+        # Tell the client to reconnect and resync from a fresh snapshot
+        await websocket.close(code=1013)
+    except WorkerDraining:
+        # Service restart: reconnect, to another worker
+        await websocket.close(code=1012)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        tracking_hub.unsubscribe(subscriber)
+
+@app.get("/orders/{order_id}/events")
+async def track_order_sse(
+    order_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: AuthenticatedUser = Depends(get_stream_user)
+):
+    """Server-sent events fallback for order tracking"""
+    order = await get_trackable_order(order_id, current_user, db)
+    snapshot = tracking_snapshot(order)
+    # Don't keep a pooled connection checked out for the life of the stream
+    await db.close()
+    
+    subscriber = tracking_hub.subscribe(order_id)
+    
+    async def event_stream():
+        try:
+            for message in snapshot:
+                yield f"event: {message['type']}\ndata: {json.dumps(message)}\n\n"
+            while not await request.is_disconnected():
+                try:
+                    batch = await subscriber.next_batch(settings.tracking_heartbeat_seconds)
+                except SlowConsumer:
+                    yield "event: resync\ndata: {}\n\n"
+                    break
+                except WorkerDraining:
+                    # Reconnect in a second, which lands on a worker that isn't shutting down
+                    yield "retry: 1000\nevent: reconnect\ndata: {}\n\n"
+                    break
+                if not batch:
+                    yield ": keep-alive\n\n"
+                for message in batch:
+                    yield f"event: {message['type']}\ndata: {json.dumps(message)}\n\n"
+        finally:
+            tracking_hub.unsubscribe(subscriber)
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+# Drivers
+def require_driver(user: AuthenticatedUser):
+    if user.role != UserRole.DRIVER:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Driver access required")
+
+@app.put("/drivers/me", response_model=DriverProfileResponse)
+async def update_driver_profile(
+    profile_update: DriverProfileUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: AuthenticatedUser = Depends(get_current_active_user)
+):
+    """Set the driver's tanker capacity, fuel types and availability for dispatch"""
+    require_driver(current_user)
+    
+    profile = await db.get(DriverProfile, current_user.id)
+    if profile is None:
+        profile = DriverProfile(user_id=current_user.id)
+        db.add(profile)
+    profile.capacity_liters = profile_update.capacity_liters
+    profile.fuel_types = format_fuel_types(profile_update.fuel_types)
+    profile.is_available = profile_update.is_available
+    await db.commit()
+    
+    fuel_types = parse_fuel_types(profile.fuel_types)
+    await dispatcher.set_profile(current_user.id, profile.capacity_liters, fuel_types, profile.is_available)
+    return DriverProfileResponse(
+        user_id=current_user.id,
+        capacity_liters=profile.capacity_liters,
+        fuel_types=sorted(fuel_types),
+        is_available=profile.is_available
+    )
+
+@app.get("/drivers/me/orders", response_model=List[OrderResponse])
+async def get_driver_orders(
+    fields: Optional[str] = Query(None, description="comma-separated order fields to return, e.g. id,order_status"),
+    db: AsyncSession = Depends(get_read_db),
+    current_user: AuthenticatedUser = Depends(get_current_active_user)
+):
+    """Get the deliveries currently assigned to the driver"""
+    require_driver(current_user)
+    try:
+        names = order_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    result = await db.execute(
+        select_orders(names)
+        .where(Order.driver_id == current_user.id, Order.order_status.in_(ACTIVE_DELIVERY_STATUSES))
+        .order_by(Order.assigned_at)
+    )
+    return ORJSONResponse(order_dicts(result.all(), names))
+
+@app.post("/drivers/orders/{order_id}/status", response_model=OrderResponse)
+async def update_delivery_status(
+    order_id: int,
+    status_update: DeliveryStatusUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: AuthenticatedUser = Depends(get_current_active_user)
+):
+    """Report that an assigned delivery is en route or delivered"""
+    require_driver(current_user)
+    if status_update.order_status not in DELIVERY_STEPS:
+        raise HTTPException(status_code=400, detail="Drivers can only mark orders en_route or delivered")
+    
+    transitions = await advance_delivery(db, order_id, current_user.id, status_update.order_status)
+    if not transitions:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Order is not at a step this driver can advance")
+    await db.commit()
+    await notify_transitions(transitions)
+    
+    return await db.get(Order, order_id, populate_existing=True)
+
+@app.post("/drivers/location")
+async def post_driver_location(
+    location: DriverLocationUpdate,
+    db: AsyncSession = Depends(get_read_db),
+    current_user: AuthenticatedUser = Depends(get_current_active_user)
+):
+    """Record a driver's GPS position for dispatch and publish it to the order's trackers"""
+    require_driver(current_user)
+    
+    await dispatcher.update_position(current_user.id, location.lat, location.lng)
+    if location.order_id is None:
+        return {"status": "ok"}
+    
+    if dispatcher.assignments.get(location.order_id) != current_user.id:
+        # Not in this process's dispatch state; fall back to the database
+        order = await db.get(Order, location.order_id)
+        if not order or order.driver_id != current_user.id:
+            raise HTTPException(status_code=404, detail="Order not found")
+        if order.order_status not in ACTIVE_DELIVERY_STATUSES:
+            raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Order is not out for delivery")
+    
+    await tracking_hub.publish_location(
+        location.order_id, current_user.id, location.lat, location.lng, location.heading, location.speed
+    )
+    return {"status": "ok"}
 
 @app.post("/webhook/paystack")
-async def paystack_webhook(request: Request, db: Session = Depends(get_db)):
+async def paystack_webhook(request: Request, db: AsyncSession = Depends(get_db)):
     """Handle Paystack webhook notifications"""
-    payload = await request.json()
-    event = payload.get("event")
-    data = payload.get("data")
-    
-    if event == "charge.success":
-        reference = data.get("reference")
-        if reference and reference.startswith("FUE_"):
-            # Find the order
-            order = db.query(Order).filter(Order.paystack_reference == reference).first()
-            if order:
-                order.payment_status = PaymentStatus.SUCCESSFUL
-                order.order_status = OrderStatus.CONFIRMED
-                db.commit()
+    raw_body = await request.body()
+    if not verify_signature(paystack_service.secret_key, raw_body, request.headers.get("x-paystack-signature")):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid signature")
+    
+    try:
+        payload = json.loads(raw_body)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid JSON payload")
+    
+    # Record and ack; order updates are applied in batches off the request path
+    event_id = await webhook_processor.record(db, payload)
+    if event_id is not None:
+        webhook_processor.enqueue(event_id)
     
     return JSONResponse(content={"status": "success"})
 
 @app.get("/verify-payment/{reference}")
-async def verify_payment(reference: str, db: Session = Depends(get_db)):
+async def verify_payment(reference: str, db: AsyncSession = Depends(get_db)):
     """Verify payment status"""
-    verification = await paystack_service.verify_transaction(reference)
-    
-    if verification.get("status") and verification["data"]["status"] == "success":
-        # Update order status
-        order = db.query(Order).filter(Order.paystack_reference == reference).first()
-        if order:
-            order.payment_status = PaymentStatus.SUCCESSFUL
-            order.order_status = OrderStatus.CONFIRMED
-            db.commit()
-            return {"status": "success", "order_id": order.id}
-    
-    return {"status": "failed"}
+    result = await db.execute(
+        select(Order.id, Order.payment_status).where(Order.paystack_reference == reference)
+    )
+    order = result.first()
+    if not order:
+        return {"status": "failed"}
+    
+    # Webhooks and the reconciler usually settle the order before anyone asks
+    if order.payment_status == PaymentStatus.SUCCESSFUL:
+        return {"status": "success", "order_id": order.id}
+    if order.payment_status == PaymentStatus.FAILED:
+        return {"status": "failed", "order_id": order.id}
+    
+    # Recent Paystack answers for still-pending references are shared by every
+    # worker, so polling clients don't turn into one Paystack call each
+    outcome = await shared_state.get(f"verify:{reference}")
+    if outcome is None:
+        verification = await paystack_service.verify_transaction(reference)
+        outcome = payment_outcome(verification)
+        if outcome is not None:
+            transitions = await apply_payment_result(db, reference, successful=outcome)
+            await db.commit()
+            await notify_transitions(transitions)
+        else:
+            await shared_state.set(f"verify:{reference}", "pending", settings.verify_cache_ttl)
+    
+    if outcome is True:
+        return {"status": "success", "order_id": order.id}
+    if outcome is False:
+        return {"status": "failed", "order_id": order.id}
+    return {"status": "pending", "order_id": order.id}
 
 # Update your frontend JavaScript to integrate with the API
\ No newline at end of file
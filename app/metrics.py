@@ -0,0 +1,291 @@
+import asyncio
+import contextvars
+import logging
+import os
+import time
+from collections import Counter as Tally, deque
+from typing import Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from sqlalchemy import event
+from starlette.routing import Match
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Route label for requests that matched no route (404s); keeps scanners from minting label values
+UNMATCHED_ROUTE = "<unmatched>"
+
+# Any other method (clients can send whatever they like) is labelled OTHER, for the same reason
+METHODS = {"GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"}
+
+# Statements longer than this are cut short in the logs
+SQL_LOG_CHARS = 1000
+
+FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89, 144)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds", "Time to handle a request, by route template",
+    ["method", "route"],
+)
+REQUESTS = Counter("http_requests_total", "Requests handled", ["method", "route", "status"])
+IN_FLIGHT = Gauge("http_requests_in_flight", "Requests being handled", multiprocess_mode="livesum")
+REQUEST_QUERIES = Histogram(
+    "http_request_db_queries", "Database queries run for one request", ["method", "route"],
+    buckets=COUNT_BUCKETS,
+)
+REQUEST_DB_TIME = Histogram(
+    "http_request_db_seconds", "Time spent in database queries for one request", ["method", "route"],
+    buckets=FAST_BUCKETS,
+)
+REPEATED_QUERIES = Counter(
+    "http_request_repeated_queries_total",
+    "Requests that ran one statement METRICS_REPEATED_QUERY_THRESHOLD or more times (likely N+1)",
+    ["method", "route"],
+)
+SLOW_REQUESTS = Counter("http_slow_requests_total", "Requests over METRICS_SLOW_REQUEST_MS", ["method", "route"])
+DB_QUERY_LATENCY = Histogram("db_query_duration_seconds", "Time per database query", buckets=FAST_BUCKETS)
+LOOP_LAG = Histogram(
+    "event_loop_lag_seconds", "How late the event loop woke a sleeping task", buckets=FAST_BUCKETS,
+)
+LOOP_STALLS = Counter("event_loop_stalls_total", "Event loop lags over METRICS_LOOP_STALL_MS")
+PAYSTACK_LATENCY = Histogram(
+    "paystack_request_duration_seconds", "Time per Paystack API attempt", ["endpoint", "outcome"],
+)
+PASSWORD_HASH_WAIT = Histogram(
+    "password_hash_wait_seconds", "Time a bcrypt call queued for a hashing worker", buckets=FAST_BUCKETS,
+)
+
+
+class RequestQueries:
+    """Database work done on behalf of one request"""
+
+    def __init__(self, keep_statements: int):
+        self.count = 0
+        self.seconds = 0.0
+        self.repeats = Tally()
+        # (seconds, statement) in execution order, for the slow-request log
+        self.keep_statements = keep_statements
+        self.statements = []
+        self.dropped = 0
+        self.finished = False
+
+    def add(self, statement: str, seconds: float):
+        # A task spawned during the request inherits this object; stop counting once the request is done
+        if self.finished:
+            return
+        self.count += 1
+        self.seconds += seconds
+        self.repeats[statement] += 1
+        if len(self.statements) < self.keep_statements:
+            self.statements.append((seconds, statement))
+        elif self.keep_statements:
+            self.dropped += 1
+
+
+# Requests being handled (id(scope) -> (started, "METHOD /path")) and the latest to finish
+# ((started, finished, "METHOD /path")), for naming what held the event loop when it stalls
+_in_flight = {}
+_finished = deque(maxlen=100)
+
+_request_queries: contextvars.ContextVar[Optional[RequestQueries]] = contextvars.ContextVar(
+    "request_queries", default=None
+)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - context._metrics_started
+    DB_QUERY_LATENCY.observe(seconds)
+    queries = _request_queries.get()
+    if queries is not None:
+        queries.add(statement, seconds)
+
+
+def instrument_engine(sync_engine):
+    """Time every query on the engine and charge it to the request that ran it"""
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _shorten(statement: str) -> str:
+    statement = " ".join(statement.split())
+    return statement if len(statement) <= SQL_LOG_CHARS else statement[:SQL_LOG_CHARS] + "..."
+
+
+def route_of(scope) -> str:
+    """The route template a request matched ("/orders/{order_id}"), never the raw path"""
+    route = scope.get("route")
+    if route is None and "app" in scope:
+        # Answered before routing (a 429 from the rate limiter); find the route it was for
+        for candidate in scope["app"].router.routes:
+            match, _ = candidate.matches(scope)
+            if match == Match.FULL:
+                route = candidate
+                break
+    return getattr(route, "path", UNMATCHED_ROUTE)
+
+
+# (method, route) -> that route's latency, query count and DB time histograms; labels() takes a lock each call
+_route_histograms = {}
+
+
+def _histograms(method: str, route: str) -> tuple:
+    histograms = _route_histograms.get((method, route))
+    if histograms is None:
+        histograms = _route_histograms[method, route] = (
+            REQUEST_LATENCY.labels(method, route),
+            REQUEST_QUERIES.labels(method, route),
+            REQUEST_DB_TIME.labels(method, route),
+        )
+    return histograms
+
+
+class MetricsMiddleware:
+    """Latency, status and database work per route for every HTTP request, plus the slow-request log"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.metrics_enabled:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        # Statements are only kept for the slow-request log
+        keep = settings.metrics_slow_request_max_statements if settings.metrics_slow_request_ms else 0
+        queries = RequestQueries(keep)
+        token = _request_queries.set(queries)
+        key = id(scope)
+        label = f"{scope['method']} {scope['path']}"
+        started = time.perf_counter()
+        _in_flight[key] = (started, label)
+        IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            seconds = time.perf_counter() - started
+            IN_FLIGHT.dec()
+            del _in_flight[key]
+            _finished.append((started, started + seconds, label))
+            _request_queries.reset(token)
+            queries.finished = True
+            method = scope["method"] if scope["method"] in METHODS else "OTHER"
+            self._observe(method, route_of(scope), status_code, seconds, queries)
+
+    def _observe(self, method: str, route: str, status_code: int, seconds: float, queries: RequestQueries):
+        latency, query_count, db_time = _histograms(method, route)
+        latency.observe(seconds)
+        query_count.observe(queries.count)
+        db_time.observe(queries.seconds)
+        REQUESTS.labels(method, route, str(status_code)).inc()
+
+        threshold = settings.metrics_repeated_query_threshold
+        if threshold and queries.repeats:
+            statement, times = queries.repeats.most_common(1)[0]
+            if times >= threshold:
+                REPEATED_QUERIES.labels(method, route).inc()
+                logger.warning(f"{method} {route} ran one query {times} times (likely N+1): {_shorten(statement)}")
+
+        if settings.metrics_slow_request_ms and seconds * 1000 >= settings.metrics_slow_request_ms:
+            SLOW_REQUESTS.labels(method, route).inc()
+            lines = [f"{spent * 1000:9.2f} ms  {_shorten(statement)}" for spent, statement in queries.statements]
+            if queries.dropped:
+                lines.append(f"... {queries.dropped} more queries")
+            logger.warning(
+                f"Slow request {method} {route} -> {status_code}: {seconds * 1000:.1f} ms, "
+                f"{queries.count} queries in {queries.seconds * 1000:.1f} ms"
+                + "".join(f"\n  {line}" for line in lines)
+            )
+
+
+class LoopMonitor:
+    """Samples event loop lag: how late a sleep wakes up is how long something held the loop"""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+        self.samples = 0
+        self.stalls = 0
+        self.max_lag = 0.0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - started - self.interval)
+            self.samples += 1
+            self.max_lag = max(self.max_lag, lag)
+            LOOP_LAG.observe(lag)
+            if lag * 1000 >= settings.metrics_loop_stall_ms:
+                self.stalls += 1
+                LOOP_STALLS.inc()
+                # Whatever blocked the loop for `lag` ran inside a request at least that long, which has
+                # usually finished by the time this task gets to run
+                now = time.perf_counter()
+                suspects = {label for began, label in _in_flight.values() if now - began >= lag}
+                suspects.update(
+                    label for began, ended, label in _finished
+                    if now - ended < lag + self.interval and ended - began >= lag
+                )
+                logger.warning(
+                    f"Event loop stalled for {lag * 1000:.0f} ms; requests long enough to have held it: "
+                    f"{', '.join(sorted(suspects)) or 'none'}"
+                )
+
+    def stats(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "samples": self.samples,
+            "stalls": self.stalls,
+            "max_lag_ms": round(self.max_lag * 1000, 3),
+        }
+
+
+def render_metrics() -> tuple:
+    """(body, content type) of every metric in the Prometheus text format, summed over workers in multiprocess mode"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def mark_worker_stopped():
+    """Drop this worker's live gauges from the multiprocess totals as it exits"""
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(os.getpid())
+
+
+loop_monitor = LoopMonitor(settings.metrics_loop_interval)
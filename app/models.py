@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Enum, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, Enum, Boolean, ForeignKey, Index, Text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -24,6 +24,16 @@ class PaymentStatus(str, enum.Enum):
     SUCCESSFUL = "successful"
     FAILED = "failed"
 
+class OutboxStatus(str, enum.Enum):
+    PENDING = "pending"
+    IN_PROGRESS = "in_progress"
+    DONE = "done"
+    FAILED = "failed"
+
+class WebhookEventStatus(str, enum.Enum):
+    RECEIVED = "received"
+    APPLIED = "applied"
+
 class UserRole(str, enum.Enum):
     CUSTOMER = "customer"
     DRIVER = "driver"
@@ -40,10 +50,11 @@ class User(Base):
     role = Column(Enum(UserRole), default=UserRole.CUSTOMER)
     is_active = Column(Boolean, default=True)
     is_verified = Column(Boolean, default=False)
+    token_version = Column(Integer, default=0, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
-    orders = relationship("Order", back_populates="user")
+    orders = relationship("Order", back_populates="user", foreign_keys="Order.user_id")
 
 class Order(Base):
     __tablename__ = "orders"
@@ -61,9 +72,120 @@ class Order(Base):
     delivery_time = Column(String, nullable=False)
     order_status = Column(Enum(OrderStatus), default=OrderStatus.PENDING)
     payment_status = Column(Enum(PaymentStatus), default=PaymentStatus.PENDING)
-    paystack_reference = Column(String, nullable=True)
+    paystack_reference = Column(String, nullable=True, index=True)
     paystack_access_code = Column(String, nullable=True)
+    fuel_price_id = Column(Integer, ForeignKey("fuel_prices.id"), nullable=True)
+    payment_checked_at = Column(DateTime, nullable=True)
+    delivery_lat = Column(Float, nullable=True)
+    delivery_lng = Column(Float, nullable=True)
+    driver_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
+    assigned_at = Column(DateTime, nullable=True)
+    version = Column(Integer, default=0, nullable=False)  # bumped by every status transition
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    user = relationship("User", back_populates="orders", foreign_keys=[user_id])
+    
+    # Composite indexes backing keyset pagination on (created_at, id) per filter
+    __table_args__ = (
+        Index("ix_orders_created_at_id", "created_at", "id"),
+        Index("ix_orders_user_created_at", "user_id", "created_at", "id"),
+        Index("ix_orders_status_created_at", "order_status", "created_at", "id"),
+        Index("ix_orders_fuel_type_created_at", "fuel_type", "created_at", "id"),
+        Index("ix_orders_payment_status_created_at", "payment_status", "created_at"),
+    )
+
+class PaymentOutbox(Base):
+    __tablename__ = "payment_outbox"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    order_id = Column(Integer, ForeignKey("orders.id"), unique=True, nullable=False)
+    idempotency_key = Column(String, unique=True, nullable=False)
+    status = Column(Enum(OutboxStatus), default=OutboxStatus.PENDING, index=True, nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    locked_until = Column(DateTime, nullable=True)
+    authorization_url = Column(String, nullable=True)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class FuelPrice(Base):
+    __tablename__ = "fuel_prices"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    fuel_type = Column(Enum(FuelType), nullable=False)
+    price_per_liter = Column(Float, nullable=False)
+    currency = Column(String, default="GHS", nullable=False)
+    effective_from = Column(DateTime, nullable=False)
+    effective_to = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_fuel_prices_fuel_type_effective_from", "fuel_type", "effective_from"),
+    )
+
+class DriverProfile(Base):
+    __tablename__ = "driver_profiles"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    capacity_liters = Column(Integer, nullable=False)
+    fuel_types = Column(String, nullable=False)  # comma-separated FuelType values
+    is_available = Column(Boolean, default=False, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class _OrderRollup:
+    """Order count, litres and value per time bucket, kept current by app.analytics"""
+    bucket = Column(DateTime, primary_key=True)  # start of the hour/day (UTC) the orders were placed in
+    fuel_type = Column(Enum(FuelType), primary_key=True)
+    region = Column(String, primary_key=True)
+    order_status = Column(Enum(OrderStatus), primary_key=True)
+    payment_status = Column(Enum(PaymentStatus), primary_key=True)
+    orders = Column(Integer, default=0, nullable=False)
+    liters = Column(Integer, default=0, nullable=False)
+    amount = Column(Float, default=0.0, nullable=False)
+
+class OrderRollupHourly(_OrderRollup, Base):
+    __tablename__ = "order_rollups_hourly"
+
+class OrderRollupDaily(_OrderRollup, Base):
+    __tablename__ = "order_rollups_daily"
+
+class PaystackEvent(Base):
+    __tablename__ = "paystack_events"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    event_key = Column(String, unique=True, nullable=False)
+    event = Column(String, nullable=False)
+    reference = Column(String, nullable=True, index=True)
+    payload = Column(Text, nullable=False)
+    status = Column(Enum(WebhookEventStatus), default=WebhookEventStatus.RECEIVED, index=True, nullable=False)
+    received_at = Column(DateTime, default=datetime.utcnow)
+    processed_at = Column(DateTime, nullable=True)
+
+class OrderStatusHistory(Base):
+    """One row per status transition, appended by app.transitions and never updated"""
+    __tablename__ = "order_status_history"
+    
+    id = Column(Integer, primary_key=True)
+    order_id = Column(Integer, ForeignKey("orders.id"), nullable=False)
+    version = Column(Integer, nullable=False)  # the order's version after the transition
+    reason = Column(String, nullable=False)
+    from_order_status = Column(Enum(OrderStatus), nullable=False)
+    from_payment_status = Column(Enum(PaymentStatus), nullable=False)
+    order_status = Column(Enum(OrderStatus), nullable=False)
+    payment_status = Column(Enum(PaymentStatus), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    
+    __table_args__ = (
+        Index("ix_order_status_history_order_id_version", "order_id", "version", unique=True),
+    )
+
+class UsedRefreshToken(Base):
+    """The jti of every refresh token swapped for new tokens, kept until the token would have expired"""
+    __tablename__ = "used_refresh_tokens"
     
-    user = relationship("User", back_populates="orders")
\ No newline at end of file
+    jti = Column(String, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
+    used_at = Column(DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,162 @@
+import hashlib
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, Optional
+
+from fastapi import Request, Response, status
+from fastapi.responses import ORJSONResponse
+
+from app.cache import TTLCache
+from app.conditional import etag_matches
+from app.config import settings
+from app.models import Order
+from app.pagination import keyset_page, split_page
+from app.projection import ORDER_FIELDS, order_dicts, select_orders
+from app.shared_state import shared_state
+from app.transitions import CACHE_PRIORITY, OrderTransition, on_transition
+
+
+def _etag(*parts) -> str:
+    return '"' + hashlib.sha1("|".join(map(str, parts)).encode()).hexdigest()[:16] + '"'
+
+
+@dataclass(frozen=True)
+class CachedResponse:
+    """A response body and the validators conditional requests are checked against"""
+    body: object
+    etag: str
+    last_modified: Optional[datetime]  # naive UTC, like every timestamp we store
+    owner: Optional[int] = None
+
+    def headers(self) -> dict:
+        # Orders change: clients may keep a copy but must revalidate it before use
+        headers = {"ETag": self.etag, "Cache-Control": "private, no-cache"}
+        if self.last_modified is not None:
+            headers["Last-Modified"] = format_datetime(self.last_modified.replace(tzinfo=timezone.utc), usegmt=True)
+        return headers
+
+    def not_modified(self, request: Request) -> bool:
+        """Whether the client's copy is current; If-None-Match wins over If-Modified-Since"""
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            return etag_matches(if_none_match, self.etag)
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since is None or self.last_modified is None:
+            return False
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        # HTTP dates carry whole seconds
+        return self.last_modified.replace(microsecond=0, tzinfo=timezone.utc) <= since
+
+    def respond(self, request: Request) -> Response:
+        headers = self.headers()
+        if self.not_modified(request):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return ORJSONResponse(self.body, headers=headers)
+
+
+class OrderCache:
+    """Read-through cache of order responses and customers' newest orders, per worker.
+
+    Orders are kept by id and each customer's first pages of GET /orders
+    by user id, for ORDER_CACHE_TTL seconds, the least recently used going
+    first past the size limits. Every transition drops the order and its
+    owner's pages, here and (over the shared "orders" channel) in every
+    other worker; writers of anything else a response shows call
+    invalidate() after their commit. A read that started before an
+    invalidation is not stored, so a fill racing a write can't put the old
+    row back. Rows a read replica has yet to replay can still be cached,
+    for at most the TTL.
+    """
+
+    def __init__(self, max_orders: int, max_customers: int, ttl: float):
+        self.orders = TTLCache(maxsize=max_orders, ttl=ttl)
+        self.pages = TTLCache(maxsize=max_customers, ttl=ttl)
+        # (kind, key) -> when it was last invalidated, kept as long as an entry read before then could live
+        self._invalidated = TTLCache(maxsize=max_orders + max_customers, ttl=ttl)
+        self.invalidations = 0
+
+    def _fill(self, cache: TTLCache, kind: str, key, value, started: float):
+        invalidated = self._invalidated.get((kind, key))
+        if invalidated is None or invalidated < started:
+            cache.set(key, value)
+
+    async def get_order(self, db, order_id: int) -> Optional[CachedResponse]:
+        """The order's response and its owner, or None if there is no such order"""
+        cached = self.orders.get(order_id)
+        if cached is not None:
+            return cached
+        started = time.monotonic()
+        row = (await db.execute(select_orders(ORDER_FIELDS + ("user_id",)).where(Order.id == order_id))).first()
+        if row is None:
+            return None
+        cached = CachedResponse(
+            order_dicts([row], ORDER_FIELDS)[0],
+            _etag(row.id, row.version, row.updated_at.isoformat()),
+            row.updated_at,
+            owner=row.user_id,
+        )
+        self._fill(self.orders, "order", order_id, cached, started)
+        return cached
+
+    async def get_recent_orders(self, db, user_id: int, limit: int) -> CachedResponse:
+        """The first page of a customer's orders, newest first, as GET /orders returns it"""
+        pages = self.pages.get(user_id) or {}
+        cached = pages.get(limit)
+        if cached is not None:
+            return cached
+        started = time.monotonic()
+        query = keyset_page(select_orders(ORDER_FIELDS).where(Order.user_id == user_id), Order.created_at, Order.id,
+                            limit=limit)
+        rows, next_cursor = split_page((await db.execute(query)).all(), limit)
+        cached = CachedResponse(
+            {"items": order_dicts(rows, ORDER_FIELDS), "next_cursor": next_cursor},
+            _etag(limit, *(f"{row.id}:{row.version}:{row.updated_at.isoformat()}" for row in rows)),
+            max((row.updated_at for row in rows), default=None),
+            owner=user_id,
+        )
+        # Other limits may have been filled while we read
+        pages = self.pages.get(user_id) or {}
+        self._fill(self.pages, "user", user_id, {**pages, limit: cached}, started)
+        return cached
+
+    def _drop(self, order_ids: Iterable[int], user_ids: Iterable[int]):
+        now = time.monotonic()
+        for order_id in order_ids:
+            self.orders.delete(order_id)
+            self._invalidated.set(("order", order_id), now)
+        for user_id in user_ids:
+            self.pages.delete(user_id)
+            self._invalidated.set(("user", user_id), now)
+
+    async def invalidate(self, order_ids: Iterable[int] = (), user_id: Optional[int] = None):
+        """Drop orders, and a customer's pages, in every worker; call after the commit that changed them"""
+        message = {"order_ids": list(order_ids), "user_ids": [user_id] if user_id is not None else []}
+        self._drop(message["order_ids"], message["user_ids"])
+        self.invalidations += 1
+        await shared_state.publish("orders", message)
+
+    def apply(self, message: dict):
+        """Drop what another worker invalidated"""
+        self._drop(message["order_ids"], message["user_ids"])
+
+    async def on_transition(self, transition: OrderTransition):
+        await self.invalidate([transition.order_id], transition.user_id)
+
+    def stats(self) -> dict:
+        return {
+            "orders": self.orders.stats(),
+            "pages": self.pages.stats(),
+            "invalidations": self.invalidations,
+        }
+
+
+order_cache = OrderCache(settings.order_cache_orders, settings.order_cache_customers, settings.order_cache_ttl)
+on_transition(order_cache.on_transition, priority=CACHE_PRIORITY)
+shared_state.subscribe("orders", order_cache.apply, echo=False)
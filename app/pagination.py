@@ -0,0 +1,48 @@
+import base64
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Encode the (created_at, id) position of a row as an opaque cursor"""
+    raw = f"{created_at.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple:
+    """Decode a cursor back into (created_at, id); raises ValueError if malformed"""
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (TypeError, UnicodeDecodeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def keyset_page(stmt, created_col, id_col, cursor: str = None, limit: int = 20):
+    """Order newest first and seek past the cursor instead of using OFFSET.
+
+    Fetches one extra row so the caller can tell whether another page exists.
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        # Row-value comparison lets the (created_at, id) index seek straight to the cursor
+        stmt = stmt.where(tuple_(created_col, id_col) < tuple_(created_at, row_id))
+    return stmt.order_by(created_col.desc(), id_col.desc()).limit(limit + 1)
+
+
+def split_page(rows: list, limit: int) -> tuple:
+    """(rows of this page, cursor of the next or None) from the limit + 1 rows keyset_page fetched"""
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].id)
+
+
+def keyset_after(stmt, created_col, id_col, cursor: str = None):
+    """Order oldest first, starting after the cursor; for full scans that resume where they stopped"""
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        stmt = stmt.where(tuple_(created_col, id_col) > tuple_(created_at, row_id))
+    return stmt.order_by(created_col, id_col)
@@ -0,0 +1,203 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update, or_
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import Order, PaymentOutbox, OutboxStatus
+from app.order_cache import order_cache
+from app.paystack import paystack_service
+from app.transitions import abandon_payment, notify_transitions
+
+logger = logging.getLogger(__name__)
+
+# Paystack states of a transaction that will not be paid; one opened by a lost attempt can't be
+# paid either, as only the lost response carried its payment URL
+UNPAYABLE_STATES = ("abandoned", "failed", "reversed")
+
+
+class PaymentInitWorker:
+    """Initializes Paystack transactions for orders queued in the payment outbox.
+
+    Rows are claimed with a lease (locked_until), so a worker that dies midway
+    only delays the row until the lease runs out. The outbox idempotency key is
+    the Paystack reference, and Paystack rejects a reused reference, so a
+    reclaimed row can never open a second transaction for the same order; nor
+    are its orders cancelled while Paystack might hold the transaction, unless
+    Paystack reports that transaction unpaid, since its payment URL was lost.
+    One transaction covers every order on the reference (bulk orders can share one).
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal):
+        self.session_factory = session_factory
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._stopping = False
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._stopping = True
+        self._wakeup.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+    def notify(self):
+        """Wake the worker up after new outbox rows were committed"""
+        self._wakeup.set()
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                processed = await self.process_batch()
+            except Exception:
+                logger.exception("Payment outbox batch failed")
+                processed = 0
+            if processed == 0 and not self._stopping:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=settings.payment_worker_poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+    async def claim_batch(self) -> list:
+        """Lease up to a batch of due outbox rows and return their ids"""
+        now = datetime.utcnow()
+        lease_until = now + timedelta(seconds=settings.payment_worker_lease_seconds)
+        due = or_(PaymentOutbox.locked_until.is_(None), PaymentOutbox.locked_until < now)
+        active = PaymentOutbox.status.in_([OutboxStatus.PENDING, OutboxStatus.IN_PROGRESS])
+
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(PaymentOutbox.id).where(active, due)
+                .order_by(PaymentOutbox.id).limit(settings.payment_worker_batch_size)
+            )
+            claimed = []
+            for outbox_id in result.scalars().all():
+                # Conditional update so two workers can't lease the same row
+                leased = await db.execute(
+                    update(PaymentOutbox)
+                    .where(PaymentOutbox.id == outbox_id, active, due)
+                    .values(
+                        status=OutboxStatus.IN_PROGRESS,
+                        locked_until=lease_until,
+                        attempts=PaymentOutbox.attempts + 1
+                    )
+                )
+                if leased.rowcount == 1:
+                    claimed.append(outbox_id)
+            await db.commit()
+        return claimed
+
+    async def process_batch(self) -> int:
+        claimed = await self.claim_batch()
+        await asyncio.gather(*(self.process(outbox_id) for outbox_id in claimed))
+        return len(claimed)
+
+    async def process(self, outbox_id: int):
+        async with self.session_factory() as db:
+            entry = await db.get(PaymentOutbox, outbox_id)
+            reference = entry.idempotency_key
+            orders = (await db.execute(
+                select(Order).where(Order.paystack_reference == reference).order_by(Order.id)
+            )).scalars().all()
+            if not orders:
+                # Discarded since it was queued; there is nothing left to charge
+                logger.warning(f"Skipping payment initialization for {reference}: no orders carry it")
+                self._finish(entry, OutboxStatus.FAILED, "No orders left on this reference")
+                await db.commit()
+                return
+            order = orders[0]
+
+            # A row leased before may have reached Paystack before the worker died
+            if entry.attempts > 1 and await self._settle_if_paystack_may_hold(db, entry, reference):
+                return
+
+            if len(orders) == 1:
+                metadata = {
+                    "order_id": order.id,
+                    "fuel_type": order.fuel_type.value,
+                    "quantity": order.quantity,
+                    "delivery_address": order.delivery_address
+                }
+            else:
+                metadata = {"order_ids": [o.id for o in orders], "orders": len(orders)}
+            logger.info(f"Initializing Paystack payment for {reference} ({len(orders)} orders) from the outbox")
+            payment_response = await paystack_service.initialize_transaction(
+                email=order.email or f"customer{order.id}@fuelease.gh",
+                amount=sum(o.total_amount for o in orders),
+                reference=reference,
+                metadata=metadata
+            )
+
+            if payment_response:
+                for o in orders:
+                    o.paystack_access_code = payment_response["data"]["access_code"]
+                entry.authorization_url = payment_response["data"]["authorization_url"]
+                self._finish(entry, OutboxStatus.DONE)
+            elif entry.attempts >= settings.payment_worker_max_attempts:
+                # The failed call may still have opened the transaction: give up only on one Paystack doesn't hold
+                if await self._settle_if_paystack_may_hold(db, entry, reference):
+                    return
+                await self._fail(db, entry, reference, "Payment initialization failed")
+                return
+            else:
+                self._retry_later(entry, "Payment initialization failed, will retry")
+            await db.commit()
+            if payment_response:
+                await order_cache.invalidate([o.id for o in orders], order.user_id)
+
+    async def _settle_if_paystack_may_hold(self, db, entry: PaymentOutbox, reference: str) -> bool:
+        """Settle the row if Paystack holds, or may hold, a transaction for the reference; False if it has none"""
+        found = await paystack_service.find_transaction(reference)
+        if found is False:
+            return False
+        if found is not None and found.get("status") in UNPAYABLE_STATES:
+            # Paystack doesn't hand its payment URL out again, so nobody can pay this transaction:
+            # cancel the orders so the customer sees why and orders again
+            await self._fail(db, entry, reference, "Payment link from an earlier attempt was lost; please order again")
+            return True
+        if found is not None and found.get("status") == "success":
+            logger.warning(f"Payment for {reference} was initialized by an earlier attempt and is paid")
+            self._finish(entry, OutboxStatus.DONE, "Paid through a transaction opened by an earlier attempt")
+        elif found is not None:
+            # The charge is still in flight; ask again until Paystack settles it either way
+            logger.warning(f"Payment for {reference} from an earlier attempt is {found.get('status')}; will ask again")
+            self._retry_later(entry, "Payment from an earlier attempt is in progress, will check again")
+        else:
+            # Paystack may hold it, so neither a second initialize nor cancelling the orders is safe yet
+            logger.warning(f"Could not check Paystack for {reference}; will ask again")
+            self._retry_later(entry, "Could not check Paystack for an earlier attempt, will retry")
+        await db.commit()
+        return True
+
+    @staticmethod
+    def _retry_later(entry: PaymentOutbox, note: str):
+        # Back off before the next attempt
+        entry.status = OutboxStatus.PENDING
+        entry.locked_until = datetime.utcnow() + timedelta(
+            seconds=min(2 ** entry.attempts, settings.payment_worker_max_backoff)
+        )
+        entry.last_error = note
+
+    @staticmethod
+    def _finish(entry: PaymentOutbox, status: OutboxStatus, note: str = None):
+        entry.status = status
+        entry.locked_until = None
+        entry.last_error = note
+
+    async def _fail(self, db, entry: PaymentOutbox, reference: str, reason: str):
+        logger.error(f"Giving up on payment initialization for {reference}: {reason}")
+        self._finish(entry, OutboxStatus.FAILED, reason)
+        transitions = await abandon_payment(db, reference)
+        await db.commit()
+        await notify_transitions(transitions)
+
+
+payment_worker = PaymentInitWorker()
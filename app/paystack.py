@@ -1,26 +1,185 @@
 import httpx
 
+import asyncio
 import logging
 import os
+import random
+import time
 from dotenv import load_dotenv
 
+from app.config import settings
+from app.metrics import PAYSTACK_LATENCY
+
 # Load environment variables from .env file
 load_dotenv()
 
 logger = logging.getLogger(__name__)
 
+class CircuitBreaker:
+    """Fails fast once Paystack keeps erroring, letting one trial request through after a cool-off"""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probing_since = None
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow_request(self) -> bool:
+        state = self.state
+        if state != "half_open":
+            return state == "closed"
+        # Everything else waits for the trial to settle; one that never reports back stops blocking after a cool-off
+        now = time.monotonic()
+        if self.probing_since is not None and now - self.probing_since < self.reset_timeout:
+            return False
+        self.probing_since = now
+        return True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self.probing_since = None
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+        self.probing_since = None
+
+
+class EndpointMetrics:
+    """Call counts and latency for one Paystack endpoint"""
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+        self.short_circuited = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def observe(self, seconds: float, error: bool):
+        self.calls += 1
+        self.errors += int(error)
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        PAYSTACK_LATENCY.labels(self.endpoint, "error" if error else "ok").observe(seconds)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "retries": self.retries,
+            "short_circuited": self.short_circuited,
+            "avg_ms": round(self.total_seconds / self.calls * 1000, 3) if self.calls else 0.0,
+            "max_ms": round(self.max_seconds * 1000, 3),
+        }
+
 class PaystackService:
     def __init__(self):
         # REPLACE THESE HARDCODED KEYS WITH ENVIRONMENT VARIABLES
         self.secret_key = os.environ.get("PAYSTACK_SECRET_KEY")
         self.public_key = os.environ.get("PAYSTACK_PUBLIC_KEY")
-        self.base_url = "https://api.paystack.co"
+        self.base_url = settings.paystack_base_url
         self.headers = {
             "Authorization": f"Bearer {self.secret_key}",
             "Content-Type": "application/json"
         }
+        self.breaker = CircuitBreaker(
+            failure_threshold=settings.paystack_breaker_threshold,
+            reset_timeout=settings.paystack_breaker_reset_seconds
+        )
+        self.metrics = {}
+        self._client = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        # One long-lived client so connections (and TLS sessions) are reused
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self.headers,
+                http2=settings.paystack_http2,
+                limits=httpx.Limits(
+                    max_connections=settings.paystack_max_connections,
+                    max_keepalive_connections=settings.paystack_max_keepalive
+                ),
+                timeout=httpx.Timeout(settings.paystack_timeout, connect=settings.paystack_connect_timeout)
+            )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> dict:
+        return {
+            "circuit": self.breaker.state,
+            "endpoints": {name: metrics.stats() for name, metrics in self.metrics.items()}
+        }
+
+    async def _request(self, endpoint, method, path, json=None, timeout=None, idempotent=False):
+        """Send a request with retries and circuit breaking; returns None when it can't get a response"""
+        metrics = self.metrics.setdefault(endpoint, EndpointMetrics(endpoint))
+        if not self.breaker.allow_request():
+            metrics.short_circuited += 1
+            logger.warning(f"Paystack circuit open, skipping {endpoint}")
+            return None
+
+        client = self._get_client()
+        # Every attempt and the waits between them share one deadline
+        deadline = time.monotonic() + settings.paystack_deadline
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                response = await asyncio.wait_for(
+                    client.request(method, path, json=json, timeout=timeout or httpx.USE_CLIENT_DEFAULT),
+                    deadline - time.monotonic()
+                )
+            except asyncio.TimeoutError:
+                metrics.observe(time.perf_counter() - started, error=True)
+                self.breaker.record_failure()
+                logger.error(f"Paystack {endpoint} gave up after {settings.paystack_deadline}s")
+                return None
+            except httpx.RequestError as e:
+                metrics.observe(time.perf_counter() - started, error=True)
+                self.breaker.record_failure()
+                # A failed connect never reached Paystack, so it is always safe to retry
+                retryable = idempotent or isinstance(e, httpx.ConnectError)
+                logger.error(f"Paystack {endpoint} request error: {str(e)}")
+                response = None
+            else:
+                server_error = response.status_code >= 500 or response.status_code == 429
+                metrics.observe(time.perf_counter() - started, error=server_error)
+                if not server_error:
+                    self.breaker.record_success()
+                    return response
+                self.breaker.record_failure()
+                retryable = idempotent
+                logger.error(f"Paystack {endpoint} returned {response.status_code}")
+
+            if not retryable or attempt >= settings.paystack_max_retries or not self.breaker.allow_request():
+                return response
+            # Full jitter keeps retries from lining up during an outage
+            delay = random.uniform(0, settings.paystack_retry_backoff * 2 ** (attempt + 1))
+            if time.monotonic() + delay >= deadline:
+                return response
+            attempt += 1
+            metrics.retries += 1
+            await asyncio.sleep(delay)
+
     async def initialize_transaction(self, email, amount, reference, metadata=None):
-        url = f"{self.base_url}/transaction/initialize"
         payload = {
             "email": email,
             "amount": int(amount * 100),  # Convert to kobo
@@ -30,45 +189,64 @@ class PaystackService:
         }
         
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(url, json=payload, headers=self.headers)
-                response_data = response.json()
+            response = await self._request("initialize_transaction", "POST", "/transaction/initialize", json=payload)
+            if response is None:
+                return None
+            response_data = response.json()
+            
+            logger.info(f"Paystack initialize {reference}: {response.status_code}")
+            
+            if response.status_code == 200 and response_data.get("status"):
+                return response_data
+            else:
+                logger.error(f"Paystack initialize {reference} failed: {response_data.get('message')}")
+                return None
                 
-                logger.info(f"Paystack response: {response_data}")
-                
-                if response.status_code == 200 and response_data.get("status"):
-                    return response_data
-                else:
-                    logger.error(f"Paystack API error: {response_data}")
-                    return None
-                    
-        except httpx.RequestError as e:
-            logger.error(f"Paystack request error: {str(e)}")
-            return None
         except Exception as e:
             logger.error(f"Unexpected error: {str(e)}")
             return None
 
     async def verify_transaction(self, reference):
-        url = f"{self.base_url}/transaction/verify/{reference}"
-        
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(url, headers=self.headers)
-                response_data = response.json()
+            response = await self._request(
+                "verify_transaction", "GET", f"/transaction/verify/{reference}", idempotent=True
+            )
+            if response is None:
+                return None
+            response_data = response.json()
+            
+            if response.status_code == 200 and response_data.get("status"):
+                return response_data
+            else:
+                logger.error(f"Paystack verify {reference} failed: {response_data.get('message')}")
+                return None
                 
-                if response.status_code == 200 and response_data.get("status"):
-                    return response_data
-                else:
-                    logger.error(f"Paystack verification error: {response_data}")
-                    return None
-                    
         except Exception as e:
             logger.error(f"Verification error: {str(e)}")
             return None
 
+    async def find_transaction(self, reference):
+        """The transaction Paystack holds for this reference, False if it has none, None when it couldn't tell"""
+        try:
+            response = await self._request(
+                "verify_transaction", "GET", f"/transaction/verify/{reference}", idempotent=True
+            )
+            if response is None:
+                return None
+            response_data = response.json()
+            if response.status_code == 200 and response_data.get("status"):
+                return response_data.get("data") or {}
+            # Paystack answers an unknown reference with 400 "Transaction reference not found"
+            if response.status_code in (400, 404):
+                return False
+            logger.error(f"Paystack lookup of {reference} returned {response.status_code}")
+            return None
+
+        except Exception as e:
+            logger.error(f"Lookup error: {str(e)}")
+            return None
+
     async def create_transfer_recipient(self, name, account_number, bank_code, currency="GHS"):
-        url = f"{self.base_url}/transferrecipient"
         payload = {
             "type": "mobile_money",
             "name": name,
@@ -78,11 +256,12 @@ class PaystackService:
         }
         
         try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(url, json=payload, headers=self.headers)
-                return response.json()
+            response = await self._request("create_transfer_recipient", "POST", "/transferrecipient", json=payload)
+            if response is None:
+                return None
+            return response.json()
         except Exception as e:
             logger.error(f"Transfer recipient error: {str(e)}")
             return None
 
-paystack_service = PaystackService()
\ No newline at end of file
+paystack_service = PaystackService()
@@ -0,0 +1,115 @@
+import asyncio
+import hashlib
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import select, update, or_
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import FuelPrice, FuelType
+from app.shared_state import shared_state
+
+
+@dataclass(frozen=True)
+class PriceEntry:
+    id: int
+    price_per_liter: float
+    currency: str
+    effective_from: datetime
+
+
+@dataclass
+class PriceSnapshot:
+    """Prices in effect at load time, plus when they next change"""
+    prices: dict
+    valid_until: Optional[datetime]
+    loaded_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def etag(self) -> str:
+        versions = ",".join(f"{fuel.value}:{entry.id}" for fuel, entry in sorted(self.prices.items()))
+        return '"' + hashlib.sha1(versions.encode()).hexdigest()[:16] + '"'
+
+    @property
+    def last_updated(self) -> Optional[datetime]:
+        return max((entry.effective_from for entry in self.prices.values()), default=None)
+
+    def is_stale(self) -> bool:
+        if self.valid_until is not None and datetime.utcnow() >= self.valid_until:
+            return True
+        return time.monotonic() - self.loaded_at >= settings.fuel_price_refresh_seconds
+
+
+class FuelPriceService:
+    """Serves fuel prices from an in-memory snapshot of the fuel_prices table.
+
+    The snapshot is reloaded when a price window opens or closes, when any
+    worker changes a price (announced over shared state), and otherwise
+    every FUEL_PRICE_REFRESH_SECONDS in case an announcement was missed.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal):
+        self.session_factory = session_factory
+        self._snapshot: Optional[PriceSnapshot] = None
+        self._lock = asyncio.Lock()
+
+    async def get_snapshot(self) -> PriceSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None or snapshot.is_stale():
+            async with self._lock:
+                if self._snapshot is None or self._snapshot.is_stale():
+                    self._snapshot = await self._load()
+                snapshot = self._snapshot
+        return snapshot
+
+    def invalidate(self):
+        self._snapshot = None
+
+    async def _load(self) -> PriceSnapshot:
+        now = datetime.utcnow()
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(FuelPrice)
+                .where(or_(FuelPrice.effective_to.is_(None), FuelPrice.effective_to > now))
+                .order_by(FuelPrice.fuel_type, FuelPrice.effective_from)
+            )
+            rows = result.scalars().all()
+
+        prices = {}
+        valid_until = None
+        for row in rows:
+            if row.effective_from <= now:
+                # Later windows overwrite earlier ones for the same fuel
+                prices[row.fuel_type] = PriceEntry(row.id, row.price_per_liter, row.currency, row.effective_from)
+            else:
+                valid_until = row.effective_from if valid_until is None else min(valid_until, row.effective_from)
+            if row.effective_to is not None:
+                valid_until = row.effective_to if valid_until is None else min(valid_until, row.effective_to)
+        return PriceSnapshot(prices=prices, valid_until=valid_until)
+
+    async def set_price(self, db, fuel_type: FuelType, price_per_liter: float,
+                        effective_from: Optional[datetime] = None) -> FuelPrice:
+        """Open a new price window, closing the one it supersedes"""
+        effective_from = effective_from or datetime.utcnow()
+        await db.execute(
+            update(FuelPrice)
+            .where(
+                FuelPrice.fuel_type == fuel_type,
+                FuelPrice.effective_from < effective_from,
+                or_(FuelPrice.effective_to.is_(None), FuelPrice.effective_to > effective_from)
+            )
+            .values(effective_to=effective_from)
+        )
+        price = FuelPrice(fuel_type=fuel_type, price_per_liter=price_per_liter, effective_from=effective_from)
+        db.add(price)
+        await db.commit()
+        self.invalidate()
+        await shared_state.publish("fuel_prices", {"fuel_type": fuel_type.value})
+        return price
+
+
+fuel_price_service = FuelPriceService()
+shared_state.subscribe("fuel_prices", lambda message: fuel_price_service.invalidate(), echo=False)
@@ -0,0 +1,32 @@
+from sqlalchemy import select
+
+from app.models import Order
+from app.schemas import OrderResponse
+
+# Every field an order response can carry, in response order
+ORDER_FIELDS = tuple(OrderResponse.model_fields)
+
+# Columns keyset pagination needs even when the client didn't ask for them
+CURSOR_FIELDS = ("created_at", "id")
+
+
+def order_fields(fields: str = None) -> tuple:
+    """OrderResponse fields a comma-separated ?fields= value asks for (all if empty); raises ValueError"""
+    if not fields:
+        return ORDER_FIELDS
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested.difference(ORDER_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}; choose from {', '.join(ORDER_FIELDS)}")
+    return tuple(name for name in ORDER_FIELDS if name in requested)
+
+
+def select_orders(names: tuple):
+    """Select only these Order columns (then any cursor column not among them) instead of whole entities"""
+    extra = tuple(name for name in CURSOR_FIELDS if name not in names)
+    return select(*(getattr(Order, name) for name in names + extra))
+
+
+def order_dicts(rows, names: tuple) -> list:
+    """Rows from select_orders as plain dicts of the requested fields, ready for orjson"""
+    return [dict(zip(names, row)) for row in rows]
@@ -0,0 +1,301 @@
+import json
+import logging
+import math
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from fastapi import Depends, HTTPException, Response, status
+
+from app.auth import AuthenticatedUser, get_current_user
+from app.config import settings
+from app.shared_state import RedisState, shared_state
+
+logger = logging.getLogger(__name__)
+
+RATE_UNITS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+def parse_rate(rate: str) -> tuple:
+    """(limit, window seconds) from "20/minute", "5/hour" or "10/900" (seconds)"""
+    limit, _, per = rate.partition("/")
+    per = per.strip().lower()
+    window = int(per) if per.isdigit() else RATE_UNITS[per.rstrip("s")]
+    return int(limit), window
+
+
+class MemoryStore:
+    """Per-process window counters, evicting the least recently used key past max_keys"""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        # key -> [window index, hits this window, hits last window]
+        self._counters: "OrderedDict[str, list]" = OrderedDict()
+        self.evictions = 0
+
+    async def increment(self, key: str, window: int, now: float, amount: int = 1) -> tuple:
+        index = int(now // window)
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = self._counters[key] = [index, 0, 0]
+            while len(self._counters) > self.max_keys:
+                self._counters.popitem(last=False)
+                self.evictions += 1
+        else:
+            self._counters.move_to_end(key)
+        if counter[0] != index:
+            # Roll forward; a gap of more than one window leaves nothing behind
+            counter[2] = counter[1] if counter[0] == index - 1 else 0
+            counter[0], counter[1] = index, 0
+        counter[1] += amount
+        return counter[1], counter[2]
+
+    def __len__(self) -> int:
+        return len(self._counters)
+
+    async def close(self):
+        pass
+
+
+class RedisStore:
+    """Window counters in Redis (or anything speaking its INCRBY/EXPIRE/GET), shared by every worker"""
+
+    def __init__(self, client, prefix: str = "ratelimit:", owns_client: bool = True):
+        self.client = client
+        self.prefix = prefix
+        self.owns_client = owns_client
+
+    async def increment(self, key: str, window: int, now: float, amount: int = 1) -> tuple:
+        index = int(now // window)
+        current = f"{self.prefix}{key}:{index}"
+        pipe = self.client.pipeline(transaction=False)
+        pipe.incrby(current, amount)
+        pipe.expire(current, window * 2)
+        pipe.get(f"{self.prefix}{key}:{index - 1}")
+        hits, _, previous = await pipe.execute()
+        return int(hits), int(previous or 0)
+
+    async def close(self):
+        if self.owns_client:
+            await self.client.aclose()
+
+
+RATE_LIMIT_HEADERS = ["RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset", "RateLimit-Policy"]
+
+
+@dataclass
+class Decision:
+    allowed: bool
+    limit: int
+    window: int
+    remaining: int
+    reset: int
+    retry_after: int
+
+    def headers(self) -> dict:
+        headers = dict(zip(RATE_LIMIT_HEADERS, (
+            str(self.limit), str(self.remaining), str(self.reset), f"{self.limit};w={self.window}"
+        )))
+        if not self.allowed:
+            headers["Retry-After"] = str(self.retry_after)
+        return headers
+
+
+def _decide(limit: int, window: int, now: float, hits: int, previous: int) -> Decision:
+    """Sliding-window estimate: last window's hits weighted by how much of it still overlaps, plus this one's"""
+    elapsed = now % window
+    estimate = previous * (1 - elapsed / window) + hits
+    allowed = estimate <= limit
+    if hits + 1 <= limit:
+        # Wait for enough of last window to slide out
+        wait = window * (1 - (limit - hits - 1) / previous) - elapsed if previous else 0.0
+    else:
+        # Wait out this window, then for enough of it to slide out in turn
+        wait = (window - elapsed) + window * (1 - (limit - 1) / hits)
+    retry_after = max(1, math.ceil(wait))
+    return Decision(
+        allowed=allowed,
+        limit=limit,
+        window=window,
+        remaining=max(0, math.floor(limit - estimate)),
+        reset=retry_after if not allowed else math.ceil(window - elapsed),
+        retry_after=retry_after,
+    )
+
+
+class RateLimiter:
+    """Named rate policies over a counter store.
+
+    Each policy allows `limit` hits per `window` seconds per key (an IP,
+    user id or account), estimated from the current and previous fixed
+    windows, so every key costs two counters whatever the traffic. Denied
+    hits count too, so a client hammering through a limit stays limited.
+    If the store fails the request is allowed: the limiter must not take
+    the API down with it.
+    """
+
+    def __init__(self, store, policies: dict):
+        self.store = store
+        self.policies = {name: parse_rate(rate) for name, rate in policies.items()}
+        self.allowed = 0
+        self.denied = 0
+        self.store_errors = 0
+
+    async def hit(self, policy: str, key: str, amount: int = 1) -> Optional[Decision]:
+        """Count `amount` hits for key under policy and decide; amount=0 only checks"""
+        limit, window = self.policies[policy]
+        now = time.time()
+        try:
+            hits, previous = await self.store.increment(f"{policy}:{key}", window, now, amount)
+        except Exception:
+            self.store_errors += 1
+            logger.exception(f"Rate limit store failed for {policy}")
+            return None
+        # A check (amount=0) asks whether one more hit would still be allowed
+        decision = _decide(limit, window, now, hits if amount else hits + 1, previous)
+        if decision.allowed:
+            self.allowed += 1
+        else:
+            self.denied += 1
+        return decision
+
+    async def close(self):
+        await self.store.close()
+
+    def stats(self) -> dict:
+        return {
+            "enabled": settings.rate_limit_enabled,
+            "store": type(self.store).__name__,
+            "keys": len(self.store) if isinstance(self.store, MemoryStore) else None,
+            "evictions": getattr(self.store, "evictions", 0),
+            "allowed": self.allowed,
+            "denied": self.denied,
+            "store_errors": self.store_errors,
+            "policies": {name: f"{limit}/{window}s" for name, (limit, window) in self.policies.items()},
+        }
+
+
+def rate_limit_exceeded(decision: Decision) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail="Too many requests, please retry later",
+        headers=decision.headers()
+    )
+
+
+def client_ip(scope) -> str:
+    """The caller's address, taken from X-Forwarded-For when behind RATE_LIMIT_PROXY_HOPS proxies"""
+    hops = settings.rate_limit_proxy_hops
+    if hops:
+        for name, value in scope["headers"]:
+            if name == b"x-forwarded-for":
+                forwarded = [part.strip() for part in value.decode("latin-1").split(",")]
+                # Each trusted proxy appended the address it saw; earlier entries are client-supplied
+                return forwarded[-hops] if len(forwarded) >= hops else forwarded[0]
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+# Per-IP policies for specific routes, on top of "default" for every route
+ROUTE_POLICIES = {
+    ("POST", "/auth/login"): "login",
+    ("POST", "/auth/signup"): "signup",
+    ("GET", "/test-paystack"): "paystack_test",
+}
+
+# Signed server-to-server callbacks; Paystack's few addresses would trip per-IP limits
+EXEMPT_PATHS = {"/webhook/paystack"}
+
+
+class RateLimitMiddleware:
+    """Apply the per-IP policies to HTTP requests, answering 429 before the app does any work"""
+
+    def __init__(self, app, limiter: "RateLimiter" = None):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        limiter = self.limiter or rate_limiter
+        if scope["type"] != "http" or not settings.rate_limit_enabled or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        ip = client_ip(scope)
+        decisions = [await limiter.hit("default", ip)]
+        route_policy = ROUTE_POLICIES.get((scope["method"], scope["path"]))
+        if route_policy:
+            decisions.append(await limiter.hit(route_policy, ip))
+        decisions = [decision for decision in decisions if decision is not None]
+        if not decisions:
+            await self.app(scope, receive, send)
+            return
+
+        denied = [decision for decision in decisions if not decision.allowed]
+        if denied:
+            decision = max(denied, key=lambda d: d.retry_after)
+            await _send_json(send, 429, {"detail": "Too many requests, please retry later"}, decision.headers())
+            return
+
+        # Report whichever policy is closest to running out, unless a per-user policy already did
+        headers = [
+            (name.lower().encode(), value.encode())
+            for name, value in min(decisions, key=lambda d: d.remaining).headers().items()
+        ]
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                existing = list(message.get("headers", []))
+                names = {name.lower() for name, _ in existing}
+                message = {**message, "headers": existing + [h for h in headers if h[0] not in names]}
+            await send(message)
+
+        await self.app(scope, receive, send_with_headers)
+
+
+async def _send_json(send, status_code: int, content: dict, headers: dict):
+    body = json.dumps(content).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode())]
+        + [(name.lower().encode(), value.encode()) for name, value in headers.items()],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def limit_per_user(policy: str):
+    """Dependency applying a policy per signed-in user, with RateLimit-* headers on the response"""
+    async def check(response: Response, current_user: AuthenticatedUser = Depends(get_current_user)):
+        if not settings.rate_limit_enabled:
+            return
+        decision = await rate_limiter.hit(policy, str(current_user.id))
+        if decision is None:
+            return
+        if not decision.allowed:
+            raise rate_limit_exceeded(decision)
+        response.headers.update(decision.headers())
+    return check
+
+
+def _build_store():
+    if settings.rate_limit_store == "shared":
+        if isinstance(shared_state, RedisState):
+            # The shared state's connection pool, closed along with it
+            return RedisStore(shared_state.client, f"{shared_state.prefix}ratelimit:", owns_client=False)
+        return MemoryStore(settings.rate_limit_max_keys)
+    if settings.rate_limit_store == "redis":
+        import redis.asyncio as redis  # optional; only needed for the shared store
+        return RedisStore(redis.from_url(settings.rate_limit_redis_url))
+    return MemoryStore(settings.rate_limit_max_keys)
+
+
+rate_limiter = RateLimiter(_build_store(), {
+    "default": settings.rate_limit_default,
+    "login": settings.rate_limit_login,
+    "login_account": settings.rate_limit_login_account,
+    "signup": settings.rate_limit_signup,
+    "orders": settings.rate_limit_orders,
+    "orders_bulk": settings.rate_limit_orders_bulk,
+    "paystack_test": settings.rate_limit_paystack_test,
+})
@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import select, update, or_
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import Order, OrderStatus, PaymentStatus
+from app.paystack import paystack_service
+from app.shared_state import shared_state
+from app.transitions import apply_payment_result, expire_unpaid_order, notify_transitions
+
+logger = logging.getLogger(__name__)
+
+
+def payment_outcome(verification) -> Optional[bool]:
+    """True if Paystack says the charge succeeded, False if it definitively failed, None if undecided"""
+    if not verification or not verification.get("status"):
+        return None
+    state = (verification.get("data") or {}).get("status")
+    if state == "success":
+        return True
+    if state in ("failed", "reversed"):
+        return False
+    return None
+
+
+class RateLimiter:
+    """Spaces out call starts to at most `rate` per second"""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def wait(self):
+        async with self._lock:
+            now = time.monotonic()
+            delay = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class PaymentReconciler:
+    """Periodically settles orders whose payment is still PENDING.
+
+    Orders older than RECONCILE_MIN_AGE are verified against Paystack in
+    rate-limited concurrent batches, least recently checked first. Orders
+    still unpaid, or whose payment failed, after RECONCILE_EXPIRE_AFTER are
+    cancelled.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal):
+        self.session_factory = session_factory
+        self.limiter = RateLimiter(settings.reconcile_rate_per_second)
+        self._task = None
+        self.runs = 0
+        self.verified = 0
+        self.confirmed = 0
+        self.failed = 0
+        self.expired = 0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        await shared_state.resign("reconcile")
+
+    async def _run(self):
+        while True:
+            try:
+                # One worker reconciles at a time, so each reference is verified once per pass
+                if await shared_state.lead("reconcile", settings.reconcile_interval * 3):
+                    await self.run_once()
+            except Exception:
+                logger.exception("Payment reconciliation pass failed")
+            await asyncio.sleep(settings.reconcile_interval)
+
+    async def _verify(self, semaphore: asyncio.Semaphore, reference: str):
+        async with semaphore:
+            await self.limiter.wait()
+            return await paystack_service.verify_transaction(reference)
+
+    async def run_once(self):
+        now = datetime.utcnow()
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(Order.id, Order.paystack_reference, Order.created_at)
+                .where(
+                    Order.payment_status == PaymentStatus.PENDING,
+                    Order.created_at < now - timedelta(seconds=settings.reconcile_min_age),
+                    or_(
+                        Order.payment_checked_at.is_(None),
+                        Order.payment_checked_at < now - timedelta(seconds=settings.reconcile_recheck_seconds)
+                    )
+                )
+                .order_by(Order.payment_checked_at.is_not(None), Order.payment_checked_at, Order.created_at)
+                .limit(settings.reconcile_batch_size)
+            )
+            pending = result.all()
+            # A failed charge leaves the order PENDING; once stale it is cancelled without asking Paystack again
+            result = await db.execute(
+                select(Order.id)
+                .where(
+                    Order.order_status == OrderStatus.PENDING,
+                    Order.payment_status == PaymentStatus.FAILED,
+                    Order.created_at < now - timedelta(seconds=settings.reconcile_expire_after)
+                )
+                .order_by(Order.created_at)
+                .limit(settings.reconcile_batch_size)
+            )
+            to_expire = list(result.scalars())
+        if not pending and not to_expire:
+            return
+
+        # Talk to Paystack without holding a database session open
+        semaphore = asyncio.Semaphore(settings.reconcile_concurrency)
+        to_verify = [row for row in pending if row.paystack_reference]
+        verifications = await asyncio.gather(
+            *(self._verify(semaphore, row.paystack_reference) for row in to_verify)
+        )
+        answers = {row.id: v for row, v in zip(to_verify, verifications)}
+
+        transitions = []
+        async with self.session_factory() as db:
+            expire_before = now - timedelta(seconds=settings.reconcile_expire_after)
+            for row in pending:
+                outcome = payment_outcome(answers.get(row.id))
+                if outcome is not None:
+                    transitions += await apply_payment_result(db, row.paystack_reference, outcome)
+                    self.confirmed += int(outcome)
+                    self.failed += int(not outcome)
+                stale = row.created_at < expire_before
+                if stale and outcome is False:
+                    to_expire.append(row.id)
+                elif stale and outcome is None and (answers.get(row.id) or not row.paystack_reference):
+                    # Only expire on an answer from Paystack, never because it was unreachable
+                    to_expire.append(row.id)
+            for order_id in to_expire:
+                expired = await expire_unpaid_order(db, order_id)
+                transitions += expired
+                self.expired += len(expired)
+
+            if pending:
+                await db.execute(
+                    update(Order)
+                    .where(Order.id.in_([row.id for row in pending]))
+                    .values(payment_checked_at=now, updated_at=Order.updated_at)
+                    .execution_options(synchronize_session=False)
+                )
+            await db.commit()
+        await notify_transitions(transitions)
+
+        self.runs += 1
+        self.verified += len(to_verify)
+        logger.info(f"Reconciled {len(pending)} pending orders ({len(to_verify)} verified with Paystack)")
+
+    def stats(self) -> dict:
+        return {
+            "leader": "reconcile" in shared_state.leases,
+            "runs": self.runs,
+            "verified": self.verified,
+            "confirmed": self.confirmed,
+            "failed": self.failed,
+            "expired": self.expired,
+        }
+
+
+payment_reconciler = PaymentReconciler()
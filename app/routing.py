@@ -0,0 +1,282 @@
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import or_, select
+
+from app.dispatch import EARTH_RADIUS_KM
+from app.models import FuelType, Order, OrderStatus
+
+# Delivery windows for the schedule options the order form offers,
+# as (earliest, latest) offsets from when the order was placed
+DELIVERY_WINDOWS = {
+    "now": (timedelta(0), timedelta(hours=1)),
+    "1hour": (timedelta(hours=1), timedelta(hours=2)),
+    "2hours": (timedelta(hours=2), timedelta(hours=3)),
+}
+
+# Weights of the next-stop score: travel time, time spent waiting for the
+# window to open, and slack left before it closes (favours urgent stops)
+TRAVEL_WEIGHT = 0.5
+WAIT_WEIGHT = 0.3
+URGENCY_WEIGHT = 0.2
+
+
+def delivery_window(delivery_time: str, placed_at: datetime) -> tuple:
+    """The (earliest, latest) datetimes a delivery_time value allows"""
+    if delivery_time in DELIVERY_WINDOWS:
+        earliest, latest = DELIVERY_WINDOWS[delivery_time]
+        return placed_at + earliest, placed_at + latest
+    day = placed_at.replace(hour=0, minute=0, second=0, microsecond=0)
+    if delivery_time == "today":
+        return placed_at, day + timedelta(hours=20)
+    if delivery_time == "tomorrow":
+        return day + timedelta(days=1, hours=8), day + timedelta(days=1, hours=18)
+    try:
+        requested = datetime.fromisoformat(delivery_time)
+    except ValueError:
+        return placed_at, placed_at + timedelta(hours=1)
+    return requested, requested + timedelta(hours=1)
+
+
+def distance_matrix(lats: np.ndarray, lngs: np.ndarray) -> np.ndarray:
+    """Pairwise haversine distances in kilometres"""
+    phi = np.radians(lats)
+    lam = np.radians(lngs)
+    dphi = phi[:, None] - phi[None, :]
+    dlam = lam[:, None] - lam[None, :]
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi)[:, None] * np.cos(phi)[None, :] * np.sin(dlam / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+@dataclass(frozen=True)
+class Stop:
+    order_id: int
+    lat: float
+    lng: float
+    fuel_type: FuelType
+    quantity: int
+    earliest: datetime
+    latest: datetime
+
+
+def plannable_orders(fuel_types=None, order_ids=None, driver_id: int = None):
+    """Confirmed orders with coordinates that are unassigned (or already the driver's)"""
+    unassigned = Order.driver_id.is_(None)
+    stmt = select(Order).where(
+        Order.order_status == OrderStatus.CONFIRMED,
+        Order.delivery_lat.is_not(None),
+        or_(unassigned, Order.driver_id == driver_id) if driver_id else unassigned
+    )
+    if fuel_types is not None:
+        stmt = stmt.where(Order.fuel_type.in_(fuel_types))
+    if order_ids:
+        stmt = stmt.where(Order.id.in_(order_ids))
+    return stmt.order_by(Order.created_at)
+
+
+def stops_from_orders(orders) -> list:
+    """Stops for orders that have delivery coordinates"""
+    return [
+        Stop(
+            order.id, order.delivery_lat, order.delivery_lng, order.fuel_type, order.quantity,
+            *delivery_window(order.delivery_time, order.created_at)
+        )
+        for order in orders
+        if order.delivery_lat is not None and order.delivery_lng is not None
+    ]
+
+
+@dataclass
+class PlannedStop:
+    order_id: int
+    arrival: datetime
+    liters: int
+
+
+@dataclass
+class Trip:
+    vehicle: int
+    fuel_type: FuelType
+    depart: datetime
+    return_at: datetime
+    liters: int
+    distance_km: float
+    stops: list = field(default_factory=list)
+
+
+@dataclass
+class RoutePlan:
+    trips: list
+    unscheduled: list
+    distance_km: float
+    single_trip_km: float
+    solve_ms: float
+
+
+class _Problem:
+    """Stops as arrays, with node 0 as the depot and times in minutes from the start"""
+
+    def __init__(self, stops: list, depot: tuple, start: datetime, speed_kmh: float, service_minutes: float):
+        self.stops = stops
+        self.start = start
+        self.service = service_minutes
+        lats = np.array([depot[0]] + [s.lat for s in stops])
+        lngs = np.array([depot[1]] + [s.lng for s in stops])
+        self.distance = distance_matrix(lats, lngs)
+        self.travel = self.distance / speed_kmh * 60.0
+        self.quantity = np.array([0] + [s.quantity for s in stops])
+        self.earliest = np.array([0.0] + [self.minutes(s.earliest) for s in stops])
+        self.latest = np.array([np.inf] + [self.minutes(s.latest) for s in stops])
+        self.fuel = np.array([-1] + [list(FuelType).index(s.fuel_type) for s in stops])
+
+    def minutes(self, moment: datetime) -> float:
+        return (moment - self.start).total_seconds() / 60.0
+
+    def at(self, minutes: float) -> datetime:
+        return self.start + timedelta(minutes=float(minutes))
+
+    def schedule(self, route: list, depart: float):
+        """Arrival minute at each stop of a depot-to-depot route, or None if a window is missed"""
+        arrivals = []
+        now, here = depart, 0
+        for node in route:
+            arrival = now + self.travel[here, node]
+            if arrival > self.latest[node]:
+                return None
+            arrivals.append(arrival)
+            now = max(arrival, self.earliest[node]) + self.service
+            here = node
+        return arrivals, now + self.travel[here, 0]
+
+    def length(self, route: list) -> float:
+        path = [0] + route + [0]
+        return float(self.distance[path[:-1], path[1:]].sum())
+
+
+def _build_trips(problem: _Problem, capacity: int, vehicles: int) -> tuple:
+    """Time-oriented nearest neighbour: grow each trip with the best-scoring feasible stop.
+
+    The next trip always goes to the tanker that gets back to the depot first.
+    """
+    remaining = np.ones(len(problem.quantity), dtype=bool)
+    remaining[0] = False
+    remaining &= problem.quantity <= capacity
+    unscheduled = [i for i in range(1, len(remaining)) if not remaining[i] and problem.quantity[i] > capacity]
+
+    trips = []
+    free_at = [0.0] * vehicles
+    while remaining.any():
+        vehicle = min(range(vehicles), key=free_at.__getitem__)
+        now = free_at[vehicle]
+        route, load, here, clock, fuel = [], 0, 0, now, None
+        while True:
+            arrival = clock + problem.travel[here]
+            feasible = remaining & (arrival <= problem.latest) & (problem.quantity <= capacity - load)
+            if fuel is not None:
+                feasible &= problem.fuel == fuel
+            if not feasible.any():
+                break
+            wait = np.maximum(problem.earliest - arrival, 0.0)
+            slack = problem.latest - arrival
+            score = (
+                TRAVEL_WEIGHT * problem.travel[here]
+                + WAIT_WEIGHT * wait
+                + URGENCY_WEIGHT * np.where(np.isfinite(slack), slack, 0.0)
+            )
+            node = int(np.argmin(np.where(feasible, score, np.inf)))
+            route.append(node)
+            remaining[node] = False
+            load += int(problem.quantity[node])
+            fuel = problem.fuel[node]
+            clock = max(arrival[node], problem.earliest[node]) + problem.service
+            here = node
+
+        if not route:
+            # Nothing left can be reached in its window, even by the first tanker back
+            unscheduled += [int(i) for i in np.flatnonzero(remaining)]
+            break
+        trips.append((vehicle, route, now))
+        free_at[vehicle] = problem.schedule(route, now)[1]
+    return trips, unscheduled
+
+
+def _two_opt(problem: _Problem, route: list, depart: float, max_rounds: int = 50) -> list:
+    """Reverse segments while it shortens the trip, every window still holds and it is back no later.
+
+    The tanker's next trip was planned to leave when this one first got
+    back, so a shorter route that waits longer and returns later is refused.
+    """
+    back = problem.schedule(route, depart)[1]
+    for _ in range(max_rounds):
+        path = np.array([0] + route + [0])
+        n = len(route)
+        if n < 3:
+            return route
+        d = problem.distance
+        # gain[i, j] of reversing route[i..j], i.e. path[i+1..j+1]
+        a, b = path[:-1], path[1:]
+        gain = (d[a, b][:, None] + d[a, b][None, :]) - (d[a[:, None], a[None, :]] + d[b[:, None], b[None, :]])
+        gain = np.triu(gain[:n, 1:n + 1], k=1)
+        improved = False
+        for flat in np.argsort(gain, axis=None)[::-1]:
+            i, j = divmod(int(flat), n)
+            if gain[i, j] <= 1e-9:
+                break
+            candidate = route[:i] + route[i:j + 1][::-1] + route[j + 1:]
+            scheduled = problem.schedule(candidate, depart)
+            if scheduled is not None and scheduled[1] <= back + 1e-9:
+                route = candidate
+                improved = True
+                break
+        if not improved:
+            return route
+    return route
+
+
+def plan_routes(stops: list, capacity: int, depot: tuple, start: datetime, vehicles: int = 1,
+                speed_kmh: float = 30.0, service_minutes: float = 10.0, improve: bool = True) -> RoutePlan:
+    """Sequence stops into depot-to-depot trips for `vehicles` tankers of one size.
+
+    Each trip carries one fuel type and at most `capacity` litres, and
+    reaches every stop before its window closes (waiting if early). A
+    tanker's trips run back to back, refilling at the depot in between.
+    """
+    started = time.perf_counter()
+    problem = _Problem(stops, depot, start, speed_kmh, service_minutes)
+    built, unscheduled = _build_trips(problem, capacity, vehicles)
+
+    trips = []
+    total_km = 0.0
+    free_at = [0.0] * vehicles
+    for vehicle, route, depart in built:
+        if improve:
+            route = _two_opt(problem, route, depart)
+        # A shorter earlier trip only means leaving sooner and waiting more
+        depart = min(depart, free_at[vehicle])
+        arrivals, back = problem.schedule(route, depart)
+        free_at[vehicle] = back
+        distance = problem.length(route)
+        total_km += distance
+        trips.append(Trip(
+            vehicle=vehicle,
+            fuel_type=stops[route[0] - 1].fuel_type,
+            depart=problem.at(depart),
+            return_at=problem.at(back),
+            liters=int(problem.quantity[route].sum()),
+            distance_km=round(distance, 3),
+            stops=[
+                PlannedStop(stops[node - 1].order_id, problem.at(arrival), stops[node - 1].quantity)
+                for node, arrival in zip(route, arrivals)
+            ]
+        ))
+
+    return RoutePlan(
+        trips=trips,
+        unscheduled=[stops[node - 1].order_id for node in unscheduled],
+        distance_km=round(total_km, 3),
+        single_trip_km=round(float(2 * problem.distance[0, 1:].sum()), 3),
+        solve_ms=round((time.perf_counter() - started) * 1000, 2)
+    )
+
@@ -1,7 +1,7 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from pydantic import BaseModel, EmailStr, Field
+from typing import List, Optional
 from datetime import datetime
-from app.models import FuelType, OrderStatus, PaymentStatus, UserRole
+from app.models import FuelType, OrderStatus, PaymentStatus, UserRole, OutboxStatus
 
 class OrderCreate(BaseModel):
     phone_number: str
@@ -10,6 +10,8 @@ class OrderCreate(BaseModel):
     fuel_type: FuelType
     quantity: int
     delivery_time: str
+    delivery_lat: Optional[float] = Field(default=None, ge=-90, le=90)
+    delivery_lng: Optional[float] = Field(default=None, ge=-180, le=180)
 
 class OrderResponse(BaseModel):
     id: int
@@ -21,18 +23,132 @@ class OrderResponse(BaseModel):
     price_per_liter: float
     total_amount: float
     delivery_time: str
+    fuel_price_id: Optional[int] = None
+    delivery_lat: Optional[float] = None
+    delivery_lng: Optional[float] = None
+    driver_id: Optional[int] = None
     order_status: OrderStatus
     payment_status: PaymentStatus
     paystack_reference: Optional[str]
+    version: int = 0
     created_at: datetime
     updated_at: datetime
 
     class Config:
         from_attributes = True
 
+class OrderStatusChange(BaseModel):
+    version: int
+    reason: str
+    from_order_status: OrderStatus
+    from_payment_status: PaymentStatus
+    order_status: OrderStatus
+    payment_status: PaymentStatus
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+
+class OrderPage(BaseModel):
+    items: List[OrderResponse]
+    next_cursor: Optional[str] = None
+
 class OrderWithPaymentResponse(BaseModel):
     order: OrderResponse
-    payment_url: str
+    payment_url: Optional[str] = None
+    payment_status_url: Optional[str] = None
+
+class PaymentInitResponse(BaseModel):
+    order_id: int
+    status: OutboxStatus
+    reference: str
+    payment_url: Optional[str] = None
+    error: Optional[str] = None
+
+class FuelPriceUpdate(BaseModel):
+    price_per_liter: float
+    effective_from: Optional[datetime] = None
+
+class DriverLocationUpdate(BaseModel):
+    order_id: Optional[int] = None
+    lat: float = Field(ge=-90, le=90)
+    lng: float = Field(ge=-180, le=180)
+    heading: Optional[float] = None
+    speed: Optional[float] = None
+
+class DriverProfileUpdate(BaseModel):
+    capacity_liters: int = Field(gt=0)
+    fuel_types: List[FuelType] = Field(min_length=1)
+    is_available: bool
+
+class DriverProfileResponse(BaseModel):
+    user_id: int
+    capacity_liters: int
+    fuel_types: List[FuelType]
+    is_available: bool
+
+class DeliveryStatusUpdate(BaseModel):
+    order_status: OrderStatus
+
+class RoutePlanRequest(BaseModel):
+    driver_id: Optional[int] = None
+    capacity_liters: Optional[int] = Field(default=None, gt=0)
+    vehicles: int = Field(default=1, ge=1)
+    fuel_type: Optional[FuelType] = None
+    order_ids: Optional[List[int]] = None
+    start: Optional[datetime] = None
+    improve: bool = True
+
+class PlannedStopResponse(BaseModel):
+    order_id: int
+    arrival: datetime
+    liters: int
+
+    class Config:
+        from_attributes = True
+
+class TripResponse(BaseModel):
+    vehicle: int
+    fuel_type: FuelType
+    depart: datetime
+    return_at: datetime
+    liters: int
+    distance_km: float
+    stops: List[PlannedStopResponse]
+
+    class Config:
+        from_attributes = True
+
+class RoutePlanResponse(BaseModel):
+    trips: List[TripResponse]
+    unscheduled: List[int]
+    distance_km: float
+    single_trip_km: float
+    solve_ms: float
+
+    class Config:
+        from_attributes = True
+
+class AnalyticsRow(BaseModel):
+    bucket: Optional[datetime] = None
+    fuel_type: Optional[FuelType] = None
+    region: Optional[str] = None
+    order_status: Optional[OrderStatus] = None
+    payment_status: Optional[PaymentStatus] = None
+    orders: int
+    liters: int
+    amount: float
+    paid_orders: int
+    paid_liters: int
+    revenue: float
+    failed_orders: int
+    conversion: float
+
+class AnalyticsResponse(BaseModel):
+    period: str
+    start: datetime
+    end: datetime
+    rows: List[AnalyticsRow]
 
 # User Authentication Schemas
 class UserCreate(BaseModel):
@@ -40,7 +156,6 @@ class UserCreate(BaseModel):
     email: EmailStr
     phone_number: str
     password: str
-    role: UserRole = UserRole.CUSTOMER
 
 class UserLogin(BaseModel):
     email: EmailStr
@@ -62,16 +177,25 @@ class UserResponse(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
     user: UserResponse
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
 class TokenData(BaseModel):
     email: Optional[str] = None
+    user_id: Optional[int] = None
+    token_version: Optional[int] = None
 
 class UserUpdate(BaseModel):
     full_name: Optional[str] = None
     phone_number: Optional[str] = None
     is_active: Optional[bool] = None
 
+class UserRoleUpdate(BaseModel):
+    role: UserRole
+
 class PasswordChange(BaseModel):
     current_password: str
     new_password: str
@@ -0,0 +1,256 @@
+import asyncio
+import json
+import logging
+import os
+import uuid
+from typing import Optional
+
+from app.cache import TTLCache
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Take a lease if nobody holds it, or extend it if we do; returns 1 when we hold it afterwards
+LEAD_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("PEXPIRE", KEYS[1], ARGV[2])
+end
+if redis.call("SET", KEYS[1], ARGV[1], "NX", "PX", ARGV[2]) then
+    return 1
+end
+return 0
+"""
+
+# Give a lease up, but only if it is still ours
+RESIGN_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+
+
+class SharedState:
+    """Cache entries, pub/sub channels and leases that every worker sees alike.
+
+    Handlers subscribe to a channel with a plain callable taking the
+    message dict and are called on the event loop for every message
+    published on it by any worker, this one included unless echo=False.
+    Delivery is best effort: a message published while a worker is
+    disconnected is lost to it, so subscribers must tolerate gaps. A
+    lease names the one worker that runs a singleton job (dispatch,
+    reconciliation) and lapses if that worker stops renewing it.
+    """
+
+    def __init__(self):
+        self.worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self.handlers = {}
+        self.leases = set()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.published = 0
+        self.received = 0
+        self.errors = 0
+
+    def subscribe(self, channel: str, handler, echo: bool = True):
+        self.handlers.setdefault(channel, []).append((handler, echo))
+
+    def _deliver(self, channel: str, message: dict, origin: str):
+        self.received += 1
+        for handler, echo in self.handlers.get(channel, ()):
+            if origin == self.worker_id and not echo:
+                continue
+            try:
+                handler(message)
+            except Exception:
+                logger.exception(f"Handler for shared channel {channel} failed")
+
+    async def start(self):
+        pass
+
+    async def close(self):
+        pass
+
+    def stats(self) -> dict:
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "backend": type(self).__name__,
+            "worker_id": self.worker_id,
+            "channels": sorted(self.handlers),
+            "leases": sorted(self.leases),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "cache_hit_ratio": round(self.cache_hits / lookups, 4) if lookups else 0.0,
+            "published": self.published,
+            "received": self.received,
+            "errors": self.errors,
+        }
+
+
+class MemoryState(SharedState):
+    """Shared state for a single worker process; every lease is always ours"""
+
+    def __init__(self, cache_size: int):
+        super().__init__()
+        self.cache = TTLCache(maxsize=cache_size, ttl=60)
+
+    async def get(self, key: str) -> Optional[str]:
+        value = self.cache.get(key)
+        if value is None:
+            self.cache_misses += 1
+        else:
+            self.cache_hits += 1
+        return value
+
+    async def set(self, key: str, value: str, ttl: float):
+        self.cache.set(key, value, ttl=ttl)
+
+    async def delete(self, key: str):
+        self.cache.delete(key)
+
+    async def publish(self, channel: str, message: dict):
+        self.published += 1
+        self._deliver(channel, message, self.worker_id)
+
+    async def lead(self, name: str, ttl: float) -> bool:
+        self.leases.add(name)
+        return True
+
+    async def resign(self, name: str):
+        self.leases.discard(name)
+
+
+class RedisState(SharedState):
+    """Shared state in Redis, for any number of workers on any number of hosts.
+
+    Cache and pub/sub failures are logged and counted, never raised: a
+    Redis outage turns cache lookups into misses and loses broadcasts
+    rather than failing requests. A lease that cannot be checked is not
+    held, so a singleton job pauses instead of running twice.
+    """
+
+    def __init__(self, client, prefix: str):
+        super().__init__()
+        self.client = client
+        self.prefix = prefix
+        self._pubsub = None
+        self._subscribed = set()
+        self._task: Optional[asyncio.Task] = None
+
+    async def get(self, key: str) -> Optional[str]:
+        try:
+            value = await self.client.get(self.prefix + key)
+        except Exception:
+            self.errors += 1
+            logger.exception(f"Shared cache read of {key} failed")
+            value = None
+        if value is None:
+            self.cache_misses += 1
+        else:
+            self.cache_hits += 1
+        return value
+
+    async def set(self, key: str, value: str, ttl: float):
+        try:
+            await self.client.set(self.prefix + key, value, px=max(1, int(ttl * 1000)))
+        except Exception:
+            self.errors += 1
+            logger.exception(f"Shared cache write of {key} failed")
+
+    async def delete(self, key: str):
+        try:
+            await self.client.delete(self.prefix + key)
+        except Exception:
+            self.errors += 1
+            logger.exception(f"Shared cache delete of {key} failed")
+
+    async def publish(self, channel: str, message: dict):
+        envelope = json.dumps({"origin": self.worker_id, "message": message})
+        try:
+            await self.client.publish(f"{self.prefix}channel:{channel}", envelope)
+        except Exception:
+            self.errors += 1
+            logger.exception(f"Publishing to shared channel {channel} failed")
+            return
+        self.published += 1
+
+    async def lead(self, name: str, ttl: float) -> bool:
+        try:
+            held = await self.client.eval(
+                LEAD_SCRIPT, 1, f"{self.prefix}lease:{name}", self.worker_id, max(1, int(ttl * 1000))
+            )
+        except Exception:
+            self.errors += 1
+            logger.exception(f"Checking the {name} lease failed")
+            held = False
+        if held:
+            if name not in self.leases:
+                logger.info(f"Worker {self.worker_id} took the {name} lease")
+            self.leases.add(name)
+        else:
+            self.leases.discard(name)
+        return bool(held)
+
+    async def resign(self, name: str):
+        if name not in self.leases:
+            return
+        self.leases.discard(name)
+        try:
+            await self.client.eval(RESIGN_SCRIPT, 1, f"{self.prefix}lease:{name}", self.worker_id)
+        except Exception:
+            self.errors += 1
+            logger.exception(f"Giving up the {name} lease failed")
+
+    async def start(self):
+        if self._task is None:
+            self._pubsub = self.client.pubsub()
+            self._task = asyncio.create_task(self._listen())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            await self._pubsub.aclose()
+        await self.client.aclose()
+
+    async def _listen(self):
+        channel_prefix = f"{self.prefix}channel:"
+        while True:
+            try:
+                # Channels subscribed to after start() are picked up here
+                new = self.handlers.keys() - self._subscribed
+                if new:
+                    await self._pubsub.subscribe(*(channel_prefix + channel for channel in new))
+                    self._subscribed |= new
+                if not self._subscribed:
+                    await asyncio.sleep(1.0)
+                    continue
+                message = await self._pubsub.get_message(ignore_subscribe_messages=True, timeout=1.0)
+            except Exception:
+                self.errors += 1
+                logger.exception("Shared state subscription failed; retrying")
+                await asyncio.sleep(1.0)
+                continue
+            if message is None or message["type"] != "message":
+                continue
+            try:
+                envelope = json.loads(message["data"])
+            except ValueError:
+                self.errors += 1
+                continue
+            self._deliver(message["channel"][len(channel_prefix):], envelope["message"], envelope["origin"])
+
+
+def _build_state() -> SharedState:
+    if settings.shared_state_backend == "redis":
+        import redis.asyncio as redis  # optional; only needed for the shared backend
+        client = redis.from_url(settings.shared_state_redis_url, decode_responses=True)
+        return RedisState(client, settings.shared_state_prefix)
+    return MemoryState(settings.shared_state_cache_size)
+
+
+shared_state = _build_state()
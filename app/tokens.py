@@ -0,0 +1,202 @@
+import binascii
+import json
+import logging
+import time
+import uuid
+from dataclasses import dataclass
+
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey, Ed25519PublicKey
+from cryptography.hazmat.primitives.serialization import (
+    Encoding, PublicFormat, load_pem_private_key, load_pem_public_key
+)
+from jose import jwk
+from jose.exceptions import JWKError
+from jose.utils import base64url_decode, base64url_encode
+
+from app.cache import TTLCache
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+ALGORITHMS = ("HS256", "RS256", "ES256", "EdDSA")
+
+ACCESS = "access"
+REFRESH = "refresh"
+
+# Key for tokens without a kid header: everything signed before keys were configurable
+DEFAULT_KID = "default"
+
+# The secret those tokens were signed with, compiled in
+BUILTIN_SECRET = "your-super-secret-jwt-key-change-this-in-production-12345"
+
+
+class InvalidToken(Exception):
+    """A token that is malformed, signed by an unknown key, forged, expired or of the wrong type"""
+
+
+class Ed25519Key:
+    """EdDSA (Ed25519) key with the sign/verify/to_dict interface of python-jose's keys, which lack EdDSA"""
+
+    def __init__(self, pem: bytes):
+        if b"PRIVATE KEY" in pem:
+            self._private = load_pem_private_key(pem, password=None)
+            if not isinstance(self._private, Ed25519PrivateKey):
+                raise JWKError("EdDSA keys must be Ed25519")
+            self._public = self._private.public_key()
+        else:
+            self._private = None
+            self._public = load_pem_public_key(pem)
+            if not isinstance(self._public, Ed25519PublicKey):
+                raise JWKError("EdDSA keys must be Ed25519")
+
+    def is_public(self) -> bool:
+        return self._private is None
+
+    def sign(self, msg: bytes) -> bytes:
+        if self._private is None:
+            raise JWKError("A public key cannot sign")
+        return self._private.sign(msg)
+
+    def verify(self, msg: bytes, sig: bytes) -> bool:
+        try:
+            self._public.verify(sig, msg)
+            return True
+        except InvalidSignature:
+            return False
+
+    def to_dict(self) -> dict:
+        raw = self._public.public_bytes(Encoding.Raw, PublicFormat.Raw)
+        return {"alg": "EdDSA", "kty": "OKP", "crv": "Ed25519", "x": base64url_encode(raw).decode()}
+
+
+@dataclass(frozen=True)
+class TokenKey:
+    kid: str
+    algorithm: str
+    signer: object  # None for a public key, which only verifies
+    verifier: object
+
+    @classmethod
+    def load(cls, spec: dict) -> "TokenKey":
+        """A key from one JWT_KEYS entry: kid, alg, and "secret" (HS256) or a PEM "key" / "key_file" """
+        kid, algorithm = spec["kid"], spec.get("alg", "HS256")
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"JWT key {kid}: alg must be one of {', '.join(ALGORITHMS)}")
+        if algorithm == "HS256":
+            key = jwk.construct(spec["secret"], algorithm)
+            return cls(kid, algorithm, key, key)
+        if "key_file" in spec:
+            with open(spec["key_file"], "rb") as f:
+                pem = f.read()
+        else:
+            pem = spec["key"].encode()
+        if algorithm == "EdDSA":
+            key = Ed25519Key(pem)
+            return cls(kid, algorithm, None if key.is_public() else key, key)
+        key = jwk.construct(pem, algorithm)
+        # python-jose's asymmetric keys only verify through their public half
+        return cls(kid, algorithm, None if key.is_public() else key, key if key.is_public() else key.public_key())
+
+    def jwk(self) -> dict:
+        return {**self.verifier.to_dict(), "kid": self.kid, "use": "sig"}
+
+
+def _segment(data: dict) -> bytes:
+    return base64url_encode(json.dumps(data, separators=(",", ":")).encode())
+
+
+class TokenService:
+    """Signs JWTs with the active key and verifies them with the key their kid names.
+
+    A token is checked with its key's own algorithm, never the one in its
+    header. To rotate, add the new key, make it active, and drop the old
+    one once the last token it signed has expired (the refresh lifetime).
+    Asymmetric keys are published at /.well-known/jwks.json so other
+    services can verify tokens without a secret. Verified tokens are
+    remembered until they expire, so a client's repeat requests cost a
+    lookup instead of a signature check.
+    """
+
+    def __init__(self, keys: list, active_kid: str, issuer: str, cache_size: int):
+        self.keys = {key.kid: key for key in keys}
+        self.active = self.keys.get(active_kid)
+        if self.active is None or self.active.signer is None:
+            raise ValueError(f"JWT_ACTIVE_KID {active_kid!r} must name a private key or secret in JWT_KEYS")
+        self.issuer = issuer
+        self.verified = TTLCache(maxsize=cache_size, ttl=60)
+        self.rejected = 0
+
+    def issue(self, claims: dict, token_type: str, lifetime: float) -> str:
+        now = int(time.time())
+        payload = {**claims, "typ": token_type, "iss": self.issuer, "iat": now, "exp": now + int(lifetime)}
+        if token_type == REFRESH:
+            payload["jti"] = uuid.uuid4().hex
+        header = {"alg": self.active.algorithm, "typ": "JWT", "kid": self.active.kid}
+        signing_input = _segment(header) + b"." + _segment(payload)
+        return (signing_input + b"." + base64url_encode(self.active.signer.sign(signing_input))).decode()
+
+    def decode(self, token: str, token_type: str = ACCESS) -> dict:
+        """The claims of a valid token of this type; raises InvalidToken"""
+        claims = self.verified.get(token)
+        if claims is None:
+            try:
+                claims = self._verify(token)
+            except InvalidToken:
+                self.rejected += 1
+                raise
+            self.verified.set(token, claims, ttl=claims["exp"] - time.time())
+        # Tokens from before refresh tokens existed carry no type and are access tokens
+        if claims.get("typ", ACCESS) != token_type:
+            self.rejected += 1
+            raise InvalidToken(f"Not an {token_type} token")
+        return claims
+
+    def _verify(self, token: str) -> dict:
+        try:
+            signing_input, _, signature = token.encode().rpartition(b".")
+            header_segment, _, payload_segment = signing_input.partition(b".")
+            header = json.loads(base64url_decode(header_segment))
+            key = self.keys.get(header.get("kid", DEFAULT_KID))
+            if key is None or header.get("alg") != key.algorithm:
+                raise InvalidToken("Unknown signing key")
+            if not key.verifier.verify(signing_input, base64url_decode(signature)):
+                raise InvalidToken("Bad signature")
+            claims = json.loads(base64url_decode(payload_segment))
+        except (ValueError, TypeError, AttributeError, binascii.Error, JWKError) as e:
+            raise InvalidToken(f"Malformed token: {e}")
+        if not isinstance(claims, dict) or not isinstance(claims.get("exp"), (int, float)):
+            raise InvalidToken("Token has no expiry")
+        if claims["exp"] <= time.time():
+            raise InvalidToken("Token expired")
+        if claims.get("iss", self.issuer) != self.issuer:
+            raise InvalidToken("Token from another issuer")
+        return claims
+
+    def jwks(self) -> dict:
+        """Public keys of every asymmetric key, retired ones included, as a JWK Set"""
+        return {"keys": [key.jwk() for key in self.keys.values() if key.algorithm != "HS256"]}
+
+    def stats(self) -> dict:
+        return {
+            "active_kid": self.active.kid,
+            "keys": {key.kid: key.algorithm for key in self.keys.values()},
+            "rejected": self.rejected,
+            "verified_cache": self.verified.stats(),
+        }
+
+
+def _build_service() -> TokenService:
+    if settings.jwt_keys:
+        keys = [TokenKey.load(spec) for spec in settings.jwt_keys]
+        active_kid = settings.jwt_active_kid or keys[0].kid
+    else:
+        if not settings.jwt_secret_key:
+            logger.warning("Signing tokens with the built-in JWT secret; set JWT_SECRET_KEY or JWT_KEYS")
+        secret = settings.jwt_secret_key or BUILTIN_SECRET
+        keys = [TokenKey.load({"kid": DEFAULT_KID, "alg": "HS256", "secret": secret})]
+        active_kid = DEFAULT_KID
+    return TokenService(keys, active_kid, settings.jwt_issuer, settings.token_cache_size)
+
+
+token_service = _build_service()
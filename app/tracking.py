@@ -0,0 +1,192 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+from collections import deque
+from datetime import datetime
+
+from app.cache import TTLCache
+from app.config import settings
+from app.lifecycle import on_drain
+from app.shared_state import SharedState, shared_state
+from app.transitions import OrderTransition, on_transition
+
+logger = logging.getLogger(__name__)
+
+
+class SlowConsumer(Exception):
+    """Raised to a subscriber that fell too far behind and was dropped"""
+
+
+class WorkerDraining(Exception):
+    """Raised to a subscriber when this worker shuts down; the client should reconnect to another"""
+
+
+class Broker(ABC):
+    """Carries tracking messages between workers.
+
+    Every message published on any worker is handed to every subscribed
+    handler, so each worker's hub can fan out to its own connections.
+    """
+
+    @abstractmethod
+    async def publish(self, channel: str, message: dict):
+        ...
+
+    @abstractmethod
+    async def subscribe(self, handler):
+        ...
+
+    async def close(self):
+        pass
+
+
+class SharedStateBroker(Broker):
+    """Carries tracking messages over a shared state channel, so with Redis every worker gets them"""
+
+    CHANNEL = "tracking"
+
+    def __init__(self, state: SharedState):
+        self.state = state
+
+    async def publish(self, channel: str, message: dict):
+        await self.state.publish(self.CHANNEL, {"channel": channel, "message": message})
+
+    async def subscribe(self, handler):
+        self.state.subscribe(self.CHANNEL, lambda envelope: handler(envelope["channel"], envelope["message"]))
+
+
+class Subscriber:
+    """A connected client's mailbox.
+
+    Status events queue up in order; location updates are coalesced so a
+    slow client only ever gets the latest position. If status events pile
+    past the queue limit the subscriber is dropped and should resync.
+    """
+
+    def __init__(self, order_id: int, max_queue: int):
+        self.order_id = order_id
+        self.max_queue = max_queue
+        self.events = deque()
+        self.location = None
+        self.overflowed = False
+        self.closed = False
+        self._ready = asyncio.Event()
+
+    def push(self, message: dict):
+        if message["type"] == "location":
+            self.location = message
+        elif len(self.events) >= self.max_queue:
+            self.overflowed = True
+        else:
+            self.events.append(message)
+        self._ready.set()
+
+    def close(self):
+        self.closed = True
+        self._ready.set()
+
+    async def next_batch(self, timeout: float = None) -> list:
+        """Wait for pending messages; returns [] on timeout"""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self._ready.clear()
+        if self.overflowed:
+            raise SlowConsumer(f"Subscriber for order {self.order_id} fell behind")
+        if self.closed:
+            raise WorkerDraining(f"Subscriber for order {self.order_id} closed for shutdown")
+        batch = list(self.events)
+        self.events.clear()
+        if self.location is not None:
+            batch.append(self.location)
+            self.location = None
+        return batch
+
+
+class TrackingHub:
+    """Fans order status and driver location out to this worker's subscribers"""
+
+    def __init__(self, broker: Broker):
+        self.broker = broker
+        self.channels = {}
+        self.last_location = TTLCache(maxsize=50000, ttl=600)
+        self.draining = False
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+
+    async def start(self):
+        await self.broker.subscribe(self._deliver)
+
+    def subscribe(self, order_id: int) -> Subscriber:
+        subscriber = Subscriber(order_id, settings.tracking_queue_size)
+        if self.draining:
+            subscriber.close()
+        self.channels.setdefault(order_id, set()).add(subscriber)
+        return subscriber
+
+    def drain(self):
+        """Close every subscriber so streams end now rather than at the shutdown timeout"""
+        self.draining = True
+        for subscribers in self.channels.values():
+            for subscriber in subscribers:
+                subscriber.close()
+
+    def unsubscribe(self, subscriber: Subscriber):
+        subscribers = self.channels.get(subscriber.order_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscriber)
+        if subscriber.overflowed:
+            self.dropped += 1
+        if not subscribers:
+            del self.channels[subscriber.order_id]
+
+    async def publish_status(self, transition: OrderTransition):
+        await self._publish(transition.order_id, {
+            "type": "status",
+            "order_id": transition.order_id,
+            "order_status": transition.order_status.value,
+            "payment_status": transition.payment_status.value,
+            "at": datetime.utcnow().isoformat(),
+        })
+
+    async def publish_location(self, order_id: int, driver_id: int, lat: float, lng: float,
+                               heading: float = None, speed: float = None):
+        await self._publish(order_id, {
+            "type": "location",
+            "order_id": order_id,
+            "driver_id": driver_id,
+            "lat": lat,
+            "lng": lng,
+            "heading": heading,
+            "speed": speed,
+            "at": datetime.utcnow().isoformat(),
+        })
+
+    async def _publish(self, order_id: int, message: dict):
+        self.published += 1
+        await self.broker.publish(f"order:{order_id}", message)
+
+    def _deliver(self, channel: str, message: dict):
+        order_id = message["order_id"]
+        if message["type"] == "location":
+            self.last_location.set(order_id, message)
+        for subscriber in self.channels.get(order_id, ()):
+            subscriber.push(message)
+            self.delivered += 1
+
+    def stats(self) -> dict:
+        return {
+            "channels": len(self.channels),
+            "subscribers": sum(len(subscribers) for subscribers in self.channels.values()),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped_slow_consumers": self.dropped,
+        }
+
+
+tracking_hub = TrackingHub(SharedStateBroker(shared_state))
+on_transition(tracking_hub.publish_status)
+on_drain(tracking_hub.drain)
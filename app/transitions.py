@@ -0,0 +1,282 @@
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import insert, or_, select, tuple_, update
+
+from app.analytics import ROLLUP_SOURCE, record_transitions
+from app.models import Order, OrderStatus, OrderStatusHistory, PaymentStatus
+
+logger = logging.getLogger(__name__)
+
+# Statuses each status may move to; any other change is refused
+ORDER_TRANSITIONS = {
+    OrderStatus.PENDING: {OrderStatus.CONFIRMED, OrderStatus.CANCELLED},
+    OrderStatus.CONFIRMED: {OrderStatus.PROCESSING, OrderStatus.CANCELLED},
+    OrderStatus.PROCESSING: {OrderStatus.EN_ROUTE},
+    OrderStatus.EN_ROUTE: {OrderStatus.DELIVERED},
+    OrderStatus.DELIVERED: set(),
+    OrderStatus.CANCELLED: set(),
+}
+PAYMENT_TRANSITIONS = {
+    PaymentStatus.PENDING: {PaymentStatus.SUCCESSFUL, PaymentStatus.FAILED},
+    # A charge can still succeed after an attempt failed, even once the order was cancelled; a success is final
+    PaymentStatus.FAILED: {PaymentStatus.SUCCESSFUL},
+    PaymentStatus.SUCCESSFUL: set(),
+}
+
+# Order statuses only a paid order can be in
+PAID_ORDER_STATUSES = {OrderStatus.CONFIRMED, OrderStatus.PROCESSING, OrderStatus.EN_ROUTE, OrderStatus.DELIVERED}
+
+# Times an order changed by someone else between our read and our update is re-read before giving up
+CONFLICT_ATTEMPTS = 5
+
+
+def can_transition(order_status: OrderStatus, payment_status: PaymentStatus,
+                   new_order_status: OrderStatus, new_payment_status: PaymentStatus) -> bool:
+    """Whether the transition table allows an order to move between these statuses"""
+    if (new_order_status, new_payment_status) == (order_status, payment_status):
+        return False
+    if new_order_status != order_status and new_order_status not in ORDER_TRANSITIONS[order_status]:
+        return False
+    if new_payment_status != payment_status and new_payment_status not in PAYMENT_TRANSITIONS[payment_status]:
+        return False
+    return new_order_status not in PAID_ORDER_STATUSES or new_payment_status == PaymentStatus.SUCCESSFUL
+
+
+@dataclass(frozen=True)
+class OrderTransition:
+    """An order, its owner, the statuses it moved to, and its version after the move"""
+    order_id: int
+    user_id: Optional[int]
+    order_status: OrderStatus
+    payment_status: PaymentStatus
+    version: int
+
+
+# Listener priorities, lowest first: caches drop a changed order before anyone is told of the change
+CACHE_PRIORITY = 0
+NOTIFY_PRIORITY = 10
+
+# Async callables run for every committed transition (tracking, caches, ...), as (priority, listener)
+_listeners = []
+
+
+def on_transition(listener, priority: int = NOTIFY_PRIORITY):
+    """Register a coroutine function to be called with each OrderTransition.
+
+    Listeners run by priority, then in the order they were registered, so
+    the order does not depend on which module happens to be imported first.
+    """
+    _listeners.append((priority, listener))
+    _listeners.sort(key=lambda entry: entry[0])
+    return listener
+
+
+async def notify_transitions(transitions: list):
+    """Tell listeners about transitions; call only after the commit that made them"""
+    for transition in transitions:
+        for _, listener in _listeners:
+            try:
+                await listener(transition)
+            except Exception:
+                logger.exception(f"Transition listener failed for order {transition.order_id}")
+
+
+class TransitionStats:
+    def __init__(self):
+        self.applied = 0
+        self.conflicts = 0
+        self.refused = 0
+        self.abandoned = 0
+        self.paid_after_cancellation = 0
+
+    def as_dict(self) -> dict:
+        return dict(vars(self))
+
+
+transition_stats = TransitionStats()
+
+
+async def _transition(db, conditions: list, change, reason: str) -> list:
+    """Move the orders matching `conditions` to the values `change(order)` returns (None leaves it).
+
+    Nothing is locked: each order is written with UPDATE ... WHERE id = ?
+    AND version = ?, so one changed by another transaction since it was
+    read matches nothing and is read and decided again, up to
+    CONFLICT_ATTEMPTS times. Moves the transition table forbids are
+    skipped. Each transition is moved between rollup rows with the exact
+    statuses it left and appended to order_status_history. The caller
+    commits.
+    """
+    transitions = []
+    previous = {}
+    retry_ids = None
+    for attempt in range(CONFLICT_ATTEMPTS):
+        stmt = select(*ROLLUP_SOURCE, Order.version).where(*conditions)
+        if retry_ids is not None:
+            stmt = stmt.where(Order.id.in_(retry_ids))
+        # Orders taking the same values are written with one statement
+        groups = defaultdict(list)
+        for order in (await db.execute(stmt)).all():
+            values = change(order)
+            if values is None:
+                continue
+            new_order_status = values.get("order_status", order.order_status)
+            new_payment_status = values.get("payment_status", order.payment_status)
+            if not can_transition(order.order_status, order.payment_status, new_order_status, new_payment_status):
+                transition_stats.refused += 1
+                logger.warning(
+                    f"Refused {reason} for order {order.id}: {order.order_status.value}/"
+                    f"{order.payment_status.value} -> {new_order_status.value}/{new_payment_status.value}"
+                )
+                continue
+            groups[tuple(sorted(values.items()))].append(order)
+
+        retry_ids = []
+        for values, orders in groups.items():
+            result = await db.execute(
+                update(Order)
+                .where(tuple_(Order.id, Order.version).in_([(order.id, order.version) for order in orders]),
+                       *conditions)
+                .values(**dict(values), version=Order.version + 1)
+                .returning(Order.id, Order.user_id, Order.order_status, Order.payment_status, Order.version)
+                .execution_options(synchronize_session=False)
+            )
+            written = {row.id: row for row in result.all()}
+            for order in orders:
+                row = written.get(order.id)
+                if row is None:
+                    retry_ids.append(order.id)
+                    continue
+                previous[order.id] = order
+                transitions.append(
+                    OrderTransition(row.id, row.user_id, row.order_status, row.payment_status, row.version)
+                )
+        if not retry_ids:
+            break
+        transition_stats.conflicts += len(retry_ids)
+    else:
+        transition_stats.abandoned += len(retry_ids)
+        logger.warning(f"Gave up on {reason} for orders {retry_ids} after {CONFLICT_ATTEMPTS} conflicting updates")
+
+    if transitions:
+        await record_transitions(db, previous, transitions)
+        now = datetime.utcnow()
+        await db.execute(insert(OrderStatusHistory), [
+            {
+                "order_id": transition.order_id,
+                "version": transition.version,
+                "reason": reason,
+                "from_order_status": previous[transition.order_id].order_status,
+                "from_payment_status": previous[transition.order_id].payment_status,
+                "order_status": transition.order_status,
+                "payment_status": transition.payment_status,
+                "created_at": now,
+            }
+            for transition in transitions
+        ])
+        transition_stats.applied += len(transitions)
+    return transitions
+
+
+async def apply_payment_result(db, reference: str, successful: bool) -> list:
+    """Record a Paystack payment outcome for the orders on a reference.
+
+    Updates are conditional so they only ever move forward: a successful
+    payment is never downgraded to failed, and an order only leaves PENDING
+    for CONFIRMED. Replayed or out-of-order events therefore become no-ops.
+    A payment that succeeds for an order already cancelled (expired,
+    abandoned or called off) leaves it cancelled; the transition is recorded
+    as paid_after_cancellation, so the charge can be found and refunded.
+    Returns the transitions that happened; the caller commits.
+    """
+    if successful:
+        unpaid = [Order.paystack_reference == reference, Order.payment_status != PaymentStatus.SUCCESSFUL]
+        transitions = await _transition(
+            db,
+            [*unpaid, Order.order_status != OrderStatus.CANCELLED],
+            lambda order: dict(
+                payment_status=PaymentStatus.SUCCESSFUL,
+                order_status=OrderStatus.CONFIRMED if order.order_status == OrderStatus.PENDING else order.order_status
+            ),
+            "payment_succeeded"
+        )
+        # Run second, so an order cancelled while the first ran is caught here
+        paid_cancelled = await _transition(
+            db,
+            [*unpaid, Order.order_status == OrderStatus.CANCELLED],
+            lambda order: dict(payment_status=PaymentStatus.SUCCESSFUL),
+            "paid_after_cancellation"
+        )
+        if paid_cancelled:
+            transition_stats.paid_after_cancellation += len(paid_cancelled)
+            logger.warning(
+                f"Payment {reference} succeeded for cancelled orders "
+                f"{[transition.order_id for transition in paid_cancelled]}; they need a refund"
+            )
+        return transitions + paid_cancelled
+    return await _transition(
+        db,
+        [Order.paystack_reference == reference, Order.payment_status == PaymentStatus.PENDING],
+        lambda order: dict(payment_status=PaymentStatus.FAILED),
+        "payment_failed"
+    )
+
+
+async def expire_unpaid_order(db, order_id: int) -> list:
+    """Cancel an order whose payment never completed or failed; no-op once it has moved on"""
+    return await _transition(
+        db,
+        [
+            Order.id == order_id,
+            Order.payment_status.in_([PaymentStatus.PENDING, PaymentStatus.FAILED]),
+            # An order cancelled before its payment settled still has the payment closed
+            or_(Order.order_status == OrderStatus.PENDING, Order.payment_status == PaymentStatus.PENDING),
+        ],
+        lambda order: dict(
+            payment_status=PaymentStatus.FAILED,
+            order_status=OrderStatus.CANCELLED if order.order_status == OrderStatus.PENDING else order.order_status
+        ),
+        "payment_expired"
+    )
+
+
+async def abandon_payment(db, reference: str) -> list:
+    """Fail and cancel the orders on a reference whose payment could not be initialized"""
+    return await _transition(
+        db,
+        [Order.paystack_reference == reference],
+        lambda order: dict(payment_status=PaymentStatus.FAILED, order_status=OrderStatus.CANCELLED),
+        "payment_abandoned"
+    )
+
+
+async def assign_driver(db, order_id: int, driver_id: int) -> list:
+    """Hand a confirmed order to a driver; no-op if it was assigned or moved on already"""
+    assigned_at = datetime.utcnow()
+    return await _transition(
+        db,
+        [Order.id == order_id, Order.order_status == OrderStatus.CONFIRMED, Order.driver_id.is_(None)],
+        lambda order: dict(driver_id=driver_id, order_status=OrderStatus.PROCESSING, assigned_at=assigned_at),
+        "driver_assigned"
+    )
+
+
+# Delivery steps a driver reports, keyed by the status they move on from
+DELIVERY_STEPS = {
+    OrderStatus.EN_ROUTE: OrderStatus.PROCESSING,
+    OrderStatus.DELIVERED: OrderStatus.EN_ROUTE,
+}
+
+
+async def advance_delivery(db, order_id: int, driver_id: int, order_status: OrderStatus) -> list:
+    """Move the driver's order one step along PROCESSING -> EN_ROUTE -> DELIVERED"""
+    return await _transition(
+        db,
+        [Order.id == order_id, Order.driver_id == driver_id, Order.order_status == DELIVERY_STEPS[order_status]],
+        lambda order: dict(order_status=order_status),
+        order_status.value
+    )
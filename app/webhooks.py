@@ -0,0 +1,193 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+from datetime import datetime
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models import PaystackEvent, WebhookEventStatus
+from app.transitions import apply_payment_result, notify_transitions
+
+logger = logging.getLogger(__name__)
+
+# Paystack events that change an order, mapped to whether the charge succeeded
+PAYMENT_EVENTS = {
+    "charge.success": True,
+    "charge.failed": False,
+}
+
+
+def verify_signature(secret_key: str, raw_body: bytes, signature: str) -> bool:
+    """Check the x-paystack-signature header, an HMAC-SHA512 of the raw body"""
+    if not secret_key or not signature:
+        return False
+    expected = hmac.new(secret_key.encode(), raw_body, hashlib.sha512).hexdigest()
+    return hmac.compare_digest(expected, signature)
+
+
+def event_key(payload: dict) -> str:
+    data = payload.get("data") or {}
+    return f"{payload.get('event')}:{data.get('id') or data.get('reference')}"
+
+
+class WebhookProcessor:
+    """Records Paystack events once and applies them to orders in batches.
+
+    The webhook handler only inserts the event row (the unique event_key
+    drops retries) and queues its id, so Paystack gets its 200 quickly.
+    A batch that fails (the database is down, say) is queued again after
+    a backoff that doubles with each failure of its events, and events
+    still RECEIVED at startup are re-queued, so an ack is never lost.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal):
+        self.session_factory = session_factory
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._task = None
+        # event id -> failed attempts so far, and the timers that will queue failed batches again
+        self._attempts = {}
+        self._retry_handles = set()
+        self.received = 0
+        self.duplicates = 0
+        self.applied = 0
+        self.batches = 0
+        self.failed_batches = 0
+
+    async def record(self, db, payload: dict):
+        """Store an event; returns its id, or None if it was seen before or is irrelevant"""
+        event = payload.get("event")
+        data = payload.get("data") or {}
+        reference = data.get("reference")
+        if event not in PAYMENT_EVENTS or not reference or not reference.startswith("FUE_"):
+            return None
+
+        entry = PaystackEvent(
+            event_key=event_key(payload),
+            event=event,
+            reference=reference,
+            payload=json.dumps(payload)
+        )
+        db.add(entry)
+        try:
+            await db.commit()
+        except IntegrityError:
+            await db.rollback()
+            self.duplicates += 1
+            return None
+        self.received += 1
+        return entry.id
+
+    def enqueue(self, event_id: int):
+        self.queue.put_nowait(event_id)
+
+    async def start(self):
+        if self._task is not None:
+            return
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(PaystackEvent.id)
+                .where(PaystackEvent.status == WebhookEventStatus.RECEIVED)
+                .order_by(PaystackEvent.id)
+            )
+            for event_id in result.scalars().all():
+                self.enqueue(event_id)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        for handle in self._retry_handles:
+            handle.cancel()
+        self._retry_handles.clear()
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _next_batch(self) -> list:
+        batch = [await self.queue.get()]
+        deadline = asyncio.get_running_loop().time() + settings.webhook_batch_window
+        while len(batch) < settings.webhook_batch_size:
+            timeout = deadline - asyncio.get_running_loop().time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self.apply_batch(batch)
+            except Exception:
+                # Rows stay RECEIVED, so a restart would pick them up too
+                logger.exception(f"Failed to apply {len(batch)} Paystack events")
+                self.failed_batches += 1
+                self._retry_later(batch)
+            else:
+                for event_id in batch:
+                    self._attempts.pop(event_id, None)
+
+    def _retry_later(self, event_ids: list):
+        for event_id in event_ids:
+            self._attempts[event_id] = self._attempts.get(event_id, 0) + 1
+        failures = max(self._attempts[event_id] for event_id in event_ids)
+        delay = min(settings.webhook_retry_max_seconds, settings.webhook_retry_backoff * 2 ** (failures - 1))
+
+        def retry():
+            self._retry_handles.discard(handle)
+            for event_id in event_ids:
+                self.enqueue(event_id)
+
+        handle = asyncio.get_running_loop().call_later(delay, retry)
+        self._retry_handles.add(handle)
+
+    async def apply_batch(self, event_ids: list):
+        async with self.session_factory() as db:
+            result = await db.execute(
+                select(PaystackEvent)
+                .where(PaystackEvent.id.in_(event_ids), PaystackEvent.status == WebhookEventStatus.RECEIVED)
+            )
+            events = result.scalars().all()
+
+            # One update per reference; a success anywhere in the batch wins
+            outcomes = {}
+            for entry in events:
+                outcomes[entry.reference] = outcomes.get(entry.reference, False) or PAYMENT_EVENTS[entry.event]
+            transitions = []
+            for reference, successful in outcomes.items():
+                transitions += await apply_payment_result(db, reference, successful)
+
+            await db.execute(
+                update(PaystackEvent)
+                .where(PaystackEvent.id.in_([entry.id for entry in events]))
+                .values(status=WebhookEventStatus.APPLIED, processed_at=datetime.utcnow())
+            )
+            await db.commit()
+        await notify_transitions(transitions)
+        self.applied += len(events)
+        self.batches += 1
+
+    def stats(self) -> dict:
+        return {
+            "received": self.received,
+            "duplicates": self.duplicates,
+            "applied": self.applied,
+            "batches": self.batches,
+            "failed_batches": self.failed_batches,
+            "retrying": len(self._retry_handles),
+            "queue_depth": self.queue.qsize(),
+        }
+
+
+webhook_processor = WebhookProcessor()
@@ -0,0 +1,112 @@
+"""
+Sales analytics benchmark.
+
+Seeds a throwaway SQLite database with N orders (random fuel types,
+statuses, payment outcomes and delivery points around Accra and Kumasi),
+backfills the rollups, then times the admin analytics queries against the
+same figures aggregated straight from the orders table.
+
+    python benchmarks/analytics.py --orders 1000000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "analytics.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from sqlalchemy import case, create_engine, func, select, update
+
+from app.analytics import analytics_query, rebuild_rollups
+from app.database import SessionLocal
+from app.models import Base, Order, PaymentStatus
+from orders_pagination import seed
+
+# seed() places an order every 30 seconds from here
+SEED_START = datetime(2025, 1, 1)
+
+
+def spread(engine):
+    """Give the seeded orders payment outcomes and delivery points"""
+    with engine.begin() as conn:
+        conn.execute(update(Order).values(
+            payment_status=case(
+                (Order.id % 5 < 3, PaymentStatus.SUCCESSFUL.name),
+                (Order.id % 5 == 3, PaymentStatus.FAILED.name),
+                else_=PaymentStatus.PENDING.name
+            ),
+            delivery_lat=case((Order.id % 4 == 0, 6.69), else_=5.55) + (Order.id % 97) * 0.002,
+            delivery_lng=case((Order.id % 4 == 0, -1.62), else_=-0.25) + (Order.id % 89) * 0.002,
+        ))
+
+
+def naive_query(start: datetime, end: datetime, series: bool, group_by=()):
+    """The same totals, aggregated from every order in the range"""
+    paid = Order.payment_status == PaymentStatus.SUCCESSFUL
+    day = func.date(Order.created_at)
+    keys = ([day] if series else []) + [getattr(Order, dimension) for dimension in group_by]
+    return (
+        select(
+            *keys,
+            func.count().label("orders"),
+            func.sum(Order.quantity).label("liters"),
+            func.sum(Order.total_amount).label("amount"),
+            func.sum(case((paid, 1), else_=0)).label("paid_orders"),
+            func.sum(case((paid, Order.quantity), else_=0)).label("paid_liters"),
+            func.sum(case((paid, Order.total_amount), else_=0.0)).label("revenue"),
+        )
+        .where(Order.created_at >= start, Order.created_at < end)
+        .group_by(*keys)
+    )
+
+
+def best_ms(db, stmt, repeat: int) -> tuple:
+    best, rows = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = db.execute(stmt).all()
+        best = min(best, (time.perf_counter() - started) * 1000)
+    return best, len(rows)
+
+
+def main(orders: int, users: int, repeat: int):
+    engine = create_engine(os.environ["DATABASE_URL"])
+    Base.metadata.create_all(engine)
+    seed(engine, orders, users)
+    spread(engine)
+    engine.dispose()
+
+    with SessionLocal() as db:
+        started = time.perf_counter()
+        counted = rebuild_rollups(db)
+        print(f"backfilled rollups from {counted} orders in {time.perf_counter() - started:.1f}s")
+
+    end = SEED_START + timedelta(seconds=orders * 30)
+    cases = [
+        ("last 7 days by fuel", end - timedelta(days=7), "day", False, ("fuel_type",)),
+        ("all time by region", SEED_START, "day", False, ("region",)),
+        ("daily series", SEED_START, "day", True, ()),
+        ("hourly, last 31 days", end - timedelta(days=31), "hour", True, ()),
+    ]
+    print(f"{'query':<24} {'rollup ms':>10} {'orders ms':>10} {'rows':>6}")
+    with SessionLocal() as db:
+        for name, start, period, series, group_by in cases:
+            rollup_ms, rows = best_ms(db, analytics_query(period, start, end, group_by, series), repeat)
+            # Region is derived in Python, so the naive query can only group by stored columns
+            naive_group = tuple(d for d in group_by if d != "region")
+            naive_ms, _ = best_ms(db, naive_query(start, end, series, naive_group), repeat)
+            print(f"{name:<24} {rollup_ms:>10.2f} {naive_ms:>10.1f} {rows:>6}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rollup analytics queries vs aggregating orders")
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.orders, args.users, args.repeat)
@@ -0,0 +1,120 @@
+"""
+Dispatch assignment benchmark.
+
+Scatters drivers and pending orders over greater Accra and times one
+dispatch tick (assign_batch over the grid index) against a brute-force
+scan of every driver. Both are greedy oldest-first, so they must agree on
+every assignment; the benchmark checks that too.
+
+    python benchmarks/dispatch.py --drivers 10000 --orders 1000 --ticks 20
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# app.dispatch builds the engines on import; nothing here queries them
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.dispatch import DispatchOrder, DriverIndex, DriverState, assign_batch, haversine_km
+from app.models import FuelType
+
+# Rough bounding box around Accra and Tema
+LAT_RANGE = (5.50, 5.75)
+LNG_RANGE = (-0.35, 0.00)
+MAX_KM = 25.0
+
+
+def make_drivers(count: int, rng: random.Random) -> list:
+    fuel_types = list(FuelType)
+    return [
+        DriverState(
+            driver_id=i,
+            capacity=rng.choice((2000, 5000, 10000)),
+            fuel_types=frozenset(rng.sample(fuel_types, rng.randint(1, len(fuel_types)))),
+            on_shift=True,
+            lat=rng.uniform(*LAT_RANGE),
+            lng=rng.uniform(*LNG_RANGE),
+        )
+        for i in range(count)
+    ]
+
+
+def make_orders(count: int, rng: random.Random) -> list:
+    return [
+        DispatchOrder(
+            order_id=i,
+            lat=rng.uniform(*LAT_RANGE),
+            lng=rng.uniform(*LNG_RANGE),
+            fuel_type=rng.choice(list(FuelType)),
+            quantity=rng.choice((20, 50, 100, 500, 3000)),
+        )
+        for i in range(count)
+    ]
+
+
+def brute_force(orders: list, drivers: list, max_km: float) -> list:
+    idle = {driver.driver_id: driver for driver in drivers}
+    assignments = []
+    for order in orders:
+        best, best_km = None, max_km
+        for driver in idle.values():
+            distance = haversine_km(order.lat, order.lng, driver.lat, driver.lng)
+            if distance <= best_km and driver.can_carry(order.fuel_type, order.quantity):
+                best, best_km = driver, distance
+        if best is not None:
+            del idle[best.driver_id]
+            assignments.append((order.order_id, best.driver_id))
+    return assignments
+
+
+def run(drivers: int, orders: int, ticks: int, cell_degrees: float, seed: int):
+    rng = random.Random(seed)
+    tick_ms = []
+    assigned = []
+    for _ in range(ticks):
+        fleet = make_drivers(drivers, rng)
+        pending = make_orders(orders, rng)
+
+        index = DriverIndex(cell_degrees)
+        for driver in fleet:
+            index.insert(driver)
+
+        started = time.perf_counter()
+        result = assign_batch(pending, index, MAX_KM)
+        tick_ms.append((time.perf_counter() - started) * 1000)
+        assigned.append(len(result))
+
+    # Replay the first tick through a brute-force scan and check it agrees
+    rng = random.Random(seed)
+    fleet, pending = make_drivers(drivers, rng), make_orders(orders, rng)
+    started = time.perf_counter()
+    expected = brute_force(pending, fleet, MAX_KM)
+    brute_ms = (time.perf_counter() - started) * 1000
+
+    index = DriverIndex(cell_degrees)
+    for driver in fleet:
+        index.insert(driver)
+    actual = [(a.order_id, a.driver_id) for a in assign_batch(pending, index, MAX_KM)]
+
+    tick_ms.sort()
+    print(f"{drivers} drivers, {orders} orders per tick, cell {cell_degrees} deg, {ticks} ticks")
+    print(f"grid index  p50 {statistics.median(tick_ms):8.2f} ms  "
+          f"p95 {tick_ms[int(len(tick_ms) * 0.95) - 1]:8.2f} ms  "
+          f"max {tick_ms[-1]:8.2f} ms  (avg {statistics.mean(assigned):.0f} assigned)")
+    print(f"brute force      {brute_ms:8.2f} ms for one tick")
+    print(f"assignments match brute force: {actual == expected}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time one dispatch tick on synthetic drivers and orders")
+    parser.add_argument("--drivers", type=int, default=10_000)
+    parser.add_argument("--orders", type=int, default=1_000)
+    parser.add_argument("--ticks", type=int, default=20)
+    parser.add_argument("--cell-degrees", type=float, default=0.005)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    run(args.drivers, args.orders, args.ticks, args.cell_degrees, args.seed)
@@ -0,0 +1,68 @@
+"""
+Concurrent load test for the Fuelease API.
+
+Runs N concurrent clients against a running server for a fixed duration and
+reports requests per second. Run it against the server before and after a
+change to compare throughput, e.g.
+
+    RATE_LIMIT_ENABLED=false uvicorn app.main:app --host 127.0.0.1 --port 8000
+    python benchmarks/load_test.py --url http://127.0.0.1:8000 --clients 200
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+import httpx
+
+
+async def prepare_user(client: httpx.AsyncClient) -> dict:
+    """Sign up a throwaway customer and return auth headers"""
+    suffix = uuid.uuid4().hex[:7]
+    email = f"load_{suffix}@example.com"
+    password = "loadtest123"
+    phone = "024" + str(int(suffix, 16) % 10_000_000).zfill(7)
+    await client.post("/auth/signup", json={
+        "full_name": "Load Test",
+        "email": email,
+        "phone_number": phone,
+        "password": password,
+    })
+    response = await client.post("/auth/login", json={"email": email, "password": password})
+    response.raise_for_status()
+    token = response.json()["access_token"]
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def worker(client: httpx.AsyncClient, headers: dict, deadline: float, stats: dict):
+    while time.perf_counter() < deadline:
+        try:
+            response = await client.get("/orders", headers=headers, params={"limit": 20})
+            key = "ok" if response.status_code < 500 else "errors"
+        except httpx.HTTPError:
+            key = "errors"
+        stats[key] += 1
+
+
+async def run(url: str, clients: int, duration: float):
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30.0) as client:
+        headers = await prepare_user(client)
+        stats = {"ok": 0, "errors": 0}
+        deadline = time.perf_counter() + duration
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client, headers, deadline, stats) for _ in range(clients)))
+        elapsed = time.perf_counter() - started
+
+    total = stats["ok"] + stats["errors"]
+    print(f"clients={clients} duration={elapsed:.1f}s requests={total} errors={stats['errors']}")
+    print(f"requests/sec: {total / elapsed:.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent load test for the Fuelease API")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=30.0)
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.clients, args.duration))
@@ -0,0 +1,66 @@
+"""
+Login latency benchmark.
+
+Fires waves of concurrent logins at a running server and reports p50/p99
+latency, which is dominated by how bcrypt is scheduled. Adjust BCRYPT_ROUNDS,
+PASSWORD_HASH_WORKERS and PASSWORD_HASH_EXECUTOR on the server to compare,
+and start it with RATE_LIMIT_ENABLED=false or the per-IP login limit
+answers most of these with 429s.
+
+    python benchmarks/login_latency.py --url http://127.0.0.1:8000 --concurrency 50
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import httpx
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def timed_login(client: httpx.AsyncClient, email: str, password: str) -> float:
+    started = time.perf_counter()
+    response = await client.post("/auth/login", json={"email": email, "password": password})
+    response.raise_for_status()
+    return time.perf_counter() - started
+
+
+async def run(url: str, concurrency: int, rounds: int):
+    suffix = uuid.uuid4().hex[:7]
+    email = f"bench_{suffix}@example.com"
+    password = "benchmark123"
+    phone = "024" + str(int(suffix, 16) % 10_000_000).zfill(7)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60.0) as client:
+        await client.post("/auth/signup", json={
+            "full_name": "Login Bench",
+            "email": email,
+            "phone_number": phone,
+            "password": password,
+        })
+        latencies = []
+        for _ in range(rounds):
+            latencies += await asyncio.gather(
+                *(timed_login(client, email, password) for _ in range(concurrency))
+            )
+
+    ms = [value * 1000 for value in latencies]
+    print(f"logins={len(ms)} concurrency={concurrency}")
+    print(f"p50={percentile(ms, 50):.1f}ms p99={percentile(ms, 99):.1f}ms "
+          f"mean={statistics.mean(ms):.1f}ms max={max(ms):.1f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent login latency benchmark")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.concurrency, args.rounds))
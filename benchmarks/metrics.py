@@ -0,0 +1,76 @@
+"""
+Metrics overhead benchmark.
+
+Measures what instrumentation adds: MetricsMiddleware around a bare
+ASGI app that answers immediately (per-request cost, with the slow-request
+log capturing statements or not), and SQLite queries through an engine
+with and without the per-query listeners.
+
+    python benchmarks/metrics.py --requests 100000 --queries 100000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+
+from app.config import settings
+from app.metrics import MetricsMiddleware, instrument_engine
+
+
+async def bare_app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def us_per_request(app, requests: int) -> float:
+    scope = {"type": "http", "method": "GET", "path": "/orders", "headers": []}
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(message):
+        pass
+
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    return (time.perf_counter() - started) * 1e6 / requests
+
+
+def us_per_query(engine, queries: int) -> float:
+    with engine.connect() as conn:
+        started = time.perf_counter()
+        for i in range(queries):
+            conn.execute(text("SELECT :i"), {"i": i})
+        return (time.perf_counter() - started) * 1e6 / queries
+
+
+def main(requests: int, queries: int):
+    bare = asyncio.run(us_per_request(bare_app, requests))
+    settings.metrics_slow_request_ms = 0
+    measured = asyncio.run(us_per_request(MetricsMiddleware(bare_app), requests))
+    settings.metrics_slow_request_ms = 1000
+    capturing = asyncio.run(us_per_request(MetricsMiddleware(bare_app), requests))
+    print(f"{'bare app':<34} {bare:>8.2f} us/request")
+    print(f"{'+ metrics':<34} {measured:>8.2f} us/request ({measured - bare:+.2f})")
+    print(f"{'+ metrics, slow log on':<34} {capturing:>8.2f} us/request ({capturing - bare:+.2f})")
+
+    plain = create_engine("sqlite://")
+    instrumented = create_engine("sqlite://")
+    instrument_engine(instrumented)
+    before, after = us_per_query(plain, queries), us_per_query(instrumented, queries)
+    print(f"{'query':<34} {before:>8.2f} us/query")
+    print(f"{'query + listeners':<34} {after:>8.2f} us/query ({after - before:+.2f})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-request and per-query cost of the metrics instrumentation")
+    parser.add_argument("--requests", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=100_000)
+    args = parser.parse_args()
+    main(args.requests, args.queries)
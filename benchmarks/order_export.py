@@ -0,0 +1,90 @@
+"""
+Order export benchmark.
+
+Seeds a throwaway SQLite database with N orders, then streams the full
+export in each format and reports throughput and how far anonymous
+resident memory rose above where it started (sampled after every chunk;
+Linux only). The rise should stay flat as N grows; --naive adds the
+load-everything query for comparison.
+
+    python benchmarks/order_export.py --orders 5000000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+DB_PATH = os.path.join(tempfile.mkdtemp(), "export.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from sqlalchemy import create_engine
+
+from app.database import AsyncReadSessionLocal, dispose_engines
+from app.export import export_orders, export_query, parquet_available
+from app.models import Base
+from orders_pagination import seed
+
+
+def rss() -> int:
+    """Anonymous resident memory; SQLite's mmap'd database pages would swamp total RSS"""
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("RssAnon:"):
+                return int(line.split()[1]) * 1024
+    return 0
+
+
+async def stream(fmt: str) -> tuple:
+    size, peak = 0, rss()
+    async for part in export_orders(export_query(), fmt):
+        size += len(part)
+        peak = max(peak, rss())
+    return size, peak
+
+
+async def naive(_fmt: str) -> tuple:
+    async with AsyncReadSessionLocal() as db:
+        rows = (await db.execute(export_query())).all()
+        peak = rss()
+    del rows
+    return 0, peak
+
+
+async def measure(label: str, run, fmt: str, orders: int):
+    baseline = rss()
+    started = time.perf_counter()
+    size, peak = await run(fmt)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<10} {elapsed:>8.1f}s {orders / elapsed:>12,.0f} rows/s "
+          f"{size / 1e6:>10.1f} MB out {(peak - baseline) / 1e6:>8.1f} MB rise")
+
+
+async def main(orders: int, users: int, formats: list, include_naive: bool):
+    engine = create_engine(os.environ["DATABASE_URL"])
+    Base.metadata.create_all(engine)
+    seed(engine, orders, users)
+    engine.dispose()
+
+    print(f"{'format':<10} {'time':>9} {'throughput':>17} {'output':>17} {'memory':>15}")
+    for fmt in formats:
+        if fmt == "parquet" and not parquet_available():
+            print("parquet    skipped (pyarrow not installed)")
+            continue
+        await measure(fmt, stream, fmt, orders)
+    if include_naive:
+        await measure("load-all", naive, None, orders)
+    await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Streaming order export throughput and memory")
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--formats", nargs="+", default=["csv", "ndjson", "parquet"])
+    parser.add_argument("--naive", action="store_true", help="also time loading every row at once")
+    args = parser.parse_args()
+    asyncio.run(main(args.orders, args.users, args.formats, args.naive))
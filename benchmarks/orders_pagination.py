@@ -0,0 +1,118 @@
+"""
+GET /orders pagination benchmark.
+
+Seeds a throwaway SQLite database with N orders and times fetching page N
+with OFFSET versus the keyset query that get_orders now builds. Keyset
+latency should stay flat as the page number grows.
+
+    python benchmarks/orders_pagination.py --orders 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert, select
+
+from app.models import Base, FuelType, Order, OrderStatus, PaymentStatus, User
+from app.pagination import encode_cursor, keyset_page
+
+PAGE_SIZE = 20
+
+
+def seed(engine, orders: int, users: int):
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(insert(User), [
+            {
+                "full_name": f"User {i}",
+                "email": f"user{i}@example.com",
+                "phone_number": f"024{i:07d}",
+                "hashed_password": "x",
+                "token_version": 0,
+            }
+            for i in range(users)
+        ])
+        base = datetime(2025, 1, 1)
+        fuel_types = list(FuelType)
+        statuses = list(OrderStatus)
+        batch = []
+        for i in range(orders):
+            quantity = random.randint(5, 200)
+            batch.append({
+                "user_id": random.randint(1, users),
+                "phone_number": "0241234567",
+                "delivery_address": "Accra",
+                "fuel_type": random.choice(fuel_types),
+                "quantity": quantity,
+                "price_per_liter": 13.2,
+                "total_amount": quantity * 13.2,
+                "delivery_time": "now",
+                "order_status": random.choice(statuses),
+                "payment_status": PaymentStatus.PENDING,
+                "created_at": base + timedelta(seconds=i * 30),
+                "updated_at": base + timedelta(seconds=i * 30),
+            })
+            if len(batch) == 50_000:
+                conn.execute(insert(Order), batch)
+                batch = []
+        if batch:
+            conn.execute(insert(Order), batch)
+    print(f"seeded {orders} orders in {time.perf_counter() - started:.1f}s")
+
+
+def timed(conn, stmt, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        conn.execute(stmt).all()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def run(orders: int, users: int):
+    path = os.path.join(tempfile.mkdtemp(), "pagination.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    seed(engine, orders, users)
+
+    newest_first = (Order.created_at.desc(), Order.id.desc())
+    scopes = {
+        "all orders": [],
+        "one user": [Order.user_id == 1],
+        "status=delivered": [Order.order_status == OrderStatus.DELIVERED],
+    }
+    print(f"{'scope':<18} {'page':>7} {'offset ms':>10} {'keyset ms':>10}")
+    with engine.connect() as conn:
+        for scope, filters in scopes.items():
+            total = conn.execute(select(Order.id).where(*filters)).all()
+            for page in (1, 10, 100, 1000, 10000):
+                offset = (page - 1) * PAGE_SIZE
+                if offset >= len(total):
+                    break
+                offset_stmt = select(Order).where(*filters).order_by(*newest_first).offset(offset).limit(PAGE_SIZE)
+
+                cursor = None
+                if offset:
+                    # Position of the last row on the previous page, looked up untimed
+                    previous = conn.execute(
+                        select(Order.created_at, Order.id).where(*filters)
+                        .order_by(*newest_first).offset(offset - 1).limit(1)
+                    ).one()
+                    cursor = encode_cursor(previous.created_at, previous.id)
+                keyset_stmt = keyset_page(select(Order).where(*filters), Order.created_at, Order.id, cursor, PAGE_SIZE)
+
+                print(f"{scope:<18} {page:>7} {timed(conn, offset_stmt):>10.2f} {timed(conn, keyset_stmt):>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offset vs keyset pagination on seeded orders")
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    args = parser.parse_args()
+    run(args.orders, args.users)
@@ -0,0 +1,50 @@
+"""
+Exercise PaystackService against the local stub.
+
+Start benchmarks/paystack_stub.py with some injected latency/failures, then
+run this with PAYSTACK_BASE_URL pointing at it. It prints per-endpoint
+latency/error metrics and the circuit breaker state.
+
+    PAYSTACK_BASE_URL=http://127.0.0.1:9100 python benchmarks/paystack_client.py --calls 500
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.paystack import paystack_service
+
+
+async def one_order(semaphore: asyncio.Semaphore, results: dict):
+    async with semaphore:
+        reference = f"FUE_BENCH_{uuid.uuid4().hex[:10]}"
+        initialized = await paystack_service.initialize_transaction(
+            email="bench@example.com", amount=50.0, reference=reference
+        )
+        verified = await paystack_service.verify_transaction(reference) if initialized else None
+        results["ok" if verified else "failed"] += 1
+
+
+async def run(calls: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    results = {"ok": 0, "failed": 0}
+    started = time.perf_counter()
+    await asyncio.gather(*(one_order(semaphore, results) for _ in range(calls)))
+    elapsed = time.perf_counter() - started
+    await paystack_service.aclose()
+
+    print(f"orders={calls} concurrency={concurrency} elapsed={elapsed:.2f}s results={results}")
+    print(json.dumps(paystack_service.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PaystackService client benchmark against the stub")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args.calls, args.concurrency))
@@ -0,0 +1,84 @@
+"""
+Local Paystack stand-in for benchmarks and failure testing.
+
+Implements the handful of Paystack endpoints the API calls and can inject
+latency and failures. Point the API at it with PAYSTACK_BASE_URL.
+
+    STUB_LATENCY_MS=80 STUB_FAILURE_RATE=0.1 uvicorn benchmarks.paystack_stub:app --port 9100
+    PAYSTACK_BASE_URL=http://127.0.0.1:9100 uvicorn app.main:app
+"""
+import asyncio
+import os
+import random
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+app = FastAPI(title="Paystack stub")
+
+LATENCY_MS = float(os.environ.get("STUB_LATENCY_MS", "0"))
+JITTER_MS = float(os.environ.get("STUB_JITTER_MS", "0"))
+FAILURE_RATE = float(os.environ.get("STUB_FAILURE_RATE", "0"))
+
+# reference -> transaction status ("success" unless told otherwise)
+transactions = {}
+
+
+async def simulate():
+    delay = LATENCY_MS + random.uniform(0, JITTER_MS)
+    if delay:
+        await asyncio.sleep(delay / 1000)
+    if FAILURE_RATE and random.random() < FAILURE_RATE:
+        return JSONResponse(status_code=503, content={"status": False, "message": "Injected failure"})
+    return None
+
+
+@app.post("/transaction/initialize")
+async def initialize(request: Request):
+    failure = await simulate()
+    if failure:
+        return failure
+    payload = await request.json()
+    reference = payload["reference"]
+    if reference in transactions:
+        return JSONResponse(status_code=400, content={"status": False, "message": "Duplicate Transaction Reference"})
+    transactions[reference] = payload.get("stub_status", "success")
+    return {
+        "status": True,
+        "message": "Authorization URL created",
+        "data": {
+            "authorization_url": f"https://checkout.paystack.test/{reference}",
+            "access_code": f"AC_{reference}",
+            "reference": reference,
+        },
+    }
+
+
+@app.get("/transaction/verify/{reference}")
+async def verify(reference: str):
+    failure = await simulate()
+    if failure:
+        return failure
+    if reference not in transactions:
+        return JSONResponse(status_code=404, content={"status": False, "message": "Transaction reference not found"})
+    return {
+        "status": True,
+        "message": "Verification successful",
+        "data": {"reference": reference, "status": transactions[reference]},
+    }
+
+
+@app.post("/transferrecipient")
+async def transfer_recipient(request: Request):
+    failure = await simulate()
+    if failure:
+        return failure
+    payload = await request.json()
+    return {"status": True, "data": {"recipient_code": f"RCP_{payload['account_number']}"}}
+
+
+@app.post("/_stub/transactions/{reference}")
+async def set_transaction_status(reference: str, status: str = "success"):
+    """Test hook to force the verification result for a reference"""
+    transactions[reference] = status
+    return {"reference": reference, "status": status}
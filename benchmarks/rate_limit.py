@@ -0,0 +1,64 @@
+"""
+Rate limiter benchmark.
+
+Measures what the limiter adds to every request: time per decision with
+the in-process store (and through the Redis store's code path on the
+in-process fake), and memory per tracked key, which should stay constant
+however many hits each key takes until max_keys evicts the oldest.
+
+    python benchmarks/rate_limit.py --keys 100000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# app.ratelimit pulls in app.auth, which builds the engines on import; nothing here queries them
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.ratelimit import MemoryStore, RateLimiter, RedisStore
+from tests.fakes import FakeRedis
+
+POLICIES = {"default": "600/minute"}
+
+
+async def hits_per_second(limiter: RateLimiter, keys: int, hits: int) -> float:
+    started = time.perf_counter()
+    for i in range(hits):
+        await limiter.hit("default", f"10.0.{i % keys // 256}.{i % 256}")
+    return hits / (time.perf_counter() - started)
+
+
+async def bytes_per_key(keys: int, hits_per_key: int) -> float:
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    limiter = RateLimiter(MemoryStore(keys), POLICIES)
+    for _ in range(hits_per_key):
+        for i in range(keys):
+            await limiter.hit("default", f"10.0.{i // 256}.{i % 256}")
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (after - before) / keys
+
+
+async def main(keys: int, hits: int):
+    memory = await hits_per_second(RateLimiter(MemoryStore(keys), POLICIES), keys, hits)
+    fake = await hits_per_second(RateLimiter(RedisStore(FakeRedis()), POLICIES), keys, hits)
+    print(f"memory store       {memory:>12,.0f} decisions/s {1e6 / memory:>8.2f} us each")
+    print(f"redis store (fake) {fake:>12,.0f} decisions/s {1e6 / fake:>8.2f} us each")
+    for hits_per_key in (1, 10):
+        print(f"{keys} keys, {hits_per_key:>2} hits each: {await bytes_per_key(keys, hits_per_key):>6.0f} bytes/key")
+    capped = RateLimiter(MemoryStore(keys // 10), POLICIES)
+    await hits_per_second(capped, keys, keys)
+    print(f"max_keys={keys // 10}: {len(capped.store)} keys kept, {capped.store.evictions} evicted")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rate limiter decision cost and memory per key")
+    parser.add_argument("--keys", type=int, default=100_000)
+    parser.add_argument("--hits", type=int, default=500_000)
+    args = parser.parse_args()
+    asyncio.run(main(args.keys, args.hits))
@@ -0,0 +1,90 @@
+"""
+Route planner benchmark.
+
+Generates synthetic Accra-sized days of confirmed orders (random stops in
+the metro area, windows from the order form's schedule options) and plans
+them for a tanker fleet, with and without the 2-opt pass. Reports plan
+quality (orders served on time, km driven per delivery against one round
+trip per order) next to solve time.
+
+    python benchmarks/route_planning.py
+    python benchmarks/route_planning.py --orders 2000 --vehicles 60 --capacity 5000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# app.routing builds the engines on import; nothing here queries them
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+
+from app.models import FuelType
+from app.routing import Stop, delivery_window, plan_routes
+
+# Rough bounding box around Accra and Tema, depot in central Accra
+LAT_RANGE = (5.50, 5.75)
+LNG_RANGE = (-0.35, 0.00)
+DEPOT = (5.6037, -0.1870)
+DAY_START = datetime(2025, 10, 6, 7)
+
+# (orders, tankers) for the default runs
+DATASETS = [(100, 5), (500, 20), (2000, 60)]
+
+
+def make_stops(count: int, rng: random.Random) -> list:
+    schedules = ["now", "now", "1hour", "2hours", "today"]
+    stops = []
+    for i in range(count):
+        placed_at = DAY_START + timedelta(minutes=rng.uniform(0, 10 * 60))
+        earliest, latest = delivery_window(rng.choice(schedules), placed_at)
+        stops.append(Stop(
+            order_id=i,
+            lat=rng.uniform(*LAT_RANGE),
+            lng=rng.uniform(*LNG_RANGE),
+            fuel_type=rng.choice(list(FuelType)),
+            quantity=rng.choice((20, 40, 50, 100, 200)),
+            earliest=earliest,
+            latest=latest,
+        ))
+    return stops
+
+
+def best_of(repeat: int, **kwargs):
+    best_ms, plan = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        plan = plan_routes(**kwargs)
+        best_ms = min(best_ms, (time.perf_counter() - started) * 1000)
+    return plan, best_ms
+
+
+def run(datasets: list, capacity: int, repeat: int, seed: int):
+    rng = random.Random(seed)
+    print(f"{'orders':>6} {'tankers':>7} {'planner':<14} {'served':>7} {'trips':>6} "
+          f"{'km':>9} {'km/order':>9} {'1-trip km/order':>16} {'solve ms':>9}")
+    for orders, vehicles in datasets:
+        stops = make_stops(orders, rng)
+        for name, improve in (("nearest", False), ("nearest+2opt", True)):
+            plan, solve_ms = best_of(
+                repeat, stops=stops, capacity=capacity, depot=DEPOT, start=DAY_START,
+                vehicles=vehicles, improve=improve
+            )
+            served = orders - len(plan.unscheduled)
+            print(f"{orders:>6} {vehicles:>7} {name:<14} {served / orders:>7.1%} {len(plan.trips):>6} "
+                  f"{plan.distance_km:>9.1f} {plan.distance_km / max(served, 1):>9.2f} "
+                  f"{plan.single_trip_km / orders:>16.2f} {solve_ms:>9.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plan quality vs solve time on synthetic Accra orders")
+    parser.add_argument("--orders", type=int, help="run one dataset of this size instead of the defaults")
+    parser.add_argument("--vehicles", type=int, default=20)
+    parser.add_argument("--capacity", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+    datasets = [(args.orders, args.vehicles)] if args.orders else DATASETS
+    run(datasets, args.capacity, args.repeat, args.seed)
@@ -0,0 +1,182 @@
+"""
+Benchmark data seeder.
+
+Migrates the database at DATABASE_URL, then bulk-loads N users (customers,
+drivers with profiles and one admin) and M orders cycling through every
+FuelType x OrderStatus combination, with matching payment statuses,
+drivers on orders past confirmation, Paystack references, delivery points
+around Accra and Kumasi and timestamps spread over the last --days days.
+Current fuel prices are added if there are none and the analytics rollups
+are rebuilt at the end. The same --seed gives the same data.
+
+Every account shares one password, hashed once: customers sign in as
+customer<i>@example.com, drivers as driver<i>@example.com and the admin as
+admin@example.com.
+
+    DATABASE_URL=sqlite:///bench.db python benchmarks/seed.py --users 10000 --orders 1000000
+"""
+import argparse
+import itertools
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func, insert, select
+
+from app.analytics import rebuild_rollups
+from app.database import SessionLocal, engine, run_migrations
+from app.hashing import hash_password
+from app.models import DriverProfile, FuelPrice, FuelType, Order, OrderStatus, PaymentStatus, User, UserRole
+
+PASSWORD = "benchmark123"
+
+# Per-litre prices inserted when the database has none
+PRICES = {FuelType.REGULAR: 13.2, FuelType.PREMIUM: 14.9, FuelType.DIESEL: 14.1}
+
+# City centres orders are scattered around
+CENTRES = [(5.6037, -0.1870), (6.6885, -1.6244)]
+
+# Orders past confirmation have been paid for and have a driver
+DRIVEN_STATUSES = {OrderStatus.PROCESSING, OrderStatus.EN_ROUTE, OrderStatus.DELIVERED}
+
+
+def customer_email(i: int) -> str:
+    return f"customer{i}@example.com"
+
+
+def driver_email(i: int) -> str:
+    return f"driver{i}@example.com"
+
+
+ADMIN_EMAIL = "admin@example.com"
+
+
+def payment_status_for(status: OrderStatus, rng: random.Random) -> PaymentStatus:
+    """A payment status an order in this state can actually have"""
+    if status == OrderStatus.PENDING:
+        return rng.choice([PaymentStatus.PENDING, PaymentStatus.PENDING, PaymentStatus.FAILED])
+    if status == OrderStatus.CANCELLED:
+        return rng.choice([PaymentStatus.FAILED, PaymentStatus.PENDING, PaymentStatus.SUCCESSFUL])
+    return PaymentStatus.SUCCESSFUL
+
+
+def seed_users(conn, users: int, hashed: str) -> tuple:
+    """Insert the accounts; returns (customer ids, driver ids)"""
+    drivers = max(1, users // 20)
+    customers = max(1, users - drivers - 1)
+    now = datetime.utcnow()
+    rows = [
+        {"full_name": f"Customer {i}", "email": customer_email(i), "phone_number": f"024{i:07d}",
+         "role": UserRole.CUSTOMER}
+        for i in range(customers)
+    ] + [
+        {"full_name": f"Driver {i}", "email": driver_email(i), "phone_number": f"055{i:07d}", "role": UserRole.DRIVER}
+        for i in range(drivers)
+    ] + [
+        {"full_name": "Benchmark Admin", "email": ADMIN_EMAIL, "phone_number": "0599999999", "role": UserRole.ADMIN}
+    ]
+    for row in rows:
+        row.update(hashed_password=hashed, is_active=True, is_verified=True, token_version=0,
+                   created_at=now, updated_at=now)
+    ids = conn.execute(insert(User).returning(User.id, User.role), rows).all()
+    customer_ids = [user_id for user_id, role in ids if role == UserRole.CUSTOMER]
+    driver_ids = [user_id for user_id, role in ids if role == UserRole.DRIVER]
+    conn.execute(insert(DriverProfile), [
+        {"user_id": user_id, "capacity_liters": 2000, "fuel_types": ",".join(f.value for f in FuelType),
+         "is_available": True, "created_at": now, "updated_at": now}
+        for user_id in driver_ids
+    ])
+    return customer_ids, driver_ids
+
+
+def seed_prices(conn) -> dict:
+    """Current price row per fuel type, adding them if there are none"""
+    if not conn.execute(select(func.count()).select_from(FuelPrice)).scalar():
+        now = datetime.utcnow()
+        conn.execute(insert(FuelPrice), [
+            {"fuel_type": fuel, "price_per_liter": price, "currency": "GHS", "effective_from": now, "created_at": now}
+            for fuel, price in PRICES.items()
+        ])
+    rows = conn.execute(
+        select(FuelPrice.fuel_type, FuelPrice.id, FuelPrice.price_per_liter)
+        .where(FuelPrice.effective_to.is_(None))
+        .order_by(FuelPrice.effective_from)
+    ).all()
+    return {fuel: (price_id, price) for fuel, price_id, price in rows}
+
+
+def seed_orders(conn, orders: int, customer_ids: list, driver_ids: list, prices: dict, days: int,
+                rng: random.Random, chunk_size: int):
+    combinations = list(itertools.product(FuelType, OrderStatus))
+    end = datetime.utcnow()
+    step = timedelta(days=days) / max(orders, 1)
+    start = end - step * orders
+    batch = []
+    for i in range(orders):
+        fuel, order_status = combinations[i % len(combinations)]
+        price_id, price = prices[fuel]
+        quantity = rng.randint(5, 200)
+        lat, lng = rng.choice(CENTRES)
+        created_at = start + step * i
+        driven = order_status in DRIVEN_STATUSES
+        batch.append({
+            "user_id": rng.choice(customer_ids),
+            "phone_number": "0241234567",
+            "delivery_address": f"{rng.randint(1, 200)} Bench Street",
+            "fuel_type": fuel,
+            "quantity": quantity,
+            "price_per_liter": price,
+            "total_amount": round(quantity * price, 2),
+            "fuel_price_id": price_id,
+            "delivery_time": "asap",
+            "order_status": order_status,
+            "payment_status": payment_status_for(order_status, rng),
+            "paystack_reference": f"FUE_S{i}_{rng.getrandbits(32):08x}",
+            "delivery_lat": lat + rng.uniform(-0.1, 0.1),
+            "delivery_lng": lng + rng.uniform(-0.1, 0.1),
+            "driver_id": rng.choice(driver_ids) if driven else None,
+            "assigned_at": created_at + timedelta(minutes=5) if driven else None,
+            "created_at": created_at,
+            "updated_at": created_at,
+        })
+        if len(batch) == chunk_size:
+            conn.execute(insert(Order), batch)
+            batch = []
+    if batch:
+        conn.execute(insert(Order), batch)
+
+
+def seed(users: int, orders: int, days: int = 90, seed_value: int = 42, chunk_size: int = 10000):
+    run_migrations()
+    with engine.connect() as conn:
+        if conn.execute(select(User.id).where(User.email == ADMIN_EMAIL)).first():
+            raise SystemExit(f"{engine.url} is already seeded; point DATABASE_URL at an empty database")
+
+    rng = random.Random(seed_value)
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        customer_ids, driver_ids = seed_users(conn, users, hash_password(PASSWORD))
+        prices = seed_prices(conn)
+        seed_orders(conn, orders, customer_ids, driver_ids, prices, days, rng, chunk_size)
+    print(f"seeded {len(customer_ids)} customers, {len(driver_ids)} drivers, 1 admin and {orders} orders "
+          f"in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    with SessionLocal() as db:
+        rebuild_rollups(db)
+    print(f"rebuilt analytics rollups in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk-load users and orders for benchmarks")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--orders", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=90, help="spread orders over this many days up to now")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    args = parser.parse_args()
+    seed(args.users, args.orders, args.days, args.seed, args.chunk_size)
@@ -0,0 +1,107 @@
+"""
+Order list serialization micro-benchmark.
+
+Times one page of GET /orders through each response path, per item:
+loading ORM entities and validating them through the response model
+before rendering with the stdlib json encoder (the old path) or orjson,
+against selecting plain columns and handing dicts straight to orjson, with
+all fields or a sparse ?fields= set. "fetch" includes the SQLite query;
+"render" is serialization alone.
+
+    python benchmarks/serialization.py --page-size 100
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import orjson
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from app.models import Base, Order
+from app.projection import ORDER_FIELDS, order_dicts, select_orders
+from app.schemas import OrderPage
+from orders_pagination import seed
+
+
+def stdlib_render(content) -> bytes:
+    # What starlette's JSONResponse does
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def orjson_render(content) -> bytes:
+    # What fastapi's ORJSONResponse does
+    return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+
+
+def validated(orders: list):
+    # What a response_model does with the endpoint's return value
+    return OrderPage.model_validate({"items": orders, "next_cursor": None}).model_dump(mode="json")
+
+
+def entity_page(engine, size: int):
+    with Session(engine) as db:
+        return db.execute(select(Order).order_by(Order.created_at.desc(), Order.id.desc()).limit(size)).scalars().all()
+
+
+def column_page(engine, size: int, names: tuple):
+    with engine.connect() as conn:
+        return conn.execute(select_orders(names).order_by(Order.created_at.desc(), Order.id.desc()).limit(size)).all()
+
+
+def best_us(run, repeat: int, size: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - started)
+    return best * 1e6 / size
+
+
+def main(size: int, repeat: int):
+    path = os.path.join(tempfile.mkdtemp(), "serialization.db")
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    seed(engine, max(size, 1000), 100)
+
+    sparse = ("id", "order_status")
+    orders = entity_page(engine, size)
+    rows = column_page(engine, size, ORDER_FIELDS)
+    sparse_rows = column_page(engine, size, sparse)
+
+    # Same JSON either way, before comparing speed
+    before = json.loads(stdlib_render(validated(orders)))["items"]
+    after = orjson.loads(orjson_render({"items": order_dicts(rows, ORDER_FIELDS), "next_cursor": None}))["items"]
+    assert before == after, "column projection changed the response"
+
+    paths = [
+        ("entities+pydantic+json",
+         lambda: stdlib_render(validated(entity_page(engine, size))),
+         lambda: stdlib_render(validated(orders))),
+        ("entities+pydantic+orjson",
+         lambda: orjson_render(validated(entity_page(engine, size))),
+         lambda: orjson_render(validated(orders))),
+        ("columns+orjson",
+         lambda: orjson_render({"items": order_dicts(column_page(engine, size, ORDER_FIELDS), ORDER_FIELDS)}),
+         lambda: orjson_render({"items": order_dicts(rows, ORDER_FIELDS)})),
+        ("columns+orjson ?fields=2",
+         lambda: orjson_render({"items": order_dicts(column_page(engine, size, sparse), sparse)}),
+         lambda: orjson_render({"items": order_dicts(sparse_rows, sparse)})),
+    ]
+    print(f"{size} orders per page, best of {repeat}")
+    print(f"{'path':<26} {'fetch+render us/item':>21} {'render us/item':>15}")
+    for name, fetch_and_render, render in paths:
+        print(f"{name:<26} {best_us(fetch_and_render, repeat, size):>21.2f} {best_us(render, repeat, size):>15.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-item cost of the order list response paths")
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+    main(args.page_size, args.repeat)
@@ -0,0 +1,419 @@
+"""
+Order lifecycle benchmark suite.
+
+Runs scripted scenarios with concurrent virtual users against the API and
+reports throughput and p50/p95/p99 latency per step as JSON, then compares
+them with a stored baseline and exits non-zero on a regression:
+
+- lifecycle: a new customer signs up, logs in, orders, Paystack's
+  charge.success webhook arrives, the order reads as paid, and the
+  customer lists their orders
+- browse: seeded customers page through their order history, open an
+  order and check fuel prices
+- admin: the sales dashboard (analytics by fuel type and region, and the
+  daily series)
+
+With --spawn the suite is self-contained. It creates a temporary SQLite
+database, seeds it with benchmarks/seed.py, then starts the Paystack stub
+and the API with rate limiting, the reconciler and dispatch off, so
+background work stays out of the numbers:
+
+    python benchmarks/suite.py --spawn --users 1000 --orders 100000 --output results.json
+
+Against a server you started yourself, seed its database with seed.py, run
+it with RATE_LIMIT_ENABLED=false and PAYSTACK_BASE_URL at the stub, and
+pass its PAYSTACK_SECRET_KEY so the webhooks verify:
+
+    python benchmarks/suite.py --url http://127.0.0.1:8000 --secret-key sk_test_...
+
+--save-baseline replaces benchmarks/baseline.json with this run. Baselines
+only compare meaningfully on the machine and settings that recorded them.
+"""
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import httpx
+
+from login_latency import percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(ROOT, "benchmarks", "baseline.json")
+
+# Must match benchmarks/seed.py
+PASSWORD = "benchmark123"
+ADMIN_EMAIL = "admin@example.com"
+
+# How long the lifecycle scenario waits for a webhook to show on the order
+PAID_TIMEOUT = 10.0
+
+# Compared with the baseline: throughput should not fall, latency should not rise
+COMPARED = (("rps", 1), ("p50_ms", -1), ("p95_ms", -1), ("p99_ms", -1))
+
+
+class StepFailed(Exception):
+    """A step got an unexpected answer; the iteration stops there"""
+
+
+class Recorder:
+    """Latency samples and error counts per scenario step"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.failures = []
+
+    def fail(self, step: str, reason: str):
+        self.errors[step] += 1
+        if len(self.failures) < 10:
+            self.failures.append(f"{step}: {reason}")
+        raise StepFailed(reason)
+
+    async def request(self, step: str, client: httpx.AsyncClient, method: str, url: str, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            self.fail(step, f"{type(e).__name__}: {e}")
+        if response.status_code != 200:
+            self.fail(step, f"{response.status_code} {response.text[:200]}")
+        self.latencies[step].append(time.perf_counter() - started)
+        return response
+
+
+async def login(client: httpx.AsyncClient, email: str) -> dict:
+    response = await client.post("/auth/login", json={"email": email, "password": PASSWORD})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+class Lifecycle:
+    """signup -> login -> create_order -> webhook -> paid -> get_orders, as a new customer each time"""
+
+    def __init__(self, secret_key: str):
+        self.secret_key = secret_key
+        # Sequential phone numbers from a random start, so signups in one run never collide
+        self.next_phone = random.randrange(0, 9_000_000)
+
+    async def setup(self, client: httpx.AsyncClient, user: int):
+        return None
+
+    def phone(self) -> str:
+        self.next_phone += 1
+        return f"020{self.next_phone % 10_000_000:07d}"
+
+    async def run(self, client: httpx.AsyncClient, state, recorder: Recorder, rng: random.Random):
+        email = f"bench_{uuid.uuid4().hex[:12]}@example.com"
+        await recorder.request("signup", client, "POST", "/auth/signup", json={
+            "full_name": "Suite Customer", "email": email, "phone_number": self.phone(), "password": PASSWORD,
+        })
+        token = (await recorder.request(
+            "login", client, "POST", "/auth/login", json={"email": email, "password": PASSWORD}
+        )).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        order = (await recorder.request("create_order", client, "POST", "/orders", headers=headers, json={
+            "phone_number": "0241234567",
+            "email": email,
+            "delivery_address": "1 Suite Street, Accra",
+            "fuel_type": rng.choice(["regular", "premium", "diesel"]),
+            "quantity": rng.randint(5, 200),
+            "delivery_time": "asap",
+            "delivery_lat": 5.6037 + rng.uniform(-0.1, 0.1),
+            "delivery_lng": -0.1870 + rng.uniform(-0.1, 0.1),
+        })).json()["order"]
+
+        body = json.dumps({"event": "charge.success", "data": {
+            "id": rng.getrandbits(48), "reference": order["paystack_reference"], "status": "success",
+            "amount": int(order["total_amount"] * 100), "currency": "GHS",
+        }}).encode()
+        signature = hmac.new(self.secret_key.encode(), body, hashlib.sha512).hexdigest()
+        await recorder.request("webhook", client, "POST", "/webhook/paystack", content=body, headers={
+            "content-type": "application/json", "x-paystack-signature": signature,
+        })
+
+        # Events are applied in batches off the request path; time until the order reads as paid
+        acked = time.perf_counter()
+        while True:
+            current = await recorder.request("get_order", client, "GET", f"/orders/{order['id']}", headers=headers)
+            if current.json()["payment_status"] == "successful":
+                recorder.latencies["paid"].append(time.perf_counter() - acked)
+                break
+            if time.perf_counter() - acked > PAID_TIMEOUT:
+                recorder.fail("paid", f"order {order['id']} still unpaid {PAID_TIMEOUT}s after its webhook")
+            await asyncio.sleep(0.01)
+
+        await recorder.request("get_orders", client, "GET", "/orders", headers=headers)
+
+
+class Browse:
+    """A seeded customer's order history: two pages, one order, then the fuel prices"""
+
+    async def setup(self, client: httpx.AsyncClient, user: int):
+        return await login(client, f"customer{user}@example.com")
+
+    async def run(self, client: httpx.AsyncClient, headers: dict, recorder: Recorder, rng: random.Random):
+        page = (await recorder.request("orders_page_1", client, "GET", "/orders", headers=headers)).json()
+        if page["next_cursor"]:
+            await recorder.request("orders_page_2", client, "GET", "/orders", headers=headers,
+                                   params={"cursor": page["next_cursor"]})
+        if page["items"]:
+            order = rng.choice(page["items"])
+            await recorder.request("get_order", client, "GET", f"/orders/{order['id']}", headers=headers)
+        await recorder.request("fuel_prices", client, "GET", "/fuel-prices")
+
+
+class Admin:
+    """The admin sales dashboard over the seeded rollups"""
+
+    async def setup(self, client: httpx.AsyncClient, user: int):
+        return await login(client, ADMIN_EMAIL)
+
+    async def run(self, client: httpx.AsyncClient, headers: dict, recorder: Recorder, rng: random.Random):
+        await recorder.request("sales_by_fuel", client, "GET", "/admin/analytics/sales", headers=headers,
+                               params={"group_by": "fuel_type"})
+        await recorder.request("sales_by_region", client, "GET", "/admin/analytics/sales", headers=headers,
+                               params={"group_by": "region"})
+        start = (datetime.utcnow() - timedelta(days=90)).date().isoformat()
+        await recorder.request("daily_series", client, "GET", "/admin/analytics/timeseries", headers=headers,
+                               params={"period": "day", "start": start})
+
+
+def step_stats(latencies: list, errors: int, seconds: float) -> dict:
+    ms = [value * 1000 for value in latencies]
+    return {
+        "requests": len(ms),
+        "errors": errors,
+        "rps": round(len(ms) / seconds, 2),
+        "p50_ms": round(percentile(ms, 50), 2) if ms else None,
+        "p95_ms": round(percentile(ms, 95), 2) if ms else None,
+        "p99_ms": round(percentile(ms, 99), 2) if ms else None,
+        "mean_ms": round(sum(ms) / len(ms), 2) if ms else None,
+        "max_ms": round(max(ms), 2) if ms else None,
+    }
+
+
+async def run_scenario(url: str, scenario, concurrency: int, duration: float, seed: int) -> dict:
+    recorder = Recorder()
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60.0) as client:
+        # Logins for the seeded accounts happen here, outside the timings
+        states = await asyncio.gather(*(scenario.setup(client, user) for user in range(concurrency)))
+        counts = {"iterations": 0, "failed": 0}
+        deadline = time.perf_counter() + duration
+
+        async def virtual_user(user: int, state):
+            rng = random.Random(seed * 100_003 + user)
+            while time.perf_counter() < deadline:
+                try:
+                    await scenario.run(client, state, recorder, rng)
+                    counts["iterations"] += 1
+                except StepFailed:
+                    counts["failed"] += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(virtual_user(user, state) for user, state in enumerate(states)))
+        seconds = time.perf_counter() - started
+
+    # Steps in the order they first ran
+    steps = list(dict.fromkeys([*recorder.latencies, *recorder.errors]))
+    return {
+        "concurrency": concurrency,
+        "seconds": round(seconds, 2),
+        "iterations": counts["iterations"],
+        "failed_iterations": counts["failed"],
+        "iterations_per_s": round(counts["iterations"] / seconds, 2),
+        "steps": {step: step_stats(recorder.latencies[step], recorder.errors[step], seconds) for step in steps},
+        "failures": recorder.failures,
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Print each step against the baseline; returns the regressions beyond tolerance"""
+    regressions = []
+    print(f"\n{'vs baseline':<34} {'metric':>8} {'baseline':>10} {'now':>10} {'change':>8}", file=sys.stderr)
+    for name, scenario in results["scenarios"].items():
+        recorded = baseline.get("scenarios", {}).get(name, {})
+        if recorded and recorded["concurrency"] != scenario["concurrency"]:
+            print(f"{name}: baseline ran {recorded['concurrency']} users, this run {scenario['concurrency']}; "
+                  f"latencies will not be like for like", file=sys.stderr)
+        baseline_steps = recorded.get("steps", {})
+        for step, now in scenario["steps"].items():
+            before = baseline_steps.get(step)
+            if not before:
+                continue
+            if now["errors"] and not before["errors"]:
+                regressions.append(f"{name}.{step}: {now['errors']} errors, none in the baseline")
+            for metric, direction in COMPARED:
+                if not before.get(metric) or now.get(metric) is None:
+                    continue
+                change = (now[metric] - before[metric]) / before[metric]
+                regressed = change * direction < -tolerance
+                if regressed:
+                    regressions.append(f"{name}.{step} {metric}: {before[metric]} -> {now[metric]} ({change:+.0%})")
+                print(f"{name + '.' + step:<34} {metric:>8} {before[metric]:>10} {now[metric]:>10} {change:>+8.0%}"
+                      f"{'  REGRESSION' if regressed else ''}", file=sys.stderr)
+    return regressions
+
+
+def report(results: dict):
+    print(f"{'step':<34} {'reqs':>7} {'errs':>5} {'rps':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}",
+          file=sys.stderr)
+    for name, scenario in results["scenarios"].items():
+        print(f"{name}: {scenario['iterations']} iterations ({scenario['iterations_per_s']}/s), "
+              f"{scenario['failed_iterations']} failed", file=sys.stderr)
+        for step, stats in scenario["steps"].items():
+            print(f"  {step:<32} {stats['requests']:>7} {stats['errors']:>5} {stats['rps']:>8} "
+                  f"{stats['p50_ms'] or '-':>8} {stats['p95_ms'] or '-':>8} {stats['p99_ms'] or '-':>8}",
+                  file=sys.stderr)
+        for failure in scenario["failures"]:
+            print(f"  ! {failure}", file=sys.stderr)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(url: str, process: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"{url} exited with {process.returncode} before it came up")
+        try:
+            httpx.get(f"{url}/openapi.json", timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise SystemExit(f"{url} did not come up within {timeout:.0f}s")
+
+
+def spawn(users: int, orders: int, secret_key: str, server_env: dict) -> tuple:
+    """Seed a temporary database and start the Paystack stub and the API on it; returns (url, processes)"""
+    workdir = tempfile.mkdtemp(prefix="fuelease-bench-")
+    stub_port, api_port = free_port(), free_port()
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        "PAYSTACK_BASE_URL": f"http://127.0.0.1:{stub_port}",
+        "PAYSTACK_SECRET_KEY": secret_key,
+        "RATE_LIMIT_ENABLED": "false",
+        "RECONCILER_ENABLED": "false",
+        "DISPATCH_ENABLED": "false",
+        **server_env,
+    }
+    subprocess.run([sys.executable, os.path.join(ROOT, "benchmarks", "seed.py"), "--users", str(users),
+                    "--orders", str(orders)], env=env, cwd=ROOT, check=True, stdout=sys.stderr)
+    processes = []
+    log_path = os.path.join(workdir, "servers.log")
+    with open(log_path, "w") as log:
+        for target, port in (("benchmarks.paystack_stub:app", stub_port), ("app.main:app", api_port)):
+            processes.append(subprocess.Popen(
+                [sys.executable, "-m", "uvicorn", target, "--host", "127.0.0.1", "--port", str(port),
+                 "--log-level", "warning"],
+                env=env, cwd=ROOT, stdout=log, stderr=subprocess.STDOUT,
+            ))
+            wait_until_up(f"http://127.0.0.1:{port}", processes[-1])
+    print(f"API on port {api_port}, Paystack stub on {stub_port}; server logs in {log_path}", file=sys.stderr)
+    return f"http://127.0.0.1:{api_port}", processes
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+SCENARIOS = {"lifecycle": Lifecycle, "browse": Browse, "admin": Admin}
+
+
+def main(args) -> int:
+    processes = []
+    url = args.url
+    if args.spawn:
+        server_env = dict(pair.split("=", 1) for pair in args.server_env)
+        url, processes = spawn(args.users, args.orders, args.secret_key, server_env)
+    try:
+        results = {
+            "meta": {
+                "recorded_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+                "revision": git_revision(),
+                "python": platform.python_version(),
+                "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs",
+                "spawned": {"users": args.users, "orders": args.orders, "env": args.server_env} if args.spawn else None,
+                "concurrency": args.concurrency,
+                "duration": args.duration,
+                "seed": args.seed,
+            },
+            "scenarios": {},
+        }
+        for name in args.scenarios.split(","):
+            scenario = Lifecycle(args.secret_key) if name == "lifecycle" else SCENARIOS[name]()
+            print(f"running {name} for {args.duration:.0f}s with {args.concurrency} users", file=sys.stderr)
+            results["scenarios"][name] = asyncio.run(
+                run_scenario(url, scenario, args.concurrency, args.duration, args.seed)
+            )
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+    report(results)
+    rendered = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(rendered + "\n")
+    else:
+        print(rendered)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            f.write(rendered + "\n")
+        print(f"saved baseline to {args.baseline}", file=sys.stderr)
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"no baseline at {args.baseline}; record one with --save-baseline", file=sys.stderr)
+        return 0
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.tolerance)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Order lifecycle scenarios with latency percentiles and a baseline")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--spawn", action="store_true", help="seed a temporary database and start the stub and API")
+    parser.add_argument("--users", type=int, default=1000, help="seeded users (--spawn)")
+    parser.add_argument("--orders", type=int, default=100_000, help="seeded orders (--spawn)")
+    parser.add_argument("--server-env", action="append", default=[], metavar="KEY=VALUE",
+                        help="extra environment for the spawned API, e.g. BCRYPT_ROUNDS=10")
+    parser.add_argument("--secret-key", default=os.environ.get("PAYSTACK_SECRET_KEY", "sk_test_benchmark"),
+                        help="the server's PAYSTACK_SECRET_KEY, to sign webhooks")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per scenario")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="record this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="fractional change in rps or a percentile that counts as a regression")
+    sys.exit(main(parser.parse_args()))
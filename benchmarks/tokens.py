@@ -0,0 +1,64 @@
+"""
+Token verification benchmark.
+
+Compares what one authenticated request spends on its token: python-jose's
+jwt.decode (the previous path), a TokenService signature check per
+algorithm with the verified-token cache empty, and a cached decode.
+
+    python benchmarks/tokens.py --tokens 20000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, rsa
+from cryptography.hazmat.primitives.serialization import Encoding, NoEncryption, PrivateFormat
+from jose import jwt
+
+from app.tokens import ACCESS, BUILTIN_SECRET, TokenKey, TokenService
+
+CLAIMS = {"sub": "customer0@example.com", "uid": 1, "ver": 0}
+
+
+def pem(private_key) -> str:
+    return private_key.private_bytes(Encoding.PEM, PrivateFormat.PKCS8, NoEncryption()).decode()
+
+
+KEYS = {
+    "HS256": {"secret": BUILTIN_SECRET},
+    "RS256": {"key": pem(rsa.generate_private_key(65537, 2048))},
+    "ES256": {"key": pem(ec.generate_private_key(ec.SECP256R1()))},
+    "EdDSA": {"key": pem(ed25519.Ed25519PrivateKey.generate())},
+}
+
+
+def us_per_token(decode, tokens: list) -> float:
+    started = time.perf_counter()
+    for token in tokens:
+        decode(token)
+    return (time.perf_counter() - started) * 1e6 / len(tokens)
+
+
+def main(count: int):
+    exp = int(time.time()) + 3600
+    legacy = [jwt.encode({**CLAIMS, "n": i, "exp": exp}, BUILTIN_SECRET, algorithm="HS256") for i in range(count)]
+    jose = us_per_token(lambda token: jwt.decode(token, BUILTIN_SECRET, algorithms=["HS256"]), legacy)
+    print(f"{'python-jose HS256':<24} {jose:>9.2f} us/token")
+
+    for algorithm, spec in KEYS.items():
+        key = TokenKey.load({"kid": algorithm, "alg": algorithm, **spec})
+        service = TokenService([key], algorithm, "fuelease", count)
+        tokens = [service.issue({**CLAIMS, "n": i}, ACCESS, 3600) for i in range(count)]
+        cold = us_per_token(service.decode, tokens)
+        cached = us_per_token(service.decode, tokens)
+        print(f"{algorithm + ' verify':<24} {cold:>9.2f} us/token   cached {cached:>6.2f} us/token")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Per-token cost of JWT verification, with and without the cache")
+    parser.add_argument("--tokens", type=int, default=20_000)
+    args = parser.parse_args()
+    main(args.tokens)
@@ -2,17 +2,17 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath('create_demo_accounts.py')))
 
-from app.database import get_db, init_db
+from app.database import SessionLocal, run_migrations
 from app.models import User, UserRole
 from app.auth import get_password_hash
 from sqlalchemy.orm import Session
 
 def create_demo_accounts():
    
-    init_db()
+    run_migrations()
     
     # Get database session
-    db = next(get_db())
+    db = SessionLocal()
     
     # Demo accounts data
     demo_accounts = [
@@ -0,0 +1,148 @@
+import argparse
+import json
+import sys
+import os
+import tempfile
+from datetime import datetime
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from alembic import command
+from alembic.config import Config
+
+from app.config import settings
+from app.database import ALEMBIC_CONFIG, SessionLocal
+from app.models import DriverProfile, FuelType
+
+
+def migrate(args):
+    """Upgrade the database to a migration revision"""
+    command.upgrade(Config(ALEMBIC_CONFIG), args.revision)
+
+
+def downgrade(args):
+    """Downgrade the database to a migration revision"""
+    command.downgrade(Config(ALEMBIC_CONFIG), args.revision)
+
+
+def current(args):
+    """Show the revision the database is at"""
+    command.current(Config(ALEMBIC_CONFIG), verbose=True)
+
+
+def plan_routes(args):
+    """Plan multi-stop tanker trips for confirmed orders"""
+    from app.dispatch import parse_fuel_types
+    from app.routing import plan_routes as plan, plannable_orders, stops_from_orders
+
+    with SessionLocal() as db:
+        capacity = args.capacity
+        fuel_types = [FuelType(args.fuel_type)] if args.fuel_type else None
+        if args.driver_id is not None:
+            profile = db.get(DriverProfile, args.driver_id)
+            if profile is None:
+                sys.exit(f"No driver profile for user {args.driver_id}")
+            capacity = capacity or profile.capacity_liters
+            carried = parse_fuel_types(profile.fuel_types)
+            fuel_types = [f for f in (fuel_types or carried) if f in carried]
+        if capacity is None:
+            sys.exit("Give --capacity or --driver-id")
+        orders = db.execute(
+            plannable_orders(fuel_types, driver_id=args.driver_id).limit(settings.route_max_orders)
+        ).scalars().all()
+        stops = stops_from_orders(orders)
+
+    result = plan(
+        stops, capacity, (settings.route_depot_lat, settings.route_depot_lng),
+        args.start or datetime.utcnow(), vehicles=args.vehicles,
+        speed_kmh=settings.route_speed_kmh, service_minutes=settings.route_service_minutes,
+        improve=not args.no_improve
+    )
+    if args.json:
+        from app.schemas import RoutePlanResponse
+        print(json.dumps(RoutePlanResponse.model_validate(result).model_dump(mode="json"), indent=2))
+        return
+
+    for trip in result.trips:
+        sequence = " -> ".join(f"#{stop.order_id}@{stop.arrival:%H:%M}" for stop in trip.stops)
+        print(f"tanker {trip.vehicle} {trip.depart:%H:%M}-{trip.return_at:%H:%M} {trip.fuel_type.value:<8} "
+              f"{trip.liters:>6} L {trip.distance_km:>8.1f} km  {sequence}")
+    print(f"{len(stops)} orders, {len(result.trips)} trips, {result.distance_km:.1f} km "
+          f"(vs {result.single_trip_km:.1f} km one order per trip), "
+          f"{len(result.unscheduled)} unscheduled, solved in {result.solve_ms:.0f} ms")
+
+
+def backfill_rollups(args):
+    """Rebuild the sales analytics rollups from existing orders"""
+    from app.analytics import rebuild_rollups
+
+    with SessionLocal() as db:
+        counted = rebuild_rollups(db, since=args.since)
+    print(f"Rolled up {counted} orders" + (f" placed since {args.since:%Y-%m-%d}" if args.since else ""))
+
+
+def serve(args):
+    """Run the API in one or more worker processes"""
+    import uvicorn
+
+    if args.workers > 1:
+        if settings.shared_state_backend != "redis":
+            sys.exit("More than one worker needs SHARED_STATE_BACKEND=redis so the workers share caches, "
+                     "rate limits, tracking and dispatch")
+        os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", tempfile.mkdtemp(prefix="fuelease-metrics-"))
+    metrics_dir = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+    if metrics_dir:
+        # Files left by an earlier run would be added into this one's totals
+        os.makedirs(metrics_dir, exist_ok=True)
+        for name in os.listdir(metrics_dir):
+            if name.endswith(".db"):
+                os.remove(os.path.join(metrics_dir, name))
+
+    uvicorn.run(
+        "app.main:app", host=args.host, port=args.port, workers=args.workers,
+        timeout_graceful_shutdown=settings.serve_graceful_timeout, log_level=args.log_level
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fuelease management commands")
+    subcommands = parser.add_subparsers(dest="command", required=True)
+
+    migrate_parser = subcommands.add_parser("migrate", help=migrate.__doc__)
+    migrate_parser.add_argument("revision", nargs="?", default="head")
+    migrate_parser.set_defaults(handler=migrate)
+
+    downgrade_parser = subcommands.add_parser("downgrade", help=downgrade.__doc__)
+    downgrade_parser.add_argument("revision")
+    downgrade_parser.set_defaults(handler=downgrade)
+
+    current_parser = subcommands.add_parser("current", help=current.__doc__)
+    current_parser.set_defaults(handler=current)
+
+    plan_parser = subcommands.add_parser("plan-routes", help=plan_routes.__doc__)
+    plan_parser.add_argument("--capacity", type=int, help="tank capacity in litres")
+    plan_parser.add_argument("--driver-id", type=int, help="use this driver's capacity and fuel types")
+    plan_parser.add_argument("--vehicles", type=int, default=1)
+    plan_parser.add_argument("--fuel-type", choices=[f.value for f in FuelType])
+    plan_parser.add_argument("--start", type=datetime.fromisoformat, help="plan start, ISO format (default now)")
+    plan_parser.add_argument("--no-improve", action="store_true", help="skip the 2-opt pass")
+    plan_parser.add_argument("--json", action="store_true")
+    plan_parser.set_defaults(handler=plan_routes)
+
+    backfill_parser = subcommands.add_parser("backfill-rollups", help=backfill_rollups.__doc__)
+    backfill_parser.add_argument("--since", type=datetime.fromisoformat,
+                                 help="only rebuild days from this date on, ISO format (default everything)")
+    backfill_parser.set_defaults(handler=backfill_rollups)
+
+    serve_parser = subcommands.add_parser("serve", help=serve.__doc__)
+    serve_parser.add_argument("--host", default=settings.serve_host)
+    serve_parser.add_argument("--port", type=int, default=settings.serve_port)
+    serve_parser.add_argument("--workers", type=int, default=settings.serve_workers)
+    serve_parser.add_argument("--log-level", default="info")
+    serve_parser.set_defaults(handler=serve)
+
+    args = parser.parse_args(argv)
+    args.handler(args)
+
+
+if __name__ == "__main__":
+    main()
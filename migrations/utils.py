@@ -0,0 +1,20 @@
+"""Helpers that let migrations adopt databases built earlier by create_all."""
+import sqlalchemy as sa
+from alembic import op
+
+
+def has_table(name: str) -> bool:
+    return sa.inspect(op.get_bind()).has_table(name)
+
+
+def has_column(table: str, column: str) -> bool:
+    return column in {c["name"] for c in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def has_index(table: str, index: str) -> bool:
+    return index in {i["name"] for i in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def create_index_if_missing(name: str, table: str, columns: list, **kwargs):
+    if not has_index(table, name):
+        op.create_index(name, table, columns, **kwargs)
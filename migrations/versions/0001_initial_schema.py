@@ -0,0 +1,80 @@
+"""initial schema
+
+Revision ID: 0001
+Revises:
+Create Date: 2025-10-04 00:00:00
+
+Databases created earlier by create_all already have these tables; they
+are adopted as-is, only gaining orders.user_id if they predate it.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.utils import has_column, has_table
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not has_table("users"):
+        op.create_table(
+            "users",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("full_name", sa.String(), nullable=False),
+            sa.Column("email", sa.String(), nullable=False),
+            sa.Column("phone_number", sa.String(), nullable=False),
+            sa.Column("hashed_password", sa.String(), nullable=False),
+            sa.Column("role", sa.Enum("CUSTOMER", "DRIVER", "ADMIN", name="userrole"), nullable=True),
+            sa.Column("is_active", sa.Boolean(), nullable=True),
+            sa.Column("is_verified", sa.Boolean(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_users_id", "users", ["id"])
+        op.create_index("ix_users_email", "users", ["email"], unique=True)
+        op.create_index("ix_users_phone_number", "users", ["phone_number"], unique=True)
+
+    if not has_table("orders"):
+        op.create_table(
+            "orders",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=True),
+            sa.Column("customer_name", sa.String(), nullable=True),
+            sa.Column("phone_number", sa.String(), nullable=False),
+            sa.Column("email", sa.String(), nullable=True),
+            sa.Column("delivery_address", sa.String(), nullable=False),
+            sa.Column("fuel_type", sa.Enum("REGULAR", "PREMIUM", "DIESEL", name="fueltype"), nullable=False),
+            sa.Column("quantity", sa.Integer(), nullable=False),
+            sa.Column("price_per_liter", sa.Float(), nullable=False),
+            sa.Column("total_amount", sa.Float(), nullable=False),
+            sa.Column("delivery_time", sa.String(), nullable=False),
+            sa.Column("order_status", sa.Enum(
+                "PENDING", "CONFIRMED", "PROCESSING", "EN_ROUTE", "DELIVERED", "CANCELLED", name="orderstatus"
+            ), nullable=True),
+            sa.Column("payment_status", sa.Enum("PENDING", "SUCCESSFUL", "FAILED", name="paymentstatus"), nullable=True),
+            sa.Column("paystack_reference", sa.String(), nullable=True),
+            sa.Column("paystack_access_code", sa.String(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_orders_id", "orders", ["id"])
+    elif not has_column("orders", "user_id"):
+        with op.batch_alter_table("orders") as batch_op:
+            batch_op.add_column(sa.Column("user_id", sa.Integer(), nullable=True))
+            batch_op.create_foreign_key("fk_orders_user_id_users", "users", ["user_id"], ["id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("orders")
+    op.drop_table("users")
@@ -0,0 +1,49 @@
+"""add payment_outbox
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2025-10-04 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.utils import has_table
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, Sequence[str], None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if has_table("payment_outbox"):
+        return
+    op.create_table(
+        "payment_outbox",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("order_id", sa.Integer(), sa.ForeignKey("orders.id"), nullable=False),
+        sa.Column("idempotency_key", sa.String(), nullable=False),
+        sa.Column("status", sa.Enum("PENDING", "IN_PROGRESS", "DONE", "FAILED", name="outboxstatus"), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("locked_until", sa.DateTime(), nullable=True),
+        sa.Column("authorization_url", sa.String(), nullable=True),
+        sa.Column("last_error", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("order_id"),
+        sa.UniqueConstraint("idempotency_key"),
+    )
+    op.create_index("ix_payment_outbox_id", "payment_outbox", ["id"])
+    op.create_index("ix_payment_outbox_status", "payment_outbox", ["status"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("payment_outbox")
@@ -0,0 +1,44 @@
+"""add order lookup and keyset pagination indexes
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2025-10-04 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+from migrations.utils import create_index_if_missing
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, Sequence[str], None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ("ix_orders_paystack_reference", ["paystack_reference"]),
+    ("ix_orders_created_at_id", ["created_at", "id"]),
+    ("ix_orders_user_created_at", ["user_id", "created_at", "id"]),
+    ("ix_orders_status_created_at", ["order_status", "created_at", "id"]),
+    ("ix_orders_fuel_type_created_at", ["fuel_type", "created_at", "id"]),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for name, columns in INDEXES:
+        # CONCURRENTLY keeps the table writable while Postgres builds the index
+        if op.get_bind().dialect.name == "postgresql":
+            with op.get_context().autocommit_block():
+                create_index_if_missing(name, "orders", columns, postgresql_concurrently=True)
+        else:
+            create_index_if_missing(name, "orders", columns)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for name, _ in reversed(INDEXES):
+        op.drop_index(name, table_name="orders")
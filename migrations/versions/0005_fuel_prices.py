@@ -0,0 +1,61 @@
+"""add fuel_prices and orders.fuel_price_id
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2025-10-04 00:00:00
+
+Seeds the prices that used to be hardcoded in the API.
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from migrations.utils import has_column, has_table
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, Sequence[str], None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not has_table("fuel_prices"):
+        fuel_prices = op.create_table(
+            "fuel_prices",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("fuel_type", postgresql.ENUM("REGULAR", "PREMIUM", "DIESEL", name="fueltype", create_type=False), nullable=False),
+            sa.Column("price_per_liter", sa.Float(), nullable=False),
+            sa.Column("currency", sa.String(), nullable=False),
+            sa.Column("effective_from", sa.DateTime(), nullable=False),
+            sa.Column("effective_to", sa.DateTime(), nullable=True),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint("id"),
+        )
+        op.create_index("ix_fuel_prices_id", "fuel_prices", ["id"])
+        op.create_index("ix_fuel_prices_fuel_type_effective_from", "fuel_prices", ["fuel_type", "effective_from"])
+
+        seeded_at = datetime(2025, 1, 1)
+        op.bulk_insert(fuel_prices, [
+            {"fuel_type": fuel_type, "price_per_liter": price, "currency": "GHS",
+             "effective_from": seeded_at, "created_at": seeded_at}
+            for fuel_type, price in (("REGULAR", 12.50), ("PREMIUM", 14.80), ("DIESEL", 13.20))
+        ])
+
+    if not has_column("orders", "fuel_price_id"):
+        with op.batch_alter_table("orders") as batch_op:
+            batch_op.add_column(sa.Column("fuel_price_id", sa.Integer(), nullable=True))
+            batch_op.create_foreign_key("fk_orders_fuel_price_id_fuel_prices", "fuel_prices", ["fuel_price_id"], ["id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table("orders") as batch_op:
+        batch_op.drop_constraint("fk_orders_fuel_price_id_fuel_prices", type_="foreignkey")
+        batch_op.drop_column("fuel_price_id")
+    op.drop_table("fuel_prices")
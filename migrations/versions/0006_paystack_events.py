@@ -0,0 +1,47 @@
+"""add paystack_events
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2025-10-04 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.utils import has_table
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, Sequence[str], None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if has_table("paystack_events"):
+        return
+    op.create_table(
+        "paystack_events",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("event_key", sa.String(), nullable=False),
+        sa.Column("event", sa.String(), nullable=False),
+        sa.Column("reference", sa.String(), nullable=True),
+        sa.Column("payload", sa.Text(), nullable=False),
+        sa.Column("status", sa.Enum("RECEIVED", "APPLIED", name="webhookeventstatus"), nullable=False),
+        sa.Column("received_at", sa.DateTime(), nullable=True),
+        sa.Column("processed_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("event_key"),
+    )
+    op.create_index("ix_paystack_events_id", "paystack_events", ["id"])
+    op.create_index("ix_paystack_events_reference", "paystack_events", ["reference"])
+    op.create_index("ix_paystack_events_status", "paystack_events", ["status"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("paystack_events")
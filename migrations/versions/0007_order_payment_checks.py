@@ -0,0 +1,35 @@
+"""add orders.payment_checked_at and the reconciliation index
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2025-10-04 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.utils import create_index_if_missing, has_column
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, Sequence[str], None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not has_column("orders", "payment_checked_at"):
+        with op.batch_alter_table("orders") as batch_op:
+            batch_op.add_column(sa.Column("payment_checked_at", sa.DateTime(), nullable=True))
+    create_index_if_missing("ix_orders_payment_status_created_at", "orders", ["payment_status", "created_at"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_orders_payment_status_created_at", table_name="orders")
+    with op.batch_alter_table("orders") as batch_op:
+        batch_op.drop_column("payment_checked_at")
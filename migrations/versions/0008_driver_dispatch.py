@@ -0,0 +1,55 @@
+"""add driver_profiles and order dispatch columns
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2025-10-05 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.utils import create_index_if_missing, has_column, has_table
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, Sequence[str], None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not has_table("driver_profiles"):
+        op.create_table(
+            "driver_profiles",
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("capacity_liters", sa.Integer(), nullable=False),
+            sa.Column("fuel_types", sa.String(), nullable=False),
+            sa.Column("is_available", sa.Boolean(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint("user_id"),
+        )
+    if not has_column("orders", "driver_id"):
+        with op.batch_alter_table("orders") as batch_op:
+            batch_op.add_column(sa.Column("delivery_lat", sa.Float(), nullable=True))
+            batch_op.add_column(sa.Column("delivery_lng", sa.Float(), nullable=True))
+            batch_op.add_column(sa.Column("driver_id", sa.Integer(), nullable=True))
+            batch_op.add_column(sa.Column("assigned_at", sa.DateTime(), nullable=True))
+            batch_op.create_foreign_key("fk_orders_driver_id_users", "users", ["driver_id"], ["id"])
+    create_index_if_missing("ix_orders_driver_id", "orders", ["driver_id"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_orders_driver_id", table_name="orders")
+    with op.batch_alter_table("orders") as batch_op:
+        batch_op.drop_constraint("fk_orders_driver_id_users", type_="foreignkey")
+        batch_op.drop_column("assigned_at")
+        batch_op.drop_column("driver_id")
+        batch_op.drop_column("delivery_lng")
+        batch_op.drop_column("delivery_lat")
+    op.drop_table("driver_profiles")
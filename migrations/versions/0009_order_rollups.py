@@ -0,0 +1,59 @@
+"""add hourly and daily order rollup tables
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2025-10-08 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from migrations.utils import has_table
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, Sequence[str], None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+ROLLUP_TABLES = ("order_rollups_hourly", "order_rollups_daily")
+
+
+def _rollup_columns() -> list:
+    # The enum types already exist from the orders table
+    return [
+        sa.Column("bucket", sa.DateTime(), nullable=False),
+        sa.Column("fuel_type", postgresql.ENUM(
+            "REGULAR", "PREMIUM", "DIESEL", name="fueltype", create_type=False
+        ), nullable=False),
+        sa.Column("region", sa.String(), nullable=False),
+        sa.Column("order_status", postgresql.ENUM(
+            "PENDING", "CONFIRMED", "PROCESSING", "EN_ROUTE", "DELIVERED", "CANCELLED",
+            name="orderstatus", create_type=False
+        ), nullable=False),
+        sa.Column("payment_status", postgresql.ENUM(
+            "PENDING", "SUCCESSFUL", "FAILED", name="paymentstatus", create_type=False
+        ), nullable=False),
+        sa.Column("orders", sa.Integer(), nullable=False),
+        sa.Column("liters", sa.Integer(), nullable=False),
+        sa.Column("amount", sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint("bucket", "fuel_type", "region", "order_status", "payment_status"),
+    ]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Filled by `python manage.py backfill-rollups`, then kept current by the app
+    for table in ROLLUP_TABLES:
+        if not has_table(table):
+            op.create_table(table, *_rollup_columns())
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in ROLLUP_TABLES:
+        op.drop_table(table)
@@ -0,0 +1,65 @@
+"""add orders.version and the order_status_history table
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2025-10-12 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from migrations.utils import create_index_if_missing, has_column, has_table
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0010'
+down_revision: Union[str, Sequence[str], None] = '0009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _status_columns(prefix: str) -> list:
+    # The enum types already exist from the orders table
+    return [
+        sa.Column(f"{prefix}order_status", postgresql.ENUM(
+            "PENDING", "CONFIRMED", "PROCESSING", "EN_ROUTE", "DELIVERED", "CANCELLED",
+            name="orderstatus", create_type=False
+        ), nullable=False),
+        sa.Column(f"{prefix}payment_status", postgresql.ENUM(
+            "PENDING", "SUCCESSFUL", "FAILED", name="paymentstatus", create_type=False
+        ), nullable=False),
+    ]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not has_column("orders", "version"):
+        with op.batch_alter_table("orders") as batch_op:
+            batch_op.add_column(sa.Column("version", sa.Integer(), nullable=False, server_default="0"))
+    # History starts now; orders keep their current status without a row for how they got there
+    if not has_table("order_status_history"):
+        op.create_table(
+            "order_status_history",
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("order_id", sa.Integer(), sa.ForeignKey("orders.id"), nullable=False),
+            sa.Column("version", sa.Integer(), nullable=False),
+            sa.Column("reason", sa.String(), nullable=False),
+            *_status_columns("from_"),
+            *_status_columns(""),
+            sa.Column("created_at", sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+        )
+    create_index_if_missing(
+        "ix_order_status_history_order_id_version", "order_status_history", ["order_id", "version"], unique=True
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_order_status_history_order_id_version", table_name="order_status_history")
+    op.drop_table("order_status_history")
+    with op.batch_alter_table("orders") as batch_op:
+        batch_op.drop_column("version")
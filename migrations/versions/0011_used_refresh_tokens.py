@@ -0,0 +1,40 @@
+"""add the used_refresh_tokens table
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2025-10-13 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from migrations.utils import create_index_if_missing, has_table
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0011'
+down_revision: Union[str, Sequence[str], None] = '0010'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if not has_table("used_refresh_tokens"):
+        op.create_table(
+            "used_refresh_tokens",
+            sa.Column("jti", sa.String(), nullable=False),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("expires_at", sa.DateTime(), nullable=False),
+            sa.Column("used_at", sa.DateTime(), nullable=False),
+            sa.PrimaryKeyConstraint("jti"),
+        )
+    create_index_if_missing("ix_used_refresh_tokens_expires_at", "used_refresh_tokens", ["expires_at"])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index("ix_used_refresh_tokens_expires_at", table_name="used_refresh_tokens")
+    op.drop_table("used_refresh_tokens")
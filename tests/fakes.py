@@ -0,0 +1,116 @@
+import asyncio
+import time
+from typing import Optional
+
+from app.shared_state import LEAD_SCRIPT, RESIGN_SCRIPT
+
+
+class FakeRedis:
+    """In-process stand-in for the parts of the redis.asyncio client RedisStore and RedisState use, for tests.
+
+    eval runs the lease scripts RedisState sends with their Python equivalent,
+    as there is no Lua here. Every RedisState built on one FakeRedis sees the
+    same keys and channels, like workers sharing one Redis server.
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.pubsubs = []
+
+    def _live(self, key: str):
+        entry = self.data.get(key)
+        if entry and entry[1] is not None and entry[1] <= time.time():
+            del self.data[key]
+            return None
+        return entry
+
+    def pipeline(self, transaction: bool = True):
+        return _FakePipeline(self)
+
+    async def incrby(self, key: str, amount: int) -> int:
+        entry = self._live(key)
+        value = (int(entry[0]) if entry else 0) + amount
+        self.data[key] = [str(value), entry[1] if entry else None]
+        return value
+
+    async def expire(self, key: str, seconds: int) -> bool:
+        entry = self._live(key)
+        if entry:
+            entry[1] = time.time() + seconds
+        return entry is not None
+
+    async def pexpire(self, key: str, milliseconds: int) -> bool:
+        return await self.expire(key, int(milliseconds) / 1000)
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._live(key)
+        return entry[0] if entry else None
+
+    async def set(self, key: str, value: str, px: int = None, nx: bool = False) -> Optional[bool]:
+        if nx and self._live(key):
+            return None
+        self.data[key] = [value, time.time() + int(px) / 1000 if px else None]
+        return True
+
+    async def delete(self, *keys: str) -> int:
+        live = [key for key in keys if self._live(key)]
+        for key in live:
+            del self.data[key]
+        return len(live)
+
+    async def eval(self, script: str, numkeys: int, *args):
+        key, owner = args[0], str(args[1])
+        entry = self._live(key)
+        if script == LEAD_SCRIPT:
+            if entry and entry[0] == owner:
+                return int(await self.pexpire(key, args[2]))
+            return 1 if await self.set(key, owner, px=args[2], nx=True) else 0
+        if script == RESIGN_SCRIPT:
+            return await self.delete(key) if entry and entry[0] == owner else 0
+        raise NotImplementedError("FakeRedis only runs the RedisState lease scripts")
+
+    async def publish(self, channel: str, data: str) -> int:
+        receivers = [pubsub for pubsub in self.pubsubs if channel in pubsub.channels]
+        for pubsub in receivers:
+            pubsub.messages.put_nowait({"type": "message", "channel": channel, "data": data})
+        return len(receivers)
+
+    def pubsub(self):
+        pubsub = _FakePubSub(self)
+        self.pubsubs.append(pubsub)
+        return pubsub
+
+    async def aclose(self):
+        pass
+
+
+class _FakePipeline:
+    def __init__(self, client: FakeRedis):
+        self.client = client
+        self.commands = []
+
+    def __getattr__(self, name):
+        command = getattr(self.client, name)
+        return lambda *args: self.commands.append((command, args))
+
+    async def execute(self) -> list:
+        return [await command(*args) for command, args in self.commands]
+
+
+class _FakePubSub:
+    def __init__(self, client: FakeRedis):
+        self.client = client
+        self.channels = set()
+        self.messages = asyncio.Queue()
+
+    async def subscribe(self, *channels: str):
+        self.channels.update(channels)
+
+    async def get_message(self, ignore_subscribe_messages: bool = False, timeout: float = 0.0):
+        try:
+            return await asyncio.wait_for(self.messages.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def aclose(self):
+        self.client.pubsubs.remove(self)
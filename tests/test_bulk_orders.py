@@ -0,0 +1,60 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+from app.bulk_orders import read_rows
+from app.config import settings
+
+
+def upload(body: str, content_type: str = "text/csv", chunk_size: int = 7) -> Request:
+    """A request whose body arrives in small chunks, splitting lines and cells across them"""
+    data = body.encode()
+    chunks = [data[i:i + chunk_size] for i in range(0, len(data), chunk_size)] or [b""]
+
+    async def receive():
+        chunk = chunks.pop(0)
+        return {"type": "http.request", "body": chunk, "more_body": bool(chunks)}
+
+    scope = {"type": "http", "method": "POST", "headers": [(b"content-type", content_type.encode())]}
+    return Request(scope, receive)
+
+
+def csv_body(rows: int) -> str:
+    """A header and `rows` orders, with blank lines and a cell spanning lines mixed in"""
+    lines = ["fuel_type,quantity,delivery_address", ""]
+    for n in range(rows):
+        address = f'"Plot {n}\nEast Legon, Accra"' if n % 2 else f'"He said ""gate {n}"""'
+        lines += [f"regular,{n + 1},{address}", ""]
+    return "\r\n".join(lines)
+
+
+@pytest.fixture
+def limit(monkeypatch):
+    monkeypatch.setattr(settings, "bulk_order_max_rows", 4)
+    return 4
+
+
+def test_csv_upload_of_exactly_the_limit_is_read(limit):
+    rows = asyncio.run(read_rows(upload(csv_body(limit))))
+    assert [row["quantity"] for row in rows] == ["1", "2", "3", "4"]
+    assert rows[1]["delivery_address"] == "Plot 1\nEast Legon, Accra"
+    assert rows[2]["delivery_address"] == 'He said "gate 2"'
+
+
+def test_csv_upload_over_the_limit_is_refused(limit):
+    with pytest.raises(HTTPException) as refused:
+        asyncio.run(read_rows(upload(csv_body(limit + 1))))
+    assert refused.value.status_code == 413
+
+
+def test_csv_quotes_inside_an_unquoted_cell_are_literal(limit):
+    body = 'fuel_type,quantity,delivery_address\nregular,1,Shop 5" from the junction\nregular,2,Osu\n'
+    rows = asyncio.run(read_rows(upload(body)))
+    assert [row["delivery_address"] for row in rows] == ['Shop 5" from the junction', "Osu"]
+
+
+def test_ndjson_upload_of_exactly_the_limit_is_read(limit):
+    body = "\n\n".join('{"quantity": %d}' % n for n in range(limit))
+    assert len(asyncio.run(read_rows(upload(body, "application/x-ndjson")))) == limit
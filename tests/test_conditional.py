@@ -0,0 +1,20 @@
+import pytest
+
+from app.conditional import etag_matches
+
+ETAG = '"3f2a9c"'
+
+
+@pytest.mark.parametrize("header, matches", [
+    ('"3f2a9c"', True),
+    ('W/"3f2a9c"', True),
+    ('"aaaa", "3f2a9c"', True),
+    ('"aaaa",W/"3f2a9c"', True),
+    ("*", True),
+    ('"aaaa"', False),
+    ("3f2a9c", False),
+    ("", False),
+    (None, False),
+])
+def test_etag_matches(header, matches):
+    assert etag_matches(header, ETAG) is matches
@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from app import dispatch
+from app.dispatch import Dispatcher
+from app.models import FuelType, Order, OrderStatus, PaymentStatus
+
+
+def add_orders(session_factory, count: int) -> list:
+    async def add():
+        async with session_factory() as db:
+            orders = [
+                Order(
+                    phone_number="0241234567", delivery_address="Accra", fuel_type=FuelType.REGULAR, quantity=10,
+                    price_per_liter=15.0, total_amount=150.0, delivery_time="now",
+                    order_status=OrderStatus.CONFIRMED, payment_status=PaymentStatus.SUCCESSFUL,
+                    delivery_lat=5.6037, delivery_lng=-0.1870,
+                )
+                for _ in range(count)
+            ]
+            db.add_all(orders)
+            await db.commit()
+            return [order.id for order in orders]
+    return asyncio.run(add())
+
+
+def test_drivers_are_idle_again_when_assignment_fails(session_factory, monkeypatch):
+    calls = []
+    real_assign_driver = dispatch.assign_driver
+
+    async def assign_driver(db, order_id, driver_id):
+        # The first order is assigned, the second hits a locked database
+        calls.append(order_id)
+        if len(calls) > 1:
+            raise RuntimeError("database is locked")
+        return await real_assign_driver(db, order_id, driver_id)
+
+    monkeypatch.setattr(dispatch, "assign_driver", assign_driver)
+    add_orders(session_factory, 2)
+    dispatcher = Dispatcher(session_factory)
+    for driver_id in (1, 2):
+        dispatcher._set_profile(driver_id, 1000, frozenset({FuelType.REGULAR}), True)
+        dispatcher._update_position(driver_id, 5.60, -0.18)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(dispatcher.run_once())
+
+    assert len(calls) == 2
+    assert all(dispatcher.drivers[driver_id].idle for driver_id in (1, 2))
+    assert len(dispatcher.index) == 2
+    assert dispatcher.assignments == {}
@@ -0,0 +1,77 @@
+import asyncio
+import signal
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import lifecycle as lifecycle_module
+from app.config import settings
+from app.lifecycle import Lifecycle, lifecycle
+from app.main import app
+
+
+@pytest.fixture
+def drain_listeners(monkeypatch):
+    listeners = []
+    monkeypatch.setattr(lifecycle_module, "_drain_listeners", listeners)
+    return listeners
+
+
+def test_drain_runs_every_listener_once(drain_listeners):
+    calls = []
+
+    def broken():
+        raise RuntimeError("listener failed")
+
+    lifecycle_module.on_drain(broken)
+    lifecycle_module.on_drain(lambda: calls.append("drained"))
+
+    async def run():
+        worker = Lifecycle()
+        worker.drain("SIGTERM")
+        worker.drain("shutdown")
+        return worker.stats()
+
+    # A failing listener doesn't keep the others from running, and a second drain does nothing
+    assert asyncio.run(run()) == {"draining": True, "reason": "SIGTERM"}
+    assert calls == ["drained"]
+
+
+def test_sigterm_drains_before_reaching_the_server(drain_listeners, monkeypatch):
+    monkeypatch.setattr(settings, "serve_drain_seconds", 0.05)
+    server_saw = []
+    original = signal.getsignal(signal.SIGTERM)
+
+    async def run():
+        worker = Lifecycle()
+        signal.signal(signal.SIGTERM, lambda signum, frame: server_saw.append(signum))
+        worker.install_signal_handlers()
+        try:
+            signal.getsignal(signal.SIGTERM)(signal.SIGTERM, None)
+            await asyncio.sleep(0.01)
+            # Draining at once, but the server is told only after SERVE_DRAIN_SECONDS
+            assert worker.draining.is_set() and server_saw == []
+            await asyncio.sleep(0.1)
+            assert server_saw == [signal.SIGTERM]
+
+            # A second signal passes straight on
+            signal.getsignal(signal.SIGTERM)(signal.SIGTERM, None)
+            assert server_saw == [signal.SIGTERM, signal.SIGTERM]
+        finally:
+            worker.restore_signal_handlers()
+
+    try:
+        asyncio.run(run())
+    finally:
+        signal.signal(signal.SIGTERM, original)
+
+
+def test_health_fails_once_draining(monkeypatch):
+    monkeypatch.setattr(lifecycle, "draining", asyncio.Event())
+    client = TestClient(app)
+    assert client.get("/health").status_code == 200
+
+    lifecycle.draining.set()
+    response = client.get("/health")
+    assert response.status_code == 503
+    assert response.json() == {"status": "draining"}
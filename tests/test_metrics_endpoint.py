@@ -0,0 +1,31 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.config import settings
+from app.main import app
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_enabled", False)
+    return TestClient(app)
+
+
+def test_metrics_are_not_served_without_a_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "metrics_token", None)
+    assert client.get("/metrics").status_code == 404
+
+
+def test_metrics_need_the_token(client, monkeypatch):
+    monkeypatch.setattr(settings, "metrics_token", "scrape-me")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    response = client.get("/metrics", headers={"Authorization": "Bearer scrape-me"})
+    assert response.status_code == 200
+    assert "http_requests_total" in response.text
+
+
+def test_metrics_can_be_made_public(client, monkeypatch):
+    monkeypatch.setattr(settings, "metrics_token", None)
+    monkeypatch.setattr(settings, "metrics_public", True)
+    assert client.get("/metrics").status_code == 200
@@ -0,0 +1,29 @@
+from datetime import datetime
+
+import pytest
+
+from app.auth import AuthenticatedUser
+from app.main import may_track
+from app.models import UserRole
+
+
+def user(user_id: int, role: UserRole) -> AuthenticatedUser:
+    return AuthenticatedUser(
+        id=user_id, full_name="Test", email=f"user{user_id}@example.com", phone_number="0240000000",
+        role=role, is_active=True, is_verified=True, token_version=0, created_at=datetime.utcnow(),
+    )
+
+
+@pytest.mark.parametrize("viewer, allowed", [
+    (user(1, UserRole.CUSTOMER), True),  # the owner
+    (user(2, UserRole.CUSTOMER), False),
+    (user(3, UserRole.DRIVER), True),  # the assigned driver
+    (user(4, UserRole.DRIVER), False),
+    (user(5, UserRole.ADMIN), True),
+])
+def test_who_may_track_an_assigned_order(viewer, allowed):
+    assert may_track(1, 3, viewer) is allowed
+
+
+def test_drivers_cannot_track_unassigned_orders():
+    assert not may_track(1, None, user(3, UserRole.DRIVER))
@@ -0,0 +1,189 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+
+from app.auth import create_user_access_token, user_cache
+from app.database import get_db, get_read_db
+from app.main import app
+from app.models import FuelType, Order, OrderStatus, OutboxStatus, PaymentOutbox, PaymentStatus, User
+from app.config import settings
+from app.payment_worker import PaymentInitWorker
+from app.paystack import paystack_service
+
+
+def add_order(session_factory, reference: str, attempts: int = 0, with_order: bool = True,
+              user_id: int = None) -> int:
+    async def add():
+        async with session_factory() as db:
+            order_id = 1
+            if with_order:
+                order = Order(
+                    phone_number="0241234567", delivery_address="Accra", fuel_type=FuelType.REGULAR, quantity=10,
+                    price_per_liter=15.0, total_amount=150.0, delivery_time="now", paystack_reference=reference,
+                    user_id=user_id,
+                )
+                db.add(order)
+                await db.flush()
+                order_id = order.id
+            entry = PaymentOutbox(order_id=order_id, idempotency_key=reference, attempts=attempts)
+            db.add(entry)
+            await db.commit()
+            return entry.id
+    return asyncio.run(add())
+
+
+def load(session_factory, outbox_id: int):
+    async def get():
+        async with session_factory() as db:
+            entry = await db.get(PaymentOutbox, outbox_id)
+            order = await db.get(Order, entry.order_id)
+            return entry, order
+    return asyncio.run(get())
+
+
+def test_paid_transaction_left_by_an_interrupted_attempt_is_kept(session_factory, monkeypatch):
+    async def find(reference):
+        return {"reference": reference, "status": "success"}
+
+    async def initialize(**kwargs):
+        raise AssertionError("must not open a second transaction")
+
+    monkeypatch.setattr(paystack_service, "find_transaction", find)
+    monkeypatch.setattr(paystack_service, "initialize_transaction", initialize)
+    # claim_batch counts the attempt before process runs, so a reclaimed row has attempts > 1
+    outbox_id = add_order(session_factory, "FUE_1_retry", attempts=2)
+
+    asyncio.run(PaymentInitWorker(session_factory).process(outbox_id))
+
+    entry, order = load(session_factory, outbox_id)
+    assert entry.status == OutboxStatus.DONE
+    assert entry.locked_until is None
+    assert (order.order_status, order.payment_status) == (OrderStatus.PENDING, PaymentStatus.PENDING)
+
+
+def test_reference_without_orders_is_skipped(session_factory, monkeypatch):
+    async def initialize(**kwargs):
+        raise AssertionError("nothing to charge")
+
+    monkeypatch.setattr(paystack_service, "initialize_transaction", initialize)
+    outbox_id = add_order(session_factory, "FUE_gone", attempts=1, with_order=False)
+
+    asyncio.run(PaymentInitWorker(session_factory).process(outbox_id))
+
+    entry, order = load(session_factory, outbox_id)
+    assert entry.status == OutboxStatus.FAILED
+    assert order is None
+
+
+def test_initialized_transaction_records_the_payment_url(session_factory, monkeypatch):
+    async def initialize(**kwargs):
+        return {"status": True, "data": {"access_code": "code", "authorization_url": "https://pay.example/x"}}
+
+    monkeypatch.setattr(paystack_service, "initialize_transaction", initialize)
+    outbox_id = add_order(session_factory, "FUE_1_new", attempts=1)
+
+    asyncio.run(PaymentInitWorker(session_factory).process(outbox_id))
+
+    entry, order = load(session_factory, outbox_id)
+    assert entry.status == OutboxStatus.DONE
+    assert entry.authorization_url == "https://pay.example/x"
+    assert order.paystack_access_code == "code"
+
+
+def test_reclaimed_row_waits_when_paystack_cannot_be_asked(session_factory, monkeypatch):
+    async def find(reference):
+        return None
+
+    async def initialize(**kwargs):
+        raise AssertionError("Paystack may already hold the reference")
+
+    monkeypatch.setattr(paystack_service, "find_transaction", find)
+    monkeypatch.setattr(paystack_service, "initialize_transaction", initialize)
+    outbox_id = add_order(session_factory, "FUE_1_unknown", attempts=settings.payment_worker_max_attempts + 3)
+
+    asyncio.run(PaymentInitWorker(session_factory).process(outbox_id))
+
+    entry, order = load(session_factory, outbox_id)
+    assert entry.status == OutboxStatus.PENDING
+    assert entry.locked_until is not None
+    assert order.order_status == OrderStatus.PENDING
+
+
+def give_up(session_factory, monkeypatch, found):
+    lookups = []
+
+    async def find(reference):
+        lookups.append(reference)
+        # The reclaimed-row check finds nothing; the check before giving up answers `found`
+        return False if len(lookups) == 1 else found
+
+    async def initialize(**kwargs):
+        return None
+
+    monkeypatch.setattr(paystack_service, "find_transaction", find)
+    monkeypatch.setattr(paystack_service, "initialize_transaction", initialize)
+    outbox_id = add_order(session_factory, "FUE_1_last", attempts=settings.payment_worker_max_attempts)
+
+    asyncio.run(PaymentInitWorker(session_factory).process(outbox_id))
+    assert len(lookups) == 2
+    return load(session_factory, outbox_id)
+
+
+def test_last_attempt_abandons_a_reference_paystack_does_not_hold(session_factory, monkeypatch):
+    entry, order = give_up(session_factory, monkeypatch, found=False)
+    assert entry.status == OutboxStatus.FAILED
+    assert order.order_status == OrderStatus.CANCELLED
+
+
+def test_last_attempt_keeps_orders_paystack_may_hold(session_factory, monkeypatch):
+    entry, order = give_up(session_factory, monkeypatch, found=None)
+    assert entry.status == OutboxStatus.PENDING
+    assert order.order_status == OrderStatus.PENDING
+
+
+def test_last_attempt_keeps_a_transaction_paystack_holds(session_factory, monkeypatch):
+    entry, order = give_up(session_factory, monkeypatch, found={"status": "ongoing"})
+    assert entry.status == OutboxStatus.PENDING
+    assert order.order_status == OrderStatus.PENDING
+
+
+def test_customer_is_told_when_the_payment_link_was_lost(session_factory, monkeypatch):
+    async def find(reference):
+        # Opened by the lost attempt and never paid, as nobody got its payment URL
+        return {"reference": reference, "status": "abandoned"}
+
+    async def initialize(**kwargs):
+        raise AssertionError("Paystack already holds the reference")
+
+    async def get_test_db():
+        async with session_factory() as db:
+            yield db
+
+    async def add_customer():
+        async with session_factory() as db:
+            user = User(full_name="Customer", email="c@example.com", phone_number="0240000001", hashed_password="x")
+            db.add(user)
+            await db.commit()
+            return user
+
+    monkeypatch.setattr(paystack_service, "find_transaction", find)
+    monkeypatch.setattr(paystack_service, "initialize_transaction", initialize)
+    customer = asyncio.run(add_customer())
+    outbox_id = add_order(session_factory, "FUE_1_lost", attempts=2, user_id=customer.id)
+
+    asyncio.run(PaymentInitWorker(session_factory).process(outbox_id))
+    entry, order = load(session_factory, outbox_id)
+
+    app.dependency_overrides[get_db] = app.dependency_overrides[get_read_db] = get_test_db
+    try:
+        response = TestClient(app).get(
+            f"/orders/{order.id}/payment", headers={"Authorization": f"Bearer {create_user_access_token(customer)}"}
+        )
+    finally:
+        app.dependency_overrides.clear()
+        user_cache.clear()
+    assert response.status_code == 200
+    assert response.json()["status"] == "failed"
+    assert response.json()["payment_url"] is None
+    assert "order again" in response.json()["error"]
+    assert (order.order_status, order.payment_status) == (OrderStatus.CANCELLED, PaymentStatus.FAILED)
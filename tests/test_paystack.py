@@ -0,0 +1,181 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+from app.config import settings
+from app.paystack import PaystackService
+
+OK = {"status": True, "data": {"reference": "REF", "status": "success"}}
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(settings, "paystack_max_retries", 2)
+    monkeypatch.setattr(settings, "paystack_retry_backoff", 0.001)
+    monkeypatch.setattr(settings, "paystack_breaker_threshold", 3)
+    monkeypatch.setattr(settings, "paystack_breaker_reset_seconds", 60.0)
+    monkeypatch.setattr(settings, "paystack_deadline", 5.0)
+
+
+def service_with(handler) -> tuple:
+    """A PaystackService whose client answers with handler(request), and the requests it saw"""
+    seen = []
+
+    async def record(request):
+        seen.append(request)
+        result = handler(request)
+        return await result if asyncio.iscoroutine(result) else result
+
+    service = PaystackService()
+    service._client = httpx.AsyncClient(base_url="https://paystack.test", transport=httpx.MockTransport(record))
+    return service, seen
+
+
+def replies(*responses):
+    """A handler giving these responses (or raising these exceptions) in turn, then 200s"""
+    queue = list(responses)
+
+    def handler(request):
+        item = queue.pop(0) if queue else httpx.Response(200, json=OK)
+        if isinstance(item, Exception):
+            raise item
+        return item
+    return handler
+
+
+def test_idempotent_call_retries_server_errors():
+    service, seen = service_with(replies(httpx.Response(503), httpx.Response(502)))
+    assert asyncio.run(service.verify_transaction("REF")) == OK
+    assert len(seen) == 3
+    assert service.metrics["verify_transaction"].retries == 2
+
+
+def test_idempotent_call_retries_timeouts():
+    service, seen = service_with(replies(httpx.ReadTimeout("slow")))
+    assert asyncio.run(service.verify_transaction("REF")) == OK
+    assert len(seen) == 2
+
+
+def test_retries_stop_at_the_limit():
+    service, seen = service_with(lambda request: httpx.Response(503))
+    service.breaker.failure_threshold = 100
+    assert asyncio.run(service.verify_transaction("REF")) is None
+    assert len(seen) == 1 + settings.paystack_max_retries
+
+
+def test_client_errors_are_not_retried():
+    service, seen = service_with(lambda request: httpx.Response(404, json={"status": False, "message": "Not found"}))
+    assert asyncio.run(service.verify_transaction("REF")) is None
+    assert len(seen) == 1
+    assert service.breaker.state == "closed"
+
+
+def test_non_idempotent_call_only_retries_failed_connects():
+    service, seen = service_with(replies(httpx.ReadTimeout("slow")))
+    assert asyncio.run(service.initialize_transaction("a@example.com", 10, "REF")) is None
+    assert len(seen) == 1
+
+    service, seen = service_with(replies(httpx.ConnectError("refused")))
+    assert asyncio.run(service.initialize_transaction("a@example.com", 10, "REF")) == OK
+    assert len(seen) == 2
+
+
+def test_breaker_opens_then_half_opens_after_the_cool_off():
+    service, seen = service_with(lambda request: httpx.Response(503))
+    asyncio.run(service.verify_transaction("REF"))
+    assert len(seen) == 3
+    assert service.breaker.state == "open"
+
+    # Open: calls fail fast without reaching Paystack
+    assert asyncio.run(service.verify_transaction("REF")) is None
+    assert len(seen) == 3
+    assert service.metrics["verify_transaction"].short_circuited == 1
+
+    # Cooled off: one probe goes through, and its failure opens the breaker again
+    service.breaker.opened_at = time.monotonic() - settings.paystack_breaker_reset_seconds
+    assert service.breaker.state == "half_open"
+    asyncio.run(service.verify_transaction("REF"))
+    assert len(seen) == 4
+    assert service.breaker.state == "open"
+
+    # A successful probe closes it
+    service.breaker.opened_at = time.monotonic() - settings.paystack_breaker_reset_seconds
+    service._client = httpx.AsyncClient(base_url="https://paystack.test",
+                                        transport=httpx.MockTransport(replies()))
+    assert asyncio.run(service.verify_transaction("REF")) == OK
+    assert service.breaker.state == "closed"
+
+
+def test_half_open_breaker_lets_one_trial_through():
+    release = asyncio.Event()
+
+    async def recovering(request):
+        await release.wait()
+        return httpx.Response(200, json=OK)
+
+    service, seen = service_with(recovering)
+    service.breaker.opened_at = time.monotonic() - settings.paystack_breaker_reset_seconds
+
+    async def backlog():
+        calls = [asyncio.create_task(service.verify_transaction("REF")) for _ in range(5)]
+        await asyncio.sleep(0.05)
+        # The rest fail fast while the trial is out
+        assert len(seen) == 1
+        assert service.breaker.state == "half_open"
+        release.set()
+        return await asyncio.gather(*calls)
+
+    results = asyncio.run(backlog())
+    assert results.count(OK) == 1
+    assert results.count(None) == 4
+    assert service.metrics["verify_transaction"].short_circuited == 4
+    # The trial succeeded, so the breaker is closed for everyone
+    assert service.breaker.state == "closed"
+    assert asyncio.run(service.verify_transaction("REF")) == OK
+
+
+def test_deadline_bounds_the_whole_call(monkeypatch):
+    monkeypatch.setattr(settings, "paystack_deadline", 0.3)
+    monkeypatch.setattr(settings, "paystack_max_retries", 10)
+
+    async def slow_failure(request):
+        await asyncio.sleep(0.2)
+        return httpx.Response(503)
+
+    service, seen = service_with(slow_failure)
+    service.breaker.failure_threshold = 100
+    started = time.monotonic()
+    assert asyncio.run(service.verify_transaction("REF")) is None
+    assert time.monotonic() - started < 0.5
+    assert len(seen) == 2
+
+
+def test_hung_request_is_cut_off_at_the_deadline(monkeypatch):
+    monkeypatch.setattr(settings, "paystack_deadline", 0.2)
+
+    async def hang(request):
+        await asyncio.sleep(10)
+
+    service, seen = service_with(hang)
+    started = time.monotonic()
+    assert asyncio.run(service.initialize_transaction("a@example.com", 10, "REF")) is None
+    assert time.monotonic() - started < 1.0
+    assert service.metrics["initialize_transaction"].errors == 1
+
+
+def test_find_transaction_tells_not_found_from_no_answer():
+    service, seen = service_with(replies())
+    assert asyncio.run(service.find_transaction("REF")) == OK["data"]
+
+    not_found = httpx.Response(400, json={"status": False, "message": "Transaction reference not found"})
+    service, seen = service_with(replies(not_found))
+    assert asyncio.run(service.find_transaction("REF")) is False
+
+    service, seen = service_with(lambda request: httpx.Response(503))
+    assert asyncio.run(service.find_transaction("REF")) is None
+
+    # An open breaker can't say either
+    assert asyncio.run(service.find_transaction("REF")) is None
+    assert service.breaker.state == "open"
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.ratelimit import MemoryStore, RateLimiter, RateLimitMiddleware, RedisStore
+
+# Start of a minute, so window arithmetic is easy to follow
+T0 = 1_700_000_040.0
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [T0]
+    monkeypatch.setattr("app.ratelimit.time.time", lambda: now[0])
+    return now
+
+
+@pytest.fixture(params=["memory", "redis"])
+def limiter(request, fake_redis):
+    store = MemoryStore(1000) if request.param == "memory" else RedisStore(fake_redis)
+    return RateLimiter(store, {"default": "3/minute"})
+
+
+def hits(limiter, key: str, count: int) -> list:
+    async def run():
+        return [await limiter.hit("default", key) for _ in range(count)]
+    return asyncio.run(run())
+
+
+def test_allows_up_to_the_limit_then_denies(limiter, clock):
+    decisions = hits(limiter, "1.2.3.4", 4)
+    assert [d.allowed for d in decisions] == [True, True, True, False]
+    assert [d.remaining for d in decisions[:3]] == [2, 1, 0]
+    assert limiter.allowed == 3 and limiter.denied == 1
+
+
+def test_keys_are_limited_separately(limiter, clock):
+    hits(limiter, "1.2.3.4", 4)
+    assert hits(limiter, "5.6.7.8", 1)[0].allowed
+
+
+def test_last_window_slides_out(limiter, clock):
+    hits(limiter, "1.2.3.4", 3)
+    # Halfway into the next window, half of the last one's hits still count
+    clock[0] = T0 + 90
+    assert [d.allowed for d in hits(limiter, "1.2.3.4", 2)] == [True, False]
+    # Two windows on, nothing is left
+    clock[0] = T0 + 180
+    assert all(d.allowed for d in hits(limiter, "1.2.3.4", 3))
+
+
+def test_retry_after_is_when_the_next_hit_would_be_allowed(limiter, clock):
+    clock[0] = T0 + 15
+    denied = hits(limiter, "1.2.3.4", 4)[-1]
+    assert not denied.allowed
+    # Wait out this window (45s), then until enough of its four hits, the denied one too, slide out (30s)
+    assert denied.retry_after == 75
+    assert denied.headers()["Retry-After"] == "75"
+
+    clock[0] = T0 + 15 + denied.retry_after
+    assert hits(limiter, "1.2.3.4", 1)[0].allowed
+
+
+def test_middleware_answers_429_with_retry_after(clock):
+    app = FastAPI()
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    app.add_middleware(RateLimitMiddleware, limiter=RateLimiter(MemoryStore(1000), {"default": "2/minute"}))
+    client = TestClient(app)
+    responses = [client.get("/ping") for _ in range(3)]
+    assert [r.status_code for r in responses] == [200, 200, 429]
+    assert responses[0].headers["RateLimit-Remaining"] == "1"
+    assert int(responses[2].headers["Retry-After"]) > 0
+    assert responses[2].json() == {"detail": "Too many requests, please retry later"}
@@ -0,0 +1,66 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from app.models import FuelType, Order, OrderStatus, PaymentStatus
+from app.paystack import paystack_service
+from app.reconciler import PaymentReconciler
+from app.transitions import apply_payment_result
+
+
+def add_order(session_factory, reference: str, age: timedelta) -> int:
+    async def add():
+        async with session_factory() as db:
+            order = Order(
+                phone_number="0241234567", delivery_address="Accra", fuel_type=FuelType.REGULAR, quantity=10,
+                price_per_liter=15.0, total_amount=150.0, delivery_time="now", paystack_reference=reference,
+                created_at=datetime.utcnow() - age,
+            )
+            db.add(order)
+            await db.commit()
+            return order.id
+    return asyncio.run(add())
+
+
+def statuses(session_factory, order_id: int) -> tuple:
+    async def get():
+        async with session_factory() as db:
+            order = await db.get(Order, order_id)
+            return order.order_status, order.payment_status
+    return asyncio.run(get())
+
+
+def test_stale_order_with_a_failed_payment_expires(session_factory, monkeypatch):
+    async def verify(reference):
+        raise AssertionError("a failed payment is not verified again")
+
+    monkeypatch.setattr(paystack_service, "verify_transaction", verify)
+    order_id = add_order(session_factory, "REF_failed", timedelta(days=3))
+
+    async def fail():
+        async with session_factory() as db:
+            await apply_payment_result(db, "REF_failed", False)
+            await db.commit()
+
+    asyncio.run(fail())
+    assert statuses(session_factory, order_id) == (OrderStatus.PENDING, PaymentStatus.FAILED)
+
+    reconciler = PaymentReconciler(session_factory)
+    asyncio.run(reconciler.run_once())
+
+    assert statuses(session_factory, order_id) == (OrderStatus.CANCELLED, PaymentStatus.FAILED)
+    assert reconciler.stats()["expired"] == 1
+
+
+def test_stale_order_paystack_reports_failed_expires(session_factory, monkeypatch):
+    async def verify(reference):
+        return {"status": True, "data": {"status": "failed"}}
+
+    monkeypatch.setattr(paystack_service, "verify_transaction", verify)
+    stale = add_order(session_factory, "REF_stale", timedelta(days=3))
+    recent = add_order(session_factory, "REF_recent", timedelta(minutes=5))
+
+    asyncio.run(PaymentReconciler(session_factory).run_once())
+
+    assert statuses(session_factory, stale) == (OrderStatus.CANCELLED, PaymentStatus.FAILED)
+    # Still young, so it keeps its chance to be paid
+    assert statuses(session_factory, recent) == (OrderStatus.PENDING, PaymentStatus.FAILED)
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.auth import (
+    create_user_access_token, create_user_refresh_token, resolve_token_user, use_refresh_token, user_cache
+)
+from app.models import User
+
+
+@pytest.fixture(autouse=True)
+def fresh_user_cache():
+    # Every test's database numbers its first user 1
+    user_cache.clear()
+
+
+def add_user(session_factory) -> User:
+    async def add():
+        async with session_factory() as db:
+            user = User(full_name="Ama", email="ama@example.com", phone_number="0241234567", hashed_password="x")
+            db.add(user)
+            await db.commit()
+            return user
+    return asyncio.run(add())
+
+
+def use(session_factory, token: str):
+    async def run():
+        async with session_factory() as db:
+            return await use_refresh_token(token, db)
+    return asyncio.run(run())
+
+
+def resolve(session_factory, token: str):
+    async def run():
+        async with session_factory() as db:
+            return await resolve_token_user(token, db)
+    return asyncio.run(run())
+
+
+def test_refresh_token_works_once(session_factory):
+    user = add_user(session_factory)
+    token = create_user_refresh_token(user)
+    assert use(session_factory, token).id == user.id
+
+    with pytest.raises(HTTPException) as reused:
+        use(session_factory, token)
+    assert reused.value.status_code == 401
+
+
+def test_reuse_revokes_every_token_of_the_user(session_factory):
+    user = add_user(session_factory)
+    stolen = create_user_refresh_token(user)
+    use(session_factory, stolen)
+    # The legitimate client's replacement tokens, issued before the thief replays the old one
+    replacement = create_user_refresh_token(user)
+    access = create_user_access_token(user)
+
+    with pytest.raises(HTTPException):
+        use(session_factory, stolen)
+    with pytest.raises(HTTPException):
+        resolve(session_factory, access)
+    with pytest.raises(HTTPException):
+        use(session_factory, replacement)
+
+
+def test_access_token_cannot_refresh(session_factory):
+    user = add_user(session_factory)
+    with pytest.raises(HTTPException):
+        use(session_factory, create_user_access_token(user))
@@ -0,0 +1,60 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import FuelType
+from app.routing import Stop, delivery_window, plan_routes
+
+DEPOT = (5.6037, -0.1870)
+DAY_START = datetime(2025, 10, 6, 7)
+
+
+def make_stops(count: int, rng: random.Random) -> list:
+    stops = []
+    for i in range(count):
+        placed_at = DAY_START + timedelta(minutes=rng.uniform(0, 4 * 60))
+        earliest, latest = delivery_window(rng.choice(["now", "now", "1hour", "2hours", "today"]), placed_at)
+        stops.append(Stop(
+            order_id=i,
+            lat=rng.uniform(5.50, 5.75),
+            lng=rng.uniform(-0.35, 0.00),
+            fuel_type=rng.choice(list(FuelType)),
+            quantity=rng.choice((20, 40, 50, 100, 200)),
+            earliest=earliest,
+            latest=latest,
+        ))
+    return stops
+
+
+def plan(seed: int, improve: bool):
+    stops = make_stops(40, random.Random(seed))
+    return stops, plan_routes(stops, capacity=300, depot=DEPOT, start=DAY_START, vehicles=3, improve=improve)
+
+
+@pytest.mark.parametrize("improve", [False, True])
+def test_trips_of_one_tanker_never_overlap(improve):
+    for seed in range(100):
+        _, result = plan(seed, improve)
+        by_vehicle = {}
+        for trip in result.trips:
+            by_vehicle.setdefault(trip.vehicle, []).append(trip)
+        for trips in by_vehicle.values():
+            trips.sort(key=lambda trip: trip.depart)
+            for earlier, later in zip(trips, trips[1:]):
+                assert later.depart >= earlier.return_at, f"seed {seed}: tanker {earlier.vehicle} double-booked"
+
+
+def test_stops_are_reached_within_their_windows():
+    for seed in range(20):
+        stops, result = plan(seed, improve=True)
+        windows = {stop.order_id: stop for stop in stops}
+        served = [planned for trip in result.trips for planned in trip.stops]
+        assert len(served) + len(result.unscheduled) == len(stops)
+        for planned in served:
+            assert planned.arrival <= windows[planned.order_id].latest
+
+
+def test_improving_never_lengthens_the_plan():
+    for seed in range(20):
+        assert plan(seed, improve=True)[1].distance_km <= plan(seed, improve=False)[1].distance_km + 1e-6
@@ -0,0 +1,100 @@
+import asyncio
+
+from app.shared_state import RedisState
+from tests.fakes import FakeRedis
+
+
+def workers(count: int) -> list:
+    """RedisStates sharing one fake Redis, as workers share one server"""
+    client = FakeRedis()
+    return [RedisState(client, "test:") for _ in range(count)]
+
+
+def test_one_worker_holds_a_lease_until_it_resigns():
+    async def run():
+        first, second = workers(2)
+        assert await first.lead("dispatch", 10)
+        assert not await second.lead("dispatch", 10)
+        # Renewing keeps it
+        assert await first.lead("dispatch", 10)
+        # Resigning a lease it doesn't hold must not free the holder's
+        await second.resign("dispatch")
+        assert not await second.lead("dispatch", 10)
+
+        await first.resign("dispatch")
+        assert "dispatch" not in first.leases
+        assert await second.lead("dispatch", 10)
+        assert second.stats()["leases"] == ["dispatch"]
+    asyncio.run(run())
+
+
+def test_lease_lapses_when_not_renewed():
+    async def run():
+        first, second = workers(2)
+        assert await first.lead("reconcile", 0.05)
+        await asyncio.sleep(0.1)
+        assert await second.lead("reconcile", 10)
+        # The old holder learns it lost the lease on its next renewal
+        assert not await first.lead("reconcile", 10)
+        assert "reconcile" not in first.leases
+    asyncio.run(run())
+
+
+def test_lease_that_cannot_be_checked_is_not_held():
+    class Unreachable(FakeRedis):
+        async def eval(self, *args):
+            raise ConnectionError("Redis is down")
+
+    async def run():
+        state = RedisState(Unreachable(), "test:")
+        state.leases.add("dispatch")
+        assert not await state.lead("dispatch", 10)
+        assert state.leases == set()
+        assert state.errors == 1
+    asyncio.run(run())
+
+
+def test_published_messages_reach_every_worker():
+    async def run():
+        publisher, other = workers(2)
+        seen = {"echo": [], "no_echo": [], "other": []}
+        publisher.subscribe("dispatch", seen["echo"].append)
+        publisher.subscribe("dispatch", seen["no_echo"].append, echo=False)
+        other.subscribe("dispatch", seen["other"].append, echo=False)
+        await publisher.start()
+        await other.start()
+        # Let both listeners subscribe before anything is published
+        await asyncio.sleep(0.05)
+
+        await publisher.publish("dispatch", {"event": "released", "order_id": 7})
+        for _ in range(100):
+            if seen["echo"] and seen["other"]:
+                break
+            await asyncio.sleep(0.01)
+
+        await publisher.close()
+        await other.close()
+        return seen, publisher.stats(), other.stats()
+
+    seen, publisher_stats, other_stats = asyncio.run(run())
+    assert seen == {
+        "echo": [{"event": "released", "order_id": 7}],
+        "no_echo": [],
+        "other": [{"event": "released", "order_id": 7}],
+    }
+    assert publisher_stats["published"] == 1
+    assert other_stats["received"] == 1
+
+
+def test_cache_round_trip_counts_hits_and_misses():
+    async def run():
+        first, second = workers(2)
+        assert await second.get("order:1") is None
+        await first.set("order:1", "cached", ttl=10)
+        assert await second.get("order:1") == "cached"
+        await first.delete("order:1")
+        assert await second.get("order:1") is None
+        return second.stats()
+
+    stats = asyncio.run(run())
+    assert (stats["cache_hits"], stats["cache_misses"]) == (1, 2)
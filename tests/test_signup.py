@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.auth import create_user_access_token, user_cache
+from app.config import settings
+from app.database import get_db, get_read_db
+from app.main import app
+from app.models import User, UserRole
+
+
+@pytest.fixture
+def client(session_factory, monkeypatch):
+    monkeypatch.setattr(settings, "rate_limit_enabled", False)
+    user_cache.clear()
+
+    async def get_test_db():
+        async with session_factory() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = app.dependency_overrides[get_read_db] = get_test_db
+    yield TestClient(app)
+    app.dependency_overrides.clear()
+    user_cache.clear()
+
+
+def signup(client, n: int, **extra):
+    return client.post("/auth/signup", json={
+        "full_name": f"User {n}", "email": f"user{n}@example.com", "phone_number": f"024000000{n}",
+        "password": "secret123", **extra,
+    })
+
+
+def bearer(session_factory, user_id: int) -> dict:
+    async def load():
+        async with session_factory() as db:
+            return await db.get(User, user_id)
+
+    return {"Authorization": f"Bearer {create_user_access_token(asyncio.run(load()))}"}
+
+
+def make_admin(session_factory, user_id: int):
+    async def promote():
+        async with session_factory() as db:
+            (await db.get(User, user_id)).role = UserRole.ADMIN
+            await db.commit()
+
+    asyncio.run(promote())
+    user_cache.delete(user_id)
+
+
+def test_signup_ignores_a_requested_role(client, session_factory):
+    response = signup(client, 1, role="admin")
+    assert response.status_code == 200
+    assert response.json()["role"] == "customer"
+    headers = bearer(session_factory, response.json()["id"])
+    assert client.get("/admin/orders/export", headers=headers).status_code == 403
+
+
+@pytest.mark.parametrize("method, path, body", [
+    ("GET", "/test-paystack", None),
+    ("PUT", "/admin/fuel-prices/regular", {"price_per_liter": 15.0}),
+    ("POST", "/admin/routes/plan", {}),
+    ("GET", "/admin/analytics/sales", None),
+    ("GET", "/admin/analytics/timeseries", None),
+])
+def test_customers_cannot_reach_admin_endpoints(client, session_factory, method, path, body):
+    headers = bearer(session_factory, signup(client, 1, role="admin").json()["id"])
+    assert client.request(method, path, json=body, headers=headers).status_code == 403
+
+
+def test_only_admins_grant_roles(client, session_factory):
+    customer = signup(client, 1).json()["id"]
+    other = signup(client, 2).json()["id"]
+    headers = bearer(session_factory, customer)
+    assert client.put(f"/admin/users/{other}/role", json={"role": "admin"}, headers=headers).status_code == 403
+
+    make_admin(session_factory, customer)
+    response = client.put(f"/admin/users/{other}/role", json={"role": "driver"}, headers=headers)
+    assert response.status_code == 200
+    assert response.json()["role"] == "driver"
+    assert client.put("/admin/users/999/role", json={"role": "admin"}, headers=headers).status_code == 404
+
+
+def test_admins_keep_their_own_role(client, session_factory):
+    admin = signup(client, 1).json()["id"]
+    make_admin(session_factory, admin)
+    response = client.put(f"/admin/users/{admin}/role", json={"role": "customer"}, headers=bearer(session_factory, admin))
+    assert response.status_code == 400
@@ -0,0 +1,168 @@
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+import app.main
+from app.auth import create_user_access_token, user_cache
+from app.config import settings
+from app.database import get_db, get_read_db
+from app.models import FuelType, Order, OrderStatus, PaymentStatus, User
+from app.shared_state import MemoryState
+from app.tracking import SharedStateBroker, SlowConsumer, TrackingHub, WorkerDraining
+from app.transitions import OrderTransition
+
+
+def new_hub() -> TrackingHub:
+    hub = TrackingHub(SharedStateBroker(MemoryState(100)))
+    asyncio.run(hub.start())
+    return hub
+
+
+def status(order_id: int, order_status: OrderStatus, version: int) -> OrderTransition:
+    return OrderTransition(order_id, 1, order_status, PaymentStatus.SUCCESSFUL, version)
+
+
+def test_slow_subscriber_is_dropped(monkeypatch):
+    monkeypatch.setattr(settings, "tracking_queue_size", 2)
+    hub = new_hub()
+
+    async def run():
+        subscriber = hub.subscribe(1)
+        for version, order_status in enumerate(
+            [OrderStatus.CONFIRMED, OrderStatus.PROCESSING, OrderStatus.EN_ROUTE], start=1
+        ):
+            await hub.publish_status(status(1, order_status, version))
+        with pytest.raises(SlowConsumer):
+            await subscriber.next_batch(1)
+        hub.unsubscribe(subscriber)
+
+    asyncio.run(run())
+    assert hub.stats()["dropped_slow_consumers"] == 1
+    assert hub.channels == {}
+
+
+def test_locations_coalesce_to_the_latest_per_order():
+    hub = new_hub()
+
+    async def run():
+        subscriber = hub.subscribe(1)
+        other = hub.subscribe(2)
+        await hub.publish_status(status(1, OrderStatus.PROCESSING, 2))
+        for lat in (5.60, 5.61, 5.62):
+            await hub.publish_location(1, 7, lat, -0.18)
+        await hub.publish_location(2, 8, 5.70, -0.20)
+        await hub.publish_status(status(1, OrderStatus.EN_ROUTE, 3))
+        return await subscriber.next_batch(1), await other.next_batch(1)
+
+    batch, other_batch = asyncio.run(run())
+    # Status changes all arrive, in order; of the positions only the latest
+    assert [(m["type"], m.get("order_status"), m.get("lat")) for m in batch] == [
+        ("status", "processing", None),
+        ("status", "en_route", None),
+        ("location", None, 5.62),
+    ]
+    assert [(m["type"], m["lat"]) for m in other_batch] == [("location", 5.70)]
+    assert hub.last_location.get(1)["lat"] == 5.62
+
+
+def test_drain_ends_waiting_and_new_subscribers():
+    hub = new_hub()
+
+    async def run():
+        subscriber = hub.subscribe(1)
+        waiting = asyncio.create_task(subscriber.next_batch(5))
+        await asyncio.sleep(0)
+        hub.drain()
+        with pytest.raises(WorkerDraining):
+            await asyncio.wait_for(waiting, 1)
+        # A client reconnecting to this worker is sent on straight away
+        with pytest.raises(WorkerDraining):
+            await hub.subscribe(1).next_batch(1)
+
+    asyncio.run(run())
+
+
+@pytest.fixture
+def tracked_order(session_factory, monkeypatch):
+    """A client for the app on the test database, an order, and a token for its owner"""
+    async def add():
+        async with session_factory() as db:
+            user = User(full_name="Customer", email="c@example.com", phone_number="0240000001", hashed_password="x")
+            db.add(user)
+            await db.flush()
+            order = Order(
+                user_id=user.id, phone_number="0240000001", delivery_address="Accra", fuel_type=FuelType.REGULAR,
+                quantity=10, price_per_liter=15.0, total_amount=150.0, delivery_time="now",
+                order_status=OrderStatus.CONFIRMED, payment_status=PaymentStatus.SUCCESSFUL,
+            )
+            db.add(order)
+            await db.commit()
+            return user, order.id
+
+    async def get_test_db():
+        async with session_factory() as db:
+            yield db
+
+    user, order_id = asyncio.run(add())
+    monkeypatch.setattr(settings, "rate_limit_enabled", False)
+    monkeypatch.setattr(app.main, "AsyncSessionLocal", session_factory)
+    app.main.app.dependency_overrides[get_db] = app.main.app.dependency_overrides[get_read_db] = get_test_db
+    yield TestClient(app.main.app), order_id, create_user_access_token(user)
+    app.main.app.dependency_overrides.clear()
+    user_cache.clear()
+
+
+class LaggingHub(TrackingHub):
+    """Every subscriber has already fallen behind when it is handed out"""
+
+    def subscribe(self, order_id: int):
+        subscriber = super().subscribe(order_id)
+        subscriber.overflowed = True
+        subscriber.push({"type": "status", "order_id": order_id})
+        return subscriber
+
+
+def draining_hub() -> TrackingHub:
+    hub = new_hub()
+    hub.drain()
+    return hub
+
+
+def lagging_hub() -> TrackingHub:
+    hub = LaggingHub(SharedStateBroker(MemoryState(100)))
+    asyncio.run(hub.start())
+    return hub
+
+
+@pytest.mark.parametrize("make_hub, event", [(draining_hub, "reconnect"), (lagging_hub, "resync")])
+def test_event_stream_ends_with_what_the_client_should_do(tracked_order, monkeypatch, make_hub, event):
+    client, order_id, token = tracked_order
+    hub = make_hub()
+    monkeypatch.setattr(app.main, "tracking_hub", hub)
+
+    with client.stream("GET", f"/orders/{order_id}/events", params={"token": token}) as response:
+        body = "".join(response.iter_text())
+
+    assert response.status_code == 200
+    events = [line.split(": ", 1)[1] for line in body.splitlines() if line.startswith("event: ")]
+    # The snapshot first, then the instruction, then the stream ends
+    assert events == ["status", event]
+    assert hub.channels == {}
+
+
+@pytest.mark.parametrize("make_hub, code", [(draining_hub, 1012), (lagging_hub, 1013)])
+def test_websocket_closes_with_a_reason_code(tracked_order, monkeypatch, make_hub, code):
+    client, order_id, token = tracked_order
+    hub = make_hub()
+    monkeypatch.setattr(app.main, "tracking_hub", hub)
+
+    with client.websocket_connect(f"/ws/orders/{order_id}?token={token}") as websocket:
+        snapshot = websocket.receive_json()
+        with pytest.raises(WebSocketDisconnect) as closed:
+            websocket.receive_json()
+
+    assert (snapshot["type"], snapshot["order_status"]) == ("status", "confirmed")
+    assert closed.value.code == code
+    assert hub.channels == {}
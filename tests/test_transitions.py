@@ -0,0 +1,101 @@
+import asyncio
+
+from sqlalchemy import select
+
+from app.models import FuelType, Order, OrderStatus, OrderStatusHistory, PaymentStatus
+from app import transitions as transitions_module
+from app.transitions import (
+    CACHE_PRIORITY, OrderTransition, apply_payment_result, expire_unpaid_order, notify_transitions, on_transition,
+    transition_stats
+)
+
+
+def add_orders(session_factory, reference: str, count: int) -> list:
+    async def add():
+        async with session_factory() as db:
+            orders = [
+                Order(
+                    phone_number="0241234567", delivery_address="Accra", fuel_type=FuelType.REGULAR, quantity=10,
+                    price_per_liter=15.0, total_amount=150.0, delivery_time="now", paystack_reference=reference,
+                )
+                for _ in range(count)
+            ]
+            db.add_all(orders)
+            await db.commit()
+            return [order.id for order in orders]
+    return asyncio.run(add())
+
+
+def run(session_factory, action):
+    async def go():
+        async with session_factory() as db:
+            transitions = await action(db)
+            await db.commit()
+            return transitions
+    return asyncio.run(go())
+
+
+def history(session_factory, order_id: int) -> list:
+    async def get():
+        async with session_factory() as db:
+            rows = await db.execute(
+                select(OrderStatusHistory).where(OrderStatusHistory.order_id == order_id)
+                .order_by(OrderStatusHistory.version)
+            )
+            return [(row.reason, row.order_status, row.payment_status) for row in rows.scalars()]
+    return asyncio.run(get())
+
+
+def test_payment_confirms_a_pending_order(session_factory):
+    [order_id] = add_orders(session_factory, "REF_paid", 1)
+    run(session_factory, lambda db: apply_payment_result(db, "REF_paid", True))
+    assert history(session_factory, order_id) == [
+        ("payment_succeeded", OrderStatus.CONFIRMED, PaymentStatus.SUCCESSFUL),
+    ]
+
+
+def test_payment_after_cancellation_is_recorded_for_a_refund(session_factory):
+    expired, pending = add_orders(session_factory, "REF_late", 2)
+    run(session_factory, lambda db: expire_unpaid_order(db, expired))
+    before = transition_stats.paid_after_cancellation
+
+    transitions = run(session_factory, lambda db: apply_payment_result(db, "REF_late", True))
+
+    assert {(t.order_id, t.order_status, t.payment_status) for t in transitions} == {
+        (expired, OrderStatus.CANCELLED, PaymentStatus.SUCCESSFUL),
+        (pending, OrderStatus.CONFIRMED, PaymentStatus.SUCCESSFUL),
+    }
+    assert history(session_factory, expired) == [
+        ("payment_expired", OrderStatus.CANCELLED, PaymentStatus.FAILED),
+        ("paid_after_cancellation", OrderStatus.CANCELLED, PaymentStatus.SUCCESSFUL),
+    ]
+    assert transition_stats.paid_after_cancellation == before + 1
+
+    # A replayed success changes nothing
+    assert run(session_factory, lambda db: apply_payment_result(db, "REF_late", True)) == []
+
+
+def test_cache_listeners_run_before_the_rest_whatever_registered_first(monkeypatch):
+    monkeypatch.setattr(transitions_module, "_listeners", [])
+    calls = []
+
+    def listener(name):
+        async def called(transition):
+            calls.append(name)
+        return called
+
+    on_transition(listener("tracking"))
+    on_transition(listener("dispatch"))
+    on_transition(listener("cache"), priority=CACHE_PRIORITY)
+
+    asyncio.run(notify_transitions([OrderTransition(1, 1, OrderStatus.CONFIRMED, PaymentStatus.SUCCESSFUL, 2)]))
+    assert calls == ["cache", "tracking", "dispatch"]
+
+
+def test_app_invalidates_the_order_cache_before_telling_trackers():
+    from app.main import dispatcher, order_cache, tracking_hub
+
+    listeners = [listener for _, listener in transitions_module._listeners]
+    cache = listeners.index(order_cache.on_transition)
+    assert cache < listeners.index(tracking_hub.publish_status)
+    assert cache < listeners.index(dispatcher.on_transition)
@@ -0,0 +1,51 @@
+import asyncio
+
+from app.config import settings
+from app.models import FuelType, Order, PaymentStatus, PaystackEvent, WebhookEventStatus
+from app.webhooks import WebhookProcessor
+
+
+def test_failed_batch_is_retried_while_running(session_factory, monkeypatch):
+    monkeypatch.setattr(settings, "webhook_batch_window", 0.01)
+    monkeypatch.setattr(settings, "webhook_retry_backoff", 0.05)
+    calls = []
+
+    async def run():
+        processor = WebhookProcessor(session_factory)
+        apply_batch = processor.apply_batch
+
+        async def flaky(event_ids):
+            calls.append(list(event_ids))
+            if len(calls) < 3:
+                raise RuntimeError("database unavailable")
+            await apply_batch(event_ids)
+
+        processor.apply_batch = flaky
+        async with session_factory() as db:
+            db.add(Order(
+                phone_number="0241234567", delivery_address="Accra", fuel_type=FuelType.REGULAR, quantity=10,
+                price_per_liter=15.0, total_amount=150.0, delivery_time="now", paystack_reference="FUE_1_abc",
+            ))
+            await db.commit()
+            event_id = await processor.record(
+                db, {"event": "charge.success", "data": {"id": 1, "reference": "FUE_1_abc"}}
+            )
+        await processor.start()
+        processor.enqueue(event_id)
+        for _ in range(100):
+            if processor.applied:
+                break
+            await asyncio.sleep(0.02)
+        stats = processor.stats()
+        await processor.stop()
+
+        async with session_factory() as db:
+            event = await db.get(PaystackEvent, event_id)
+            order = await db.get(Order, 1)
+        return stats, event, order
+
+    stats, event, order = asyncio.run(run())
+    assert len(calls) == 3
+    assert stats["failed_batches"] == 2 and stats["applied"] == 1 and stats["retrying"] == 0
+    assert event.status == WebhookEventStatus.APPLIED
+    assert order.payment_status == PaymentStatus.SUCCESSFUL